@@ -0,0 +1,295 @@
+"""
+stand-in for Krita's krita module, enough of it for the plugin to be
+imported and its settings, lookup and tree code run outside of Krita.
+
+nothing is drawn or exported. settings are kept in memory, and the app data
+location is the folder in the QE_BENCH_APP_DATA environment variable (or
+the current folder). a QApplication must exist before the plugin is imported.
+"""
+
+from PyQt5.QtCore import *
+from PyQt5.QtGui import *
+from PyQt5.QtWidgets import *
+from pathlib import Path
+import builtins
+import os
+
+
+class Notifier(QObject):
+    applicationClosing = pyqtSignal()
+    imageCreated = pyqtSignal(object)
+    imageSaved = pyqtSignal(str)
+    imageClosed = pyqtSignal(str)
+    viewCreated = pyqtSignal(object)
+    viewClosed = pyqtSignal(object)
+    windowCreated = pyqtSignal()
+    windowIsBeingCreated = pyqtSignal(object)
+    configurationChanged = pyqtSignal()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._active = False
+
+    def active(self):
+        return self._active
+
+    def setActive(self, value):
+        self._active = value
+
+
+class InfoObject(QObject):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._properties = {}
+
+    def properties(self):
+        return dict(self._properties)
+
+    def setProperties(self, properties):
+        self._properties = dict(properties)
+
+    def property(self, key):
+        return self._properties.get(key)
+
+    def setProperty(self, key, value):
+        self._properties[key] = value
+
+
+class ManagedColor(QObject):
+    def __init__(self, colorModel="RGBA", colorDepth="U8", colorProfile="", *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._colour = QColor(Qt.white)
+
+    @staticmethod
+    def fromQColor(colour, canvas=None):
+        c = ManagedColor()
+        c._colour = QColor(colour)
+        return c
+
+    def colorForCanvas(self, canvas=None):
+        return QColor(self._colour)
+
+    def toXML(self):
+        r, g, b = self._colour.redF(), self._colour.greenF(), self._colour.blueF()
+        return ('<!DOCTYPE color>\n<color channeldepth="U8">\n'
+                f' <RGB space="sRGB-elle-V2-srgbtrc.icc" r="{r:g}" g="{g:g}" b="{b:g}"/>\n</color>\n')
+
+
+class Document(QObject):
+    """
+    an 8-bit RGBA image of width x height transparent pixels, with file
+    name file_name.
+    """
+    def __init__(self, width=64, height=64, name="", file_name="", *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._width = width
+        self._height = height
+        self._name = name
+        self._file_name = file_name
+        self._xres = 72.0
+        self._yres = 72.0
+        self._modified = False
+        self._pixels = bytes(width * height * 4)
+
+    def fileName(self):
+        return self._file_name
+
+    def setFileName(self, value):
+        self._file_name = value
+
+    def name(self):
+        return self._name
+
+    def setName(self, value):
+        self._name = value
+
+    def width(self):
+        return self._width
+
+    def height(self):
+        return self._height
+
+    def xRes(self):
+        return self._xres
+
+    def yRes(self):
+        return self._yres
+
+    def resolution(self):
+        return int(self._xres)
+
+    def colorModel(self):
+        return "RGBA"
+
+    def colorDepth(self):
+        return "U8"
+
+    def modified(self):
+        return self._modified
+
+    def setModified(self, value):
+        self._modified = value
+
+    def waitForDone(self):
+        pass
+
+    def refreshProjection(self):
+        pass
+
+    def setBatchmode(self, value):
+        pass
+
+    def pixelData(self, x, y, w, h):
+        return QByteArray(bytes(w * h * 4))
+
+    def thumbnail(self, w, h):
+        image = QImage(w, h, QImage.Format_ARGB32)
+        image.fill(Qt.transparent)
+        return image
+
+    def projection(self, x=0, y=0, w=0, h=0):
+        return self.thumbnail(w or self._width, h or self._height)
+
+    def exportImage(self, filename, export_configuration):
+        return False
+
+    def save(self):
+        return False
+
+    def close(self):
+        return True
+
+
+class FileDialog:
+    @staticmethod
+    def getExistingDirectory(parent=None, caption="", directory="", dialogName=""):
+        return ""
+
+    @staticmethod
+    def getOpenFileName(parent=None, caption="", directory="", filter="", selectedFilter="", dialogName=""):
+        return ""
+
+    @staticmethod
+    def getSaveFileName(parent=None, caption="", directory="", filter="", selectedFilter="", dialogName=""):
+        return ""
+
+
+class Extension(QObject):
+    def __init__(self, parent):
+        super().__init__(parent)
+
+    def setup(self):
+        pass
+
+    def createActions(self, window):
+        pass
+
+
+class DockWidget(QDockWidget):
+    def canvasChanged(self, canvas):
+        pass
+
+
+class DockWidgetFactoryBase:
+    DockTornOff = 0
+    DockTop = 1
+    DockBottom = 2
+    DockRight = 3
+    DockLeft = 4
+    DockMinimized = 5
+
+
+class Krita(QObject):
+    _instance = None
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._settings = {}
+        self._documents = []
+        self._extensions = []
+        self._notifier = Notifier(self)
+
+    def getAppDataLocation(self):
+        return os.environ.get("QE_BENCH_APP_DATA", str(Path.cwd()))
+
+    def readSetting(self, group, name, default):
+        return self._settings.get((group, name), default)
+
+    def writeSetting(self, group, name, value):
+        self._settings[(group, name)] = value
+
+    def notifier(self):
+        return self._notifier
+
+    def icon(self, name):
+        return QIcon()
+
+    def addExtension(self, extension):
+        self._extensions.append(extension)
+
+    def extensions(self):
+        return list(self._extensions)
+
+    def addDockWidgetFactory(self, factory):
+        pass
+
+    def windows(self):
+        return []
+
+    def activeWindow(self):
+        return None
+
+    def activeDocument(self):
+        return self._documents[-1] if self._documents else None
+
+    def setActiveDocument(self, document):
+        pass
+
+    def documents(self):
+        return list(self._documents)
+
+    def createDocument(self, width, height, name, colorModel, colorDepth, profile, resolution):
+        document = Document(width, height, name)
+        self._documents.append(document)
+        return document
+
+    def openDocument(self, filename):
+        document = Document(file_name=filename)
+        self._documents.append(document)
+        return document
+
+    def action(self, name):
+        return None
+
+    def actions(self):
+        return []
+
+    def filterStrategies(self):
+        return ["Bell", "Bicubic", "Bilinear", "BSpline", "Hermite", "Lanczos3", "Mitchell", "NearestNeighbor"]
+
+    def filters(self):
+        return []
+
+    def filter(self, name):
+        return None
+
+    def version(self):
+        return "5.3.0"
+
+    def batchmode(self):
+        return True
+
+    def setBatchmode(self, value):
+        pass
+
+
+# krita makes these available to all scripts, without importing anything.
+builtins.Application = builtins.Krita = builtins.Scripter = Krita.instance()
+builtins.i18n = lambda text, *args: text
+builtins.i18nc = lambda context, text, *args: text
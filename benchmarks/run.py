@@ -0,0 +1,409 @@
+"""
+benchmarks of the plugin's hot paths, run outside of Krita with the
+stand-in krita module in this folder.
+
+    python benchmarks/run.py [--sizes 10 100 1000 10000] [--repeat 3]
+                             [--only NAME] [--output results.json]
+                             [--compare baseline.json] [--threshold 1.25]
+
+needs PyQt5. no display is needed, Qt's offscreen platform is used unless
+QT_QPA_PLATFORM is set.
+
+for each size, a library of synthetic projects is made in a temporary
+folder: that many project entries, in folders of 100 that each have a
+folder entry too, and two version files per project (.kra zips holding only
+a preview.png). the entries cycle through PNG, WebP and JPEG outputs, and
+every fourth one is scaled.
+
+results are written as JSON (to stdout, or to --output), with one record per
+benchmark, variant and size, keyed "name/variant/size":
+
+    {"format": 1, "environment": {...}, "repeat": 3, "results": {
+        "find_settings_path_for_file/cold/1000": {"name": ..., "variant": ...,
+            "entries": 1000, "items": 2000, "times": [...], "min": ...,
+            "median": ..., "median_per_item_us": ...}, ...}}
+
+times are seconds per run over all items. with --compare, each median is
+compared to that of the same key in an earlier results file, and the process
+exits with status 1 if any is slower by more than --threshold times.
+"""
+
+from pathlib import Path
+from datetime import datetime, timezone
+from timeit import default_timer
+import statistics
+import platform
+import argparse
+import tempfile
+import zipfile
+import shutil
+from copy import deepcopy
+import json
+import math
+import sys
+import os
+
+bench_dir = Path(__file__).resolve().parent
+sys.path.insert(0, str(bench_dir))
+sys.path.insert(1, str(bench_dir.parent / "quickexport"))
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+try:
+    import sip
+except ImportError:
+    # krita ships sip as a top-level module, PyQt5 wheels only as PyQt5.sip.
+    from PyQt5 import sip
+    sys.modules["sip"] = sip
+
+from PyQt5.QtCore import QBuffer, QByteArray, QIODevice, QEvent, PYQT_VERSION_STR, QT_VERSION_STR
+from PyQt5.QtGui import QImage, QColor
+from PyQt5.QtWidgets import QApplication
+
+projects_per_folder = 100
+versions_per_project = 2
+
+png_config = {"alpha":True, "compression":6, "downsample":False, "forceSRGB":False, "indexed":False, "interlaced":False,
+              "saveAsHDR":False, "saveSRGBProfile":False, "storeAuthor":False, "storeMetaData":False,
+              "transparencyFillcolor":'<!DOCTYPE color>\n<color channeldepth="U8">\n <RGB space="sRGB-elle-V2-srgbtrc.icc" r="1" g="1" b="1"/>\n</color>\n'}
+webp_config = {"alphaCompression":1, "alphaFilter":1, "alphaQuality":100, "autoFilter":False, "exactAlpha":False, "filterSharpness":0,
+               "filterStrength":60, "filterType":1, "haveAnimation":False, "lossless":True, "method":4, "preset":0, "quality":75}
+jpeg_config = {"baseline":True, "exif":True, "filters":"", "forceSRGB":False, "iptc":True, "is_sRGB":True, "optimize":True,
+               "progressive":False, "quality":80, "saveProfile":True, "smoothing":0, "subsampling":0, "transparencyFillcolor":"255,255,255", "xmp":True}
+output_types = ((".png", png_config), (".webp", webp_config), (".jpg", jpeg_config))
+
+
+def preview_png_bytes(size=256):
+    image = QImage(size, size, QImage.Format_ARGB32)
+    image.fill(QColor(91, 173, 220))
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, "PNG")
+    return bytes(data)
+
+
+class Library:
+    """
+    synthetic projects and their settings entries, see the module docstring.
+    """
+    def __init__(self, root, entries, preview):
+        self.root = root
+        self.entries = entries
+        self.project_paths = []
+        self.folder_paths = []
+        self.version_files = []
+        self.latest_files = []
+
+        for i in range(entries):
+            folder = root / f"folder_{i // projects_per_folder:03}"
+            if i % projects_per_folder == 0:
+                folder.mkdir(parents=True)
+                self.folder_paths.append(folder)
+            project = folder / f"pic_{i:05}"
+            self.project_paths.append(project)
+            for v in range(1, versions_per_project+1):
+                file = folder / f"{project.name}_{v:03}.kra"
+                with zipfile.ZipFile(file, "w", zipfile.ZIP_STORED) as kra:
+                    kra.writestr("mimetype", "application/x-krita")
+                    kra.writestr("preview.png", preview)
+                self.version_files.append(file)
+            self.latest_files.append(file)
+
+    def settings(self, qe):
+        """
+        return list of settings dicts for the library, made with the plugin's utils module qe.
+        """
+        result = []
+        for path in self.folder_paths:
+            s = qe.default_settings(path, node_type=qe.QEItemType.FOLDER, store=True)
+            s["export"]["png"] = dict(png_config)
+            qe.generate_save_string(path, s)
+            result.append(s)
+        for i, path in enumerate(self.project_paths):
+            ext, config = output_types[i % len(output_types)]
+            s = qe.default_settings(path, node_type=qe.QEItemType.PROJECT, store=True, ext=ext)
+            s["export"][ext[1:]] = dict(config)
+            if i % 4 == 0:
+                s["basic"]["scale"] = True
+                s["basic"]["scale_height_mode"] = qe.QEUnits.PIXELS
+                s["basic"]["scale_height"] = 512
+            qe.generate_save_string(path, s)
+            result.append(s)
+        return result
+
+
+class Benchmarks:
+    def __init__(self, qe, qetree, thumbnails, exportscheduler, app):
+        self.qe = qe
+        self.qetree = qetree
+        self.thumbnails = thumbnails
+        self.exportscheduler = exportscheduler
+        self.app = app
+        self.library = None
+        self.settings = []
+
+    def set_library(self, library):
+        qe = self.qe
+        self.library = library
+        self.settings = library.settings(qe)
+
+        # kritarc as plugin version 0.1.0 left it, for load_0_1_0_settings_from_config.
+        kritarc = self.app._settings
+        for key in [key for key in kritarc if key[0] == "TomJK_QuickExport" and key[1].startswith("file")]:
+            del kritarc[key]
+        for i, s in enumerate(self.settings):
+            kritarc[("TomJK_QuickExport", f"file{i}/path")] = s["config_path_string"]
+            kritarc[("TomJK_QuickExport", f"file{i}/basic")] = s["config_basic_string"]
+            for ext_key in s["export"]:
+                kritarc[("TomJK_QuickExport", f"file{i}/{ext_key}")] = s[f"config_export_{ext_key}_string"]
+
+        self.load_settings()
+
+    def load_settings(self):
+        qe = self.qe
+        qe.qe_settings.clear()
+        for s in self.settings:
+            qe.qe_settings[s["path"]] = deepcopy(s)
+        qe.settings_store.fragments = {}
+        qe.update_qe_settings_last_load()
+
+    # each benchmark is a generator of (variant, item count, setup, run).
+
+    def load_0_1_0_settings_from_config(self):
+        qe = self.qe
+        def run():
+            if not qe.load_0_1_0_settings_from_config(show_errors=False):
+                raise RuntimeError("settings failed to load.")
+        yield "kritarc", len(self.settings), qe.qe_settings.clear, run
+        self.load_settings()
+
+    def save_settings_to_config(self):
+        qe = self.qe
+        def forget_fragments():
+            qe.settings_store.fragments = {}
+        yield "all", len(self.settings), forget_fragments, qe.save_settings_to_config
+        yield "unchanged", len(self.settings), None, qe.save_settings_to_config
+        def modify_one():
+            s = qe.qe_settings[self.settings[-1]["path"]]
+            s["basic"]["file_name_custom"] = "x" if s["basic"]["file_name_custom"] != "x" else ""
+            qe.mark_settings_modified(s["path"])
+        yield "one_modified", len(self.settings), modify_one, qe.save_settings_to_config
+
+    def settings_copy(self):
+        qe = self.qe
+        yield "deepcopy", len(self.settings), None, lambda: deepcopy(qe.qe_settings)
+        def compare():
+            for path in qe.qe_settings:
+                qe.mark_settings_modified(path)
+        yield "compare", len(self.settings), None, compare
+        yield "last_load", len(self.settings), None, qe.update_qe_settings_last_load
+
+    def find_settings_path_for_file(self):
+        qe = self.qe
+        files = self.library.version_files
+        def run():
+            for file in files:
+                qe.find_settings_path_for_file(file)
+        yield "cold", len(files), qe.qe_settings.lookup_cache.clear, run
+        yield "warm", len(files), None, run
+
+    def export_file_path(self):
+        qe = self.qe
+        pairs = [(qe.qe_settings[project], file) for project, file in zip(self.library.project_paths, self.library.latest_files)]
+        def run():
+            for s, file in pairs:
+                qe.export_file_path(s, file)
+        yield "project", len(pairs), None, run
+
+    def qetree_setup(self):
+        qe = self.qe
+        trees = []
+        def delete_trees():
+            for tree in trees:
+                if hasattr(tree, "thumbnail_worker"):
+                    tree.thumbnail_worker.close()
+                tree.deleteLater()
+            trees.clear()
+            QApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+        def new_tree(cold):
+            delete_trees()
+            if cold:
+                qe.folder_scan_index.invalidate()
+            trees.append(self.qetree.QETree())
+        def run():
+            trees[-1].setup()
+        rows = len(self.settings) + len(self.library.version_files)
+        yield "cold_scan", rows, lambda: new_tree(True), run
+        yield "warm_scan", rows, lambda: new_tree(False), run
+        delete_trees()
+
+    def thumbnail_for_file(self):
+        # QETree._make_thumbnail_for_file was replaced by the shared thumbnail cache.
+        files = self.library.latest_files
+        size = self.qetree.tree_icon_size
+        cache_dir = Path(tempfile.mkdtemp(prefix="thumbnails_", dir=self.library.root))
+        cache = self.thumbnails.ThumbnailCache()
+        def reset(path):
+            cache.set_path(path)
+            cache.sizes.clear()
+        def run():
+            for file in files:
+                if cache.image(file, size) is None:
+                    raise RuntimeError(f"no thumbnail for '{file}'.")
+        yield "read", len(files), lambda: reset(None), run
+        def warm_disk():
+            reset(cache_dir)
+            run()
+            reset(cache_dir)
+        yield "disk_cache", len(files), warm_disk, run
+        yield "memory_cache", len(files), None, run
+
+    def file_content_hash(self):
+        # export on save skips saves whose hash hasn't changed, so saves of an
+        # unchanged image have to hash the same.
+        file_content_hash = self.exportscheduler.file_content_hash
+        files = self.library.latest_files
+        saves = 0
+        def resave():
+            # as Krita saves an unchanged image: new document info and zip timestamps.
+            nonlocal saves
+            saves += 1
+            for file in files:
+                with zipfile.ZipFile(file) as kra:
+                    members = [(name, kra.read(name)) for name in kra.namelist() if name != "documentinfo.xml"]
+                with zipfile.ZipFile(file, "w", zipfile.ZIP_STORED) as kra:
+                    for name, data in members:
+                        kra.writestr(zipfile.ZipInfo(name, (2024, 1, 1, 0, 0, saves % 30 * 2)), data)
+                    kra.writestr("documentinfo.xml", f"<document-info><about><editing-cycles>{saves}</editing-cycles></about></document-info>")
+        resave()
+        hashes = {file:file_content_hash(file) for file in files}
+        def run():
+            for file in files:
+                if file_content_hash(file) != hashes[file]:
+                    raise RuntimeError(f"'{file}' hashes differently after saving it unchanged.")
+        yield "resaved", len(files), resave, run
+
+    all = ("load_0_1_0_settings_from_config", "save_settings_to_config", "settings_copy", "find_settings_path_for_file",
+           "export_file_path", "qetree_setup", "thumbnail_for_file", "file_content_hash")
+
+
+def time_benchmark(setup, run, repeat):
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = default_timer()
+        run()
+        times.append(default_timer() - start)
+    return times
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "pyqt": PYQT_VERSION_STR,
+        "qt": QT_VERSION_STR,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    print how each result compares to the same one in baseline, return True
+    if none is more than threshold times slower.
+    """
+    ok = True
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base or not base["median"]:
+            continue
+        ratio = result["median"] / base["median"]
+        slower = ratio > threshold
+        ok = ok and not slower
+        print(f"{key:60} {base['median']*1000:10.2f}ms -> {result['median']*1000:10.2f}ms  x{ratio:5.2f}{'  SLOWER' if slower else ''}", file=sys.stderr)
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time Quick Export's hot paths outside of Krita.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000], help="numbers of project entries to test with")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each benchmark per size")
+    parser.add_argument("--only", action="append", default=[], help="only run benchmarks whose name contains this (can be repeated)")
+    parser.add_argument("--output", help="write results to this file instead of stdout")
+    parser.add_argument("--compare", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio reported as a regression")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary library folder")
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix="qe_bench_"))
+    os.environ["QE_BENCH_APP_DATA"] = str(work_dir / "appdata")
+
+    import krita
+    from QuickExport import utils as qe, qetree, thumbnails, exportscheduler
+
+    app = krita.Krita.instance()
+    # the plugin's own data, such as its settings file, goes under the app data location.
+    qe.plugin_data_dir().mkdir(parents=True, exist_ok=True)
+    qe.writeSetting("settings_version", qe.current_settings_version)
+
+    benchmarks = Benchmarks(qe, qetree, thumbnails, exportscheduler, app)
+    names = [name for name in Benchmarks.all if not args.only or any(o in name for o in args.only)]
+    preview = preview_png_bytes()
+    results = {}
+
+    try:
+        for size in args.sizes:
+            print(f"making library of {size} projects...", file=sys.stderr)
+            benchmarks.set_library(Library(work_dir / f"library_{size}", size, preview))
+
+            for name in names:
+                for variant, items, setup, run in getattr(benchmarks, name)():
+                    times = time_benchmark(setup, run, args.repeat)
+                    median = statistics.median(times)
+                    key = f"{name}/{variant}/{size}"
+                    results[key] = {
+                        "name": name,
+                        "variant": variant,
+                        "entries": size,
+                        "items": items,
+                        "times": times,
+                        "min": min(times),
+                        "median": median,
+                        "median_per_item_us": median / items * 1e6 if items else math.nan,
+                    }
+                    print(f"{key:60} {median*1000:10.2f}ms  {results[key]['median_per_item_us']:8.2f}us/item", file=sys.stderr)
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "format": 1,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": environment(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(results, baseline["results"], args.threshold):
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    # kept for the whole run; Qt's image classes need an application.
+    qapp = QApplication(sys.argv[:1])
+    sys.exit(main())
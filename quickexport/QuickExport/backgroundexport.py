@@ -0,0 +1,262 @@
+from PyQt5.QtGui import QImage, QImageWriter, QColor, QPainter
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, pyqtSignal
+import xml.etree.ElementTree as ET
+from pathlib import Path
+import threading
+import os
+from krita import Krita
+
+import logging
+logger = logging.getLogger("tomjk_quickexport")
+
+from .utils import *
+
+app = Krita.instance()
+
+# file types that can be written without Krita's export filters.
+background_export_formats = {".png":b"png", ".jpg":b"jpg", ".jpeg":b"jpg"}
+
+
+def colour_from_xml(xml_string, default=Qt.white):
+    """
+    QColor for a colour stored as XML by ManagedColor.toXML, eg. an export
+    config's transparencyFillcolor. only RGB colours are understood.
+    """
+    try:
+        rgb = ET.fromstring(xml_string).find("RGB")
+        return QColor.fromRgbF(float(rgb.get("r")), float(rgb.get("g")), float(rgb.get("b")))
+    except (ET.ParseError, AttributeError, TypeError, ValueError):
+        return QColor(default)
+
+
+def can_export_in_background(settings, document):
+    """
+    True if document can be exported with settings by a background export:
+    an 8-bit RGBA image with every output of a type Qt can write itself.
+    """
+    if document.colorModel() != "RGBA" or document.colorDepth() != "U8":
+        return False
+
+    for output in output_settings(settings):
+        ext, export_config = export_config_for_settings(output)
+        if ext not in background_export_formats or export_config is None:
+            return False
+
+    return True
+
+
+class ExportSource:
+    """
+    a copy of a document's flattened projection, shared by the snapshots of
+    exports made from it at the same time. scaled versions of it are kept
+    too, so that exports at the same size only scale it once, and smaller
+    sizes are scaled down from the smallest larger version already made.
+    """
+    def __init__(self, document):
+        self.width = document.width()
+        self.height = document.height()
+        self.document_modified = document.modified()
+        document.waitForDone()
+        self.data = bytes(document.pixelData(0, 0, self.width, self.height))
+        self.scaled = {}
+        self.lock = threading.Lock()
+
+    def image(self, scale=None):
+        """
+        return the projection as a QImage, scaled to scale (width, height,
+        filter strategy) if given. only uses QImage, so can be called from
+        worker threads.
+        """
+        # krita's 8-bit RGBA pixels are laid out as BGRA, the same as ARGB32 on little-endian machines.
+        image = QImage(self.data, self.width, self.height, self.width * 4, QImage.Format_ARGB32)
+        if not scale:
+            return image
+
+        with self.lock:
+            scaled = self.scaled.get(scale)
+            if scaled is None:
+                scale_width, scale_height, scale_filter = scale
+                larger = [s for (w, h, f), s in self.scaled.items() if w >= scale_width and h >= scale_height and f == scale_filter]
+                if larger:
+                    image = min(larger, key=lambda s: s.width() * s.height())
+                # Qt only has nearest and bilinear-ish smooth scaling, so other filters are approximated.
+                transform = Qt.FastTransformation if scale_filter == "NearestNeighbor" else Qt.SmoothTransformation
+                scaled = image.scaled(scale_width, scale_height, Qt.IgnoreAspectRatio, transform)
+                self.scaled[scale] = scaled
+            return scaled
+
+
+class ExportSnapshot:
+    """
+    everything a background export needs, taken from a document on the GUI
+    thread: its ExportSource and the resolved settings.
+    """
+    def __init__(self, settings_path, file_path, export_path, ext, export_config, source, scale, xres, yres, settings_hash):
+        self.settings_path = settings_path
+        self.file_path = file_path
+        self.export_path = export_path
+        self.ext = ext
+        self.export_config = export_config
+        self.source = source
+        self.scale = scale
+        self.xres = xres
+        self.yres = yres
+        self.settings_hash = settings_hash
+        self.document_modified = source.document_modified
+
+
+def snapshot_for_export(settings_path, document, create_missing_folders=None, source=None, output=None):
+    """
+    take an ExportSnapshot of document for exporting with the settings for
+    settings_path, or one of its outputs (see output_settings) if given.
+    check can_export_in_background first. an ExportSource already taken from
+    document can be passed in to share it.
+    returns None if it can't be exported. the reason is available from export_failed_msg().
+    """
+    settings = output or qe_settings[settings_path]
+    s_basic = settings["basic"]
+    ext, export_config = export_config_for_settings(settings)
+
+    file_path = Path(document.fileName())
+    export_path = export_file_path(settings, file_path)
+
+    if not prepare_export_folder(export_path, create_missing_folders):
+        return None
+
+    source = source or ExportSource(document)
+    width = source.width
+    height = source.height
+
+    scale = export_scale_for_size(s_basic, width, height)
+    if scale and scale[2] == "Auto":
+        scale = (scale[0], scale[1], auto_filter_strategy(width, height, scale[0], scale[1]))
+
+    xres = document.xRes()
+    yres = document.yRes()
+    if scale and s_basic["scale_res"] != -1:
+        xres = s_basic["scale_res"]
+        yres = s_basic["scale_res"] * (scale[1] / scale[0])
+
+    return ExportSnapshot(settings_path, file_path, export_path, ext, dict(export_config), source, scale,
+                          xres, yres, export_settings_hash(settings))
+
+
+def write_snapshot(snapshot, progress=None):
+    """
+    scale and encode snapshot to its export file. only uses QImage, so can
+    be called from worker threads. progress is called with a short
+    description of each stage. returns (ok, message).
+    """
+    config = snapshot.export_config
+
+    if snapshot.scale and progress:
+        progress(f"Scaling to {snapshot.scale[0]} x {snapshot.scale[1]}")
+
+    image = snapshot.source.image(snapshot.scale)
+
+    if snapshot.ext != ".png" or not config.get("alpha", True):
+        flat = QImage(image.size(), QImage.Format_RGB32)
+        flat.fill(colour_from_xml(config.get("transparencyFillcolor", "")))
+        painter = QPainter(flat)
+        painter.drawImage(0, 0, image)
+        painter.end()
+        image = flat
+
+    # (setting these on an image shared with other exports makes a copy of it, so avoid it if possible.)
+    dpm_x, dpm_y = round(snapshot.xres / 0.0254), round(snapshot.yres / 0.0254)
+    if image.dotsPerMeterX() != dpm_x or image.dotsPerMeterY() != dpm_y:
+        image.setDotsPerMeterX(dpm_x)
+        image.setDotsPerMeterY(dpm_y)
+
+    if progress:
+        progress("Encoding")
+
+    temp_path = snapshot.export_path.with_name(f"{snapshot.export_path.stem}.{threading.get_ident()}.tmp{snapshot.ext}")
+    writer = QImageWriter(str(temp_path), background_export_formats[snapshot.ext])
+
+    if snapshot.ext == ".png":
+        # qt's png writer maps quality 100..0 to zlib compression 0..9.
+        writer.setQuality(100 - round(int(config.get("compression", 6)) * 91 / 9))
+    else:
+        writer.setQuality(int(config.get("quality", 80)))
+        writer.setOptimizedWrite(bool(config.get("optimize", False)))
+        writer.setProgressiveScanWrite(bool(config.get("progressive", False)))
+
+    if not writer.write(image):
+        message = writer.errorString()
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return False, message
+
+    try:
+        os.replace(temp_path, snapshot.export_path)
+    except OSError as e:
+        return False, f"{type(e).__name__}: {e}"
+
+    return True, ""
+
+
+class _ExportJob(QRunnable):
+    def __init__(self, exporter, snapshot):
+        super().__init__()
+        self.exporter = exporter
+        self.snapshot = snapshot
+
+    def run(self):
+        progress = lambda stage: self.exporter.progress.emit(self.snapshot, stage)
+        try:
+            ok, message = write_snapshot(self.snapshot, progress)
+        except Exception as e:
+            ok, message = False, f"{type(e).__name__}: {e}"
+        self.snapshot.source = None
+        self.exporter.done.emit(self.snapshot, ok, message)
+
+
+class BackgroundExporter(QObject):
+    """
+    writes ExportSnapshots to their export files on worker threads, so that
+    exporting a large image doesn't block Krita.
+
+    progress and finished are emitted on the GUI thread. export results are
+    recorded in the export manifest before finished is emitted.
+    """
+    progress = pyqtSignal(object, str)
+    finished = pyqtSignal(object, bool, str)
+    done = pyqtSignal(object, bool, str)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(2)
+        self.running = []
+
+        self.done.connect(self._on_done)
+
+    def export(self, snapshot):
+        self.running.append(snapshot)
+        self.pool.start(_ExportJob(self, snapshot))
+
+    def is_busy(self):
+        return len(self.running) > 0
+
+    def close(self):
+        """
+        wait for running exports to finish.
+        """
+        self.pool.waitForDone()
+
+    def _on_done(self, snapshot, ok, message):
+        if snapshot in self.running:
+            self.running.remove(snapshot)
+
+        if ok and not snapshot.document_modified:
+            export_manifest.record(snapshot.file_path, snapshot.export_path, snapshot.settings_hash)
+        else:
+            # export doesn't match the saved file (or failed), so can't be skipped next time.
+            export_manifest.forget(snapshot.export_path)
+        export_manifest.save()
+
+        self.finished.emit(snapshot, ok, message)
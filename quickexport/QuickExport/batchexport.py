@@ -0,0 +1,229 @@
+from PyQt5.QtWidgets import QProgressDialog, QMessageBox
+from PyQt5.QtCore import Qt, QObject, QTimer, pyqtSignal
+from pathlib import Path
+from krita import *
+
+import logging
+logger = logging.getLogger("tomjk_quickexport")
+
+from .utils import *
+
+app = Krita.instance()
+
+
+def collect_export_jobs(settings_paths=None):
+    """
+    build the list of exports needed to bring stored settings up to date.
+
+    settings_paths: settings to collect jobs for. if None, all stored settings are used.
+
+    a project entry exports the newest version file of that project.
+    a folder entry exports the newest version file of each project in the
+    folder, except for projects that have settings of their own.
+
+    returns list of (settings_path, file_path) tuples, each file listed once.
+    """
+    if settings_paths is None:
+        settings_paths = list(qe_settings.keys())
+
+    jobs = []
+    seen_files = set()
+
+    def add_job(settings_path, file_path):
+        if not file_path or file_path in seen_files:
+            return
+        seen_files.add(file_path)
+        jobs.append((settings_path, file_path))
+
+    for settings_path in settings_paths:
+        if settings_path not in qe_settings:
+            continue
+
+        if qe_settings[settings_path]["node_type"] == QEItemType.FOLDER:
+            for project_path in project_paths_in_folder(settings_path):
+                if find_settings_path_for_file(project_path.with_name(project_path.name + ".kra")) != settings_path:
+                    # project has its own settings.
+                    continue
+                add_job(settings_path, latest_file_for_project(project_path))
+        else:
+            add_job(settings_path, latest_file_for_project(settings_path))
+
+    return jobs
+
+
+def document_for_file(file_path):
+    """
+    return the open document for file_path, or None if it isn't open.
+    """
+    for doc in app.documents():
+        if doc.fileName() and Path(doc.fileName()) == file_path:
+            return doc
+    return None
+
+
+def export_file(settings_path, file_path, skip_unchanged=True, create_missing_folders=None):
+    """
+    export file_path with the settings stored for settings_path.
+
+    if the file is already open in Krita, the open document is exported, as
+    with a normal quick export. otherwise the file is opened, exported and
+    closed again.
+
+    unless skip_unchanged is False, the export is skipped if the exported
+    file is already up to date with the saved file and current settings.
+    create_missing_folders is passed on to export_image.
+
+    returns (status, export_path, message), where status is one of
+    "exported", "skipped" or "failed".
+    """
+    export_path = export_file_path(qe_settings[settings_path], file_path)
+    doc = document_for_file(file_path)
+
+    if skip_unchanged and not (doc and doc.modified()):
+        if export_is_up_to_date(settings_path, file_path):
+            return "skipped", export_path, "Already up to date."
+
+    opened_for_export = doc is None
+
+    if opened_for_export:
+        doc = app.openDocument(str(file_path))
+        if not doc:
+            return "failed", export_path, f"Couldn't open '{file_path}'."
+        doc.waitForDone()
+
+    try:
+        result = export_image(settings_path, doc, create_missing_folders=create_missing_folders)
+        message = f"Exported to '{export_path}'" if result else export_failed_msg()
+    except Exception as e:
+        result = False
+        message = f"{type(e).__name__}: {e}"
+    finally:
+        if opened_for_export:
+            doc.close()
+
+    return "exported" if result else "failed", export_path, message
+
+
+class BatchExporter(QObject):
+    """
+    runs a queue of export jobs one at a time from the event loop, so that
+    progress can be shown and the batch can be cancelled between jobs.
+    """
+    progress = pyqtSignal(int, int, str)
+    finished = pyqtSignal(list)
+
+    def __init__(self, jobs, skip_unchanged=True, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.jobs = list(jobs)
+        self.skip_unchanged = skip_unchanged
+        self.results = []
+        self.cancelled = False
+        self.running = False
+
+    def start(self):
+        self.running = True
+        QTimer.singleShot(0, self._run_next_job)
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _run_next_job(self):
+        done = len(self.results)
+        total = len(self.jobs)
+
+        if self.cancelled or done == total:
+            self.running = False
+            export_manifest.save()
+            self.finished.emit(self.results)
+            return
+
+        settings_path, file_path = self.jobs[done]
+        self.progress.emit(done, total, file_path.name)
+
+        status, export_path, message = export_file(settings_path, file_path, self.skip_unchanged)
+        if status == "failed":
+            logger.warning(f"Batch export: {file_path} failed: {message}")
+        else:
+            logger.info(f"Batch export: {file_path} -> {export_path} ({status})")
+        self.results.append({"settings_path":settings_path, "file_path":file_path, "export_path":export_path, "status":status, "message":message})
+
+        QTimer.singleShot(0, self._run_next_job)
+
+
+def run_batch_export(parent=None):
+    """
+    export every stored project and folder entry, showing progress in a
+    cancellable progress dialog and a summary once done.
+    """
+    jobs = collect_export_jobs()
+
+    if not jobs:
+        QMessageBox.information(parent, "Quick Export", "There are no configured projects with files to export.")
+        return
+
+    progress_dialog = QProgressDialog("Exporting...", "Cancel", 0, len(jobs), parent)
+    progress_dialog.setWindowTitle("Quick Export")
+    progress_dialog.setWindowModality(Qt.WindowModal)
+    progress_dialog.setMinimumDuration(0)
+    progress_dialog.setValue(0)
+
+    skip_unchanged = str2bool(readSetting("skip_unchanged_exports"))
+    process_count = int(readSetting("batch_export_processes")) if readSetting("batch_export_processes").isdecimal() else 1
+
+    if process_count > 1:
+        # imported here, parallelexport builds on this module.
+        from .parallelexport import ParallelExporter, kritarunner_path, missing_export_folders
+
+        if not kritarunner_path():
+            logger.warning("Batch export: couldn't find kritarunner, exporting in this Krita instead.")
+            process_count = 1
+
+    if process_count > 1:
+        # worker processes can't ask about missing folders, so ask about all of them now.
+        create_missing_folders = readSetting("create_missing_folders_at_export")
+        if create_missing_folders == "ask":
+            missing_folders = missing_export_folders(jobs)
+            if missing_folders:
+                msg_box = QMessageBox(QMessageBox.Question, "Quick Export", f"{len(missing_folders)} export folder(s) don't exist. Create them?",
+                                      QMessageBox.Yes | QMessageBox.No, parent)
+                msg_box.setDetailedText("\n".join(sorted(str(folder) for folder in missing_folders)))
+                create_missing_folders = "always" if msg_box.exec() == QMessageBox.Yes else "never"
+
+        exporter = ParallelExporter(jobs, process_count, skip_unchanged, create_missing_folders == "always", progress_dialog)
+    else:
+        exporter = BatchExporter(jobs, skip_unchanged, progress_dialog)
+
+    def _on_progress(done, total, name):
+        if process_count > 1:
+            progress_dialog.setLabelText(f"Exported '{name}' ({done} of {total})...")
+        else:
+            progress_dialog.setLabelText(f"Exporting '{name}' ({done+1} of {total})...")
+        progress_dialog.setValue(done)
+
+    def _on_finished(results):
+        progress_dialog.setValue(len(jobs))
+        progress_dialog.deleteLater()
+
+        failures = [r for r in results if r["status"] == "failed"]
+        up_to_date_count = sum(1 for r in results if r["status"] == "skipped")
+        cancelled_count = len(jobs) - len(results)
+
+        text = f"Exported {len(results) - len(failures) - up_to_date_count} of {len(jobs)} files."
+        if up_to_date_count:
+            text += f" {up_to_date_count} already up to date."
+        if failures:
+            text += f" {len(failures)} failed."
+        if cancelled_count:
+            text += f" {cancelled_count} not exported due to cancellation."
+
+        msg_box = QMessageBox(QMessageBox.Warning if failures else QMessageBox.Information, "Quick Export", text, QMessageBox.Ok, parent)
+        if failures:
+            msg_box.setDetailedText("\n".join(f"{r['file_path']}: {r['message']}" for r in failures))
+        msg_box.exec()
+
+    exporter.progress.connect(_on_progress)
+    exporter.finished.connect(_on_finished)
+    progress_dialog.canceled.connect(exporter.cancel)
+
+    exporter.start()
@@ -0,0 +1,97 @@
+from pathlib import Path
+
+import logging
+logger = logging.getLogger("tomjk_quickexport")
+
+
+config_group = "TomJK_QuickExport"
+
+
+def unescape_config_value(s):
+    """
+    reverse the escaping KConfig applies when writing values to kritarc.
+    """
+    if "\\" not in s:
+        return s
+
+    out = []
+    i = 0
+    length = len(s)
+    while i < length:
+        c = s[i]
+        if c != "\\" or i+1 == length:
+            out.append(c)
+            i += 1
+            continue
+        n = s[i+1]
+        if n == "s":
+            out.append(" ")
+        elif n == "t":
+            out.append("\t")
+        elif n == "n":
+            out.append("\n")
+        elif n == "r":
+            out.append("\r")
+        elif n == "x" and i+4 <= length:
+            try:
+                out.append(chr(int(s[i+2:i+4], 16)))
+                i += 4
+                continue
+            except ValueError:
+                out.append("\\x")
+        else:
+            # "\\", "\;", "\," etc.
+            out.append(n)
+        i += 2
+    return "".join(out)
+
+
+class SettingsFile:
+    """
+    the plugin's settings group of a kritarc-style config file, for use
+    outside of Krita's own config (eg. a copy of a kritarc from 0.1.0, which
+    kept export settings there).
+
+    read-only: it's kept for reading 0.1.0 settings. provides readSetting and
+    writeSetting like Krita's, so it can stand in for kritarc with
+    utils.settings_source_override, but written values are only kept in
+    memory.
+    """
+    def __init__(self, path, group=config_group):
+        self.path = Path(path)
+        self.group = group
+        self.values = {}
+
+    def load(self):
+        """
+        read settings from file. returns False if the file couldn't be read.
+        """
+        self.values = {}
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except OSError as e:
+            logger.error(f"Couldn't read settings file '{self.path}': {type(e).__name__}: {e}")
+            return False
+
+        in_group = False
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("["):
+                in_group = line == f"[{self.group}]"
+                continue
+            if not in_group or "=" not in line:
+                continue
+            key, value = line.split("=", 1)
+            self.values[key.strip()] = unescape_config_value(value.strip())
+
+        return True
+
+    def readSetting(self, setting, default):
+        return self.values.get(setting, default)
+
+    def writeSetting(self, setting, value):
+        self.values[setting] = value
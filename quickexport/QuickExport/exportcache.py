@@ -0,0 +1,131 @@
+import json
+import os
+
+import logging
+logger = logging.getLogger("tomjk_quickexport")
+
+
+manifest_version = 1
+
+
+def file_stat(path):
+    """
+    return (mtime_ns, size) for file at path, or None if it doesn't exist.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+class ExportManifest:
+    """
+    persistent record of completed exports, used to skip exports that are
+    already up to date.
+
+    each entry is keyed by export path and records the source file's
+    modification time and size, a hash of the settings used, and the
+    modification time and size of the exported file. if none of these have
+    changed since, exporting again would produce the same file.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = None
+        self.modified = False
+
+    def set_path(self, path):
+        if path == self.path:
+            return
+        self.path = path
+        self.entries = None
+        self.modified = False
+
+    def _load(self):
+        if self.entries is not None:
+            return
+
+        self.entries = {}
+
+        if not self.path:
+            return
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Couldn't read export manifest '{self.path}': {type(e).__name__}: {e}")
+            return
+
+        if data.get("version") != manifest_version:
+            logger.info(f"Ignoring export manifest with unknown version {data.get('version')}.")
+            return
+
+        self.entries = data.get("exports", {})
+
+    def save(self):
+        """
+        write manifest to disk if it has changed. written to a temporary file
+        first then renamed, so an interrupted write can't corrupt it.
+        """
+        if not (self.modified and self.path):
+            return
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_name(self.path.name + ".tmp")
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"version":manifest_version, "exports":self.entries}, f, separators=(",",":"))
+            os.replace(temp_path, self.path)
+            self.modified = False
+        except OSError as e:
+            logger.warning(f"Couldn't write export manifest '{self.path}': {type(e).__name__}: {e}")
+
+    def record(self, source_path, export_path, settings_hash):
+        """
+        record that source_path was just exported to export_path using settings with settings_hash.
+        """
+        self._load()
+
+        source_stat = file_stat(source_path)
+        output_stat = file_stat(export_path)
+
+        if not (source_stat and output_stat):
+            self.forget(export_path)
+            return
+
+        self.entries[str(export_path)] = {
+            "source":str(source_path),
+            "source_stat":source_stat,
+            "settings":settings_hash,
+            "output_stat":output_stat
+        }
+        self.modified = True
+
+    def forget(self, export_path):
+        self._load()
+
+        if self.entries.pop(str(export_path), None) is not None:
+            self.modified = True
+
+    def is_up_to_date(self, source_path, export_path, settings_hash):
+        """
+        True if export_path was exported from source_path, with the same
+        settings, and neither file has changed since.
+        """
+        self._load()
+
+        entry = self.entries.get(str(export_path))
+
+        if not entry:
+            return False
+
+        if entry["source"] != str(source_path) or entry["settings"] != settings_hash:
+            return False
+
+        return entry["source_stat"] == file_stat(source_path) and entry["output_stat"] == file_stat(export_path)
+
+
+export_manifest = ExportManifest()
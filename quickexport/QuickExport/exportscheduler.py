@@ -0,0 +1,269 @@
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+from pathlib import Path
+import hashlib
+import zipfile
+import math
+from krita import Krita
+
+import logging
+logger = logging.getLogger("tomjk_quickexport")
+
+from .utils import *
+from .backgroundexport import BackgroundExporter, can_export_in_background, snapshot_for_export
+
+app = Krita.instance()
+
+
+class ExportScheduler(QObject):
+    """
+    runs quick exports of open documents, merging repeated requests.
+
+    requests are keyed by document file and export file. a request for a
+    key that's already queued replaces the queued one, and a request for a
+    key that's being exported in the background is held until that export
+    finishes, then exported once more with the document as it is then, however
+    many requests arrived in the meantime.
+
+    queued requests run together on the next pass of the event loop, and
+    background exports of the same document share one copy of its projection
+    (see backgroundexport.ExportSource). a request exports every output of
+    the settings entry.
+
+    progress(export path, stage) and finished(export path, ok, message) are
+    emitted for every export that runs. done(file path, export path, ok) is
+    emitted once a request's exports have all finished, or it's dropped.
+    """
+    progress = pyqtSignal(object, str)
+    finished = pyqtSignal(object, bool, str)
+    done = pyqtSignal(object, object, bool)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.queued = {}
+        self.running = {}
+        self.failed = set()
+        self.held = {}
+
+        self.background_exporter = BackgroundExporter(self)
+        self.background_exporter.progress.connect(lambda snapshot, stage: self.progress.emit(snapshot.export_path, stage))
+        self.background_exporter.finished.connect(self._on_background_export_finished)
+
+    def request(self, settings_path, document):
+        """
+        ask for document to be exported with the settings for settings_path.
+        returns False if it was merged with an export already waiting.
+        """
+        file_path = Path(document.fileName())
+        key = (file_path, export_file_path(qe_settings[settings_path], file_path))
+
+        if key in self.running:
+            merged = key in self.held
+            self.held[key] = (settings_path, document)
+            return not merged
+
+        if key in self.queued:
+            self.queued[key] = (settings_path, document)
+            return False
+
+        self.queued[key] = (settings_path, document)
+        if len(self.queued) == 1:
+            QTimer.singleShot(0, self._run_queued)
+        return True
+
+    def _run_queued(self):
+        jobs, self.queued = self.queued, {}
+        sources = {}
+        background = str2bool(readSetting("background_export"))
+
+        for key, (settings_path, document) in jobs.items():
+            file_path, export_path = key
+
+            if settings_path not in qe_settings or document not in app.documents():
+                # settings removed or document closed since the request.
+                self.done.emit(file_path, export_path, False)
+                continue
+
+            if background and can_export_in_background(qe_settings[settings_path], document):
+                snapshots = []
+                for output in output_settings(qe_settings[settings_path]):
+                    snapshot = snapshot_for_export(settings_path, document, source=sources.get(file_path), output=output)
+                    if not snapshot:
+                        break
+                    sources[file_path] = snapshot.source
+                    snapshot.key = key
+                    snapshots.append(snapshot)
+                else:
+                    # largest first, so smaller sizes can be scaled down from them.
+                    snapshots.sort(key=lambda snapshot: -snapshot.scale[0] * snapshot.scale[1] if snapshot.scale else -math.inf)
+                    self.running[key] = len(snapshots)
+                    for snapshot in snapshots:
+                        self.background_exporter.export(snapshot)
+                    self.progress.emit(export_path, "Started")
+                    continue
+
+                self.finished.emit(export_path, False, export_failed_msg())
+                self.done.emit(file_path, export_path, False)
+                continue
+
+            result = export_image(settings_path, document)
+            export_manifest.save()
+            self.finished.emit(export_path, result, "" if result else export_failed_msg())
+            self.done.emit(file_path, export_path, result)
+
+    def _on_background_export_finished(self, snapshot, ok, message):
+        self.finished.emit(snapshot.export_path, ok, message)
+
+        if not ok:
+            self.failed.add(snapshot.key)
+
+        self.running[snapshot.key] -= 1
+        if self.running[snapshot.key] > 0:
+            return
+        del self.running[snapshot.key]
+
+        self.done.emit(*snapshot.key, snapshot.key not in self.failed)
+        self.failed.discard(snapshot.key)
+
+        if snapshot.key in self.held:
+            settings_path, document = self.held.pop(snapshot.key)
+            if settings_path in qe_settings and document in app.documents():
+                self.request(settings_path, document)
+
+
+# members of a .kra that Krita rewrites on every save (editing cycles, dates).
+volatile_kra_members = {"documentinfo.xml"}
+
+
+def file_content_hash(path):
+    """
+    hash of the contents of the file at path, or None if it can't be read.
+
+    for a zip file such as a .kra, it's a hash of its members' names, sizes
+    and CRCs from the zip directory, without volatile_kra_members, so that
+    saves of an unchanged image hash the same whatever their metadata and
+    zip timestamps. other files are hashed as they are.
+    """
+    h = hashlib.sha1()
+    try:
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as z:
+                for info in sorted(z.infolist(), key=lambda info: info.filename):
+                    if info.filename not in volatile_kra_members:
+                        h.update(f"{info.filename}\0{info.file_size}\0{info.CRC}\n".encode("utf-8"))
+            return h.hexdigest()
+        with open(path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                h.update(chunk)
+    except (OSError, zipfile.BadZipFile):
+        return None
+    return h.hexdigest()
+
+
+class _HashJob(QRunnable):
+    def __init__(self, scheduler, file_path, token):
+        super().__init__()
+        self.scheduler = scheduler
+        self.file_path = file_path
+        self.token = token
+
+    def run(self):
+        self.scheduler.hashed.emit(self.file_path, self.token, file_content_hash(self.file_path))
+
+
+class SaveExportScheduler(QObject):
+    """
+    exports documents when they're saved, if their settings have export on
+    save enabled, through an ExportScheduler.
+
+    exports of the same file are at least the "export_on_save_interval"
+    setting's seconds apart; saves made sooner wait for the interval to be
+    up, and are exported once together. a save is skipped if neither the
+    file's contents nor its export settings have changed since the last
+    successful export on save. the file is hashed on a worker thread.
+    """
+    hashed = pyqtSignal(object, int, object)
+
+    def __init__(self, export_scheduler, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.export_scheduler = export_scheduler
+        self.pending = {}
+        self.hashing = {}
+        self.exporting = {}
+        self.last_export_times = {}
+        self.last_export_hashes = {}
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+
+        self.hashed.connect(self._on_hashed)
+        self.export_scheduler.done.connect(self._on_export_done)
+
+    def on_image_saved(self, filename):
+        file_path = Path(filename)
+
+        if file_path in self.pending:
+            # merge with the export already waiting.
+            return
+
+        settings_path = find_settings_path_for_file(file_path)
+        if not settings_path or not qe_settings[settings_path]["basic"]["export_on_save"]:
+            return
+
+        interval = float(readSetting("export_on_save_interval"))
+        wait = max(0.0, interval - (default_timer() - self.last_export_times.get(file_path, -interval)))
+
+        timer = QTimer(self)
+        timer.setSingleShot(True)
+        timer.timeout.connect(lambda: self._export(file_path))
+        self.pending[file_path] = timer
+        timer.start(int(wait * 1000))
+
+    def _export(self, file_path):
+        self.pending.pop(file_path).deleteLater()
+
+        # a later save supersedes any hash still running for an earlier one.
+        token = self.hashing.get(file_path, 0) + 1
+        self.hashing[file_path] = token
+        self.pool.start(_HashJob(self, file_path, token))
+
+    def _on_hashed(self, file_path, token, content_hash):
+        if self.hashing.get(file_path) != token:
+            return
+        del self.hashing[file_path]
+
+        # settings or open documents might have changed while waiting.
+        settings_path = find_settings_path_for_file(file_path)
+        if not settings_path or not qe_settings[settings_path]["basic"]["export_on_save"]:
+            return
+
+        document = next((d for d in app.documents() if d.fileName() and Path(d.fileName()) == file_path), None)
+        if not document:
+            return
+
+        export_hashes = (content_hash, settings_fingerprint(qe_settings[settings_path]))
+        if export_hashes[0] and export_hashes == self.last_export_hashes.get(file_path):
+            logger.info(f"QE: '{file_path.name}' saved without changes, skipped export on save.")
+            return
+
+        export_path = export_file_path(qe_settings[settings_path], file_path)
+        if (file_path, export_path) in self.export_scheduler.running:
+            # the export that's running is of an earlier save, so its result
+            # says nothing about this one.
+            self.exporting.pop(file_path, None)
+        else:
+            self.exporting[file_path] = (export_path, export_hashes)
+
+        self.last_export_times[file_path] = default_timer()
+        self.export_scheduler.request(settings_path, document)
+
+    def _on_export_done(self, file_path, export_path, ok):
+        if file_path not in self.exporting or self.exporting[file_path][0] != export_path:
+            return
+        export_hashes = self.exporting.pop(file_path)[1]
+
+        if ok:
+            self.last_export_hashes[file_path] = export_hashes
+        else:
+            self.last_export_hashes.pop(file_path, None)
@@ -0,0 +1,232 @@
+"""
+headless export runner, for regenerating exports without the Quick Export
+dialog, eg. as an unattended build step.
+
+run it with Krita's script runner:
+
+    kritarunner -s QuickExport.headless -- [options] [path ...]
+
+("--" stops kritarunner itself from reading the options meant for this script.)
+
+each path can be a .kra file, a project (eg. "/path/to/pic" for
+"/path/to/pic_003.kra") or a folder of projects. with no paths, every
+configured project and folder is exported.
+
+settings are read from the plugin's settings file, or with --settings from
+a settings file exported from the Quick Export dialog or a kritarc holding
+settings from plugin version 0.1.0.
+
+one line of JSON is printed to stdout per file:
+
+    {"file": ..., "settings": ..., "output": ..., "status": ..., "message": ...}
+
+where status is "exported", "skipped" (already up to date) or "failed".
+the process exits with status 1 if any file failed, otherwise 0.
+
+with --jobs N, files are spread across N worker processes, each running
+this script with --worker on its share of the files (see parallelexport.py).
+"""
+
+from pathlib import Path
+import argparse
+import json
+import sys
+import os
+from PyQt5.QtCore import QEventLoop
+from krita import *
+
+import logging
+logger = logging.getLogger("tomjk_quickexport")
+
+from .utils import *
+from .configfile import SettingsFile
+from .settingsstore import SettingsStore
+from .batchexport import collect_export_jobs, export_file
+from .parallelexport import ParallelExporter
+
+app = Krita.instance()
+
+
+def load_settings(settings_file_path=None):
+    """
+    load export settings from the plugin's settings file, or from the file at
+    settings_file_path, which can be a settings file or a kritarc-style file.
+    returns error message, or None on success.
+    """
+    if not settings_file_path:
+        return _load_settings(settings_store)
+
+    if Path(settings_file_path).suffix == ".json":
+        return _load_settings(SettingsStore(Path(settings_file_path)))
+
+    settings_file = SettingsFile(settings_file_path)
+    if not settings_file.load():
+        return f"Couldn't read settings file '{settings_file_path}'."
+    with settings_source_override(settings_file):
+        return _load_settings(None)
+
+def _load_settings(store):
+    qe_settings.clear()
+
+    settings_version = readSetting("settings_version") if not store or store is settings_store else current_settings_version
+
+    if settings_version == "0.1.0":
+        result = load_0_1_0_settings_from_config(show_errors=False)
+    elif settings_version == current_settings_version and store:
+        if not store.exists():
+            return f"Settings file '{store.path}' not found."
+        result = load_settings_from_store(store, show_errors=False)
+    else:
+        return f"Settings version '{settings_version}' is not supported, expected '0.1.0' or '{current_settings_version}'."
+
+    if not result:
+        return "Couldn't read settings, see log for details."
+    return None
+
+
+def resolve_jobs(targets, exact_paths=False):
+    """
+    build (settings_path, file_path) export jobs for targets, a list of .kra
+    files, projects or folders. with no targets, all stored settings are used.
+
+    exact_paths: use paths as given instead of resolving them, so results
+    can be matched up with the paths a coordinating process passed in.
+
+    returns (jobs, errors), errors being (path, message) for each target or file that can't be exported.
+    """
+    if not targets:
+        return collect_export_jobs(), []
+
+    jobs = []
+    errors = []
+    seen_files = set()
+
+    for target in targets:
+        path = Path(target) if exact_paths else Path(target).expanduser().resolve()
+
+        if path.is_dir():
+            files = [latest_file_for_project(project_path) for project_path in project_paths_in_folder(path)]
+        elif path.suffix == ".kra":
+            files = [path] if path.is_file() else []
+        else:
+            files = [latest_file_for_project(path)]
+
+        files = [file for file in files if file]
+
+        if not files:
+            errors.append((path, "No .kra files found."))
+            continue
+
+        for file in files:
+            if file in seen_files:
+                continue
+            seen_files.add(file)
+
+            settings_path = find_settings_path_for_file(file)
+            if not settings_path:
+                errors.append((file, "No export settings for file."))
+                continue
+            jobs.append((settings_path, file))
+
+    return jobs, errors
+
+
+def print_result(file_path, settings_path, export_path, status, message):
+    print(json.dumps({
+        "file":str(file_path),
+        "settings":str(settings_path) if settings_path else None,
+        "output":str(export_path) if export_path else None,
+        "status":status,
+        "message":message
+    }), flush=True)
+
+
+def run(args):
+    """
+    run the headless export with command line args. returns process exit status.
+    """
+    parser = argparse.ArgumentParser(prog="kritarunner -s QuickExport.headless", description="Export Krita projects with their Quick Export settings.")
+    parser.add_argument("paths", nargs="*", help=".kra files, projects or folders to export. exports everything configured if omitted.")
+    parser.add_argument("--settings", metavar="FILE", help="read settings from this exported settings file (.json) or kritarc instead of the plugin's settings.")
+    parser.add_argument("--force", action="store_true", help="export even if the exported file is already up to date.")
+    parser.add_argument("--create-folders", action="store_true", help="create missing export folders. otherwise only created if the create missing folders option is set to always.")
+    parser.add_argument("--jobs", type=int, default=1, metavar="N", help="export with N worker processes in parallel.")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+
+    try:
+        args = parser.parse_args(args)
+    except SystemExit as e:
+        return e.code or 0
+
+    error = load_settings(args.settings)
+    if error:
+        print(error, file=sys.stderr, flush=True)
+        return 2
+
+    settings_file = None
+    if args.settings and Path(args.settings).suffix != ".json":
+        settings_file = SettingsFile(args.settings)
+        settings_file.load()
+
+    with settings_source_override(settings_file):
+        create_missing_folders = "always" if args.create_folders or readSetting("create_missing_folders_at_export") == "always" else "never"
+
+    jobs, errors = resolve_jobs(args.paths, exact_paths=args.worker)
+
+    failed = False
+
+    for path, message in errors:
+        print_result(path, None, None, "failed", message)
+        failed = True
+
+    if args.jobs > 1 and not args.worker:
+        return 1 if run_parallel(jobs, args.jobs, not args.force, create_missing_folders == "always") or failed else 0
+
+    for settings_path, file_path in jobs:
+        status, export_path, message = export_file(settings_path, file_path, skip_unchanged=not args.force, create_missing_folders=create_missing_folders)
+        print_result(file_path, settings_path, export_path, status, message)
+        if status == "failed":
+            failed = True
+
+    # the coordinating process records the results of workers, they'd only overwrite each other here.
+    if not args.worker:
+        export_manifest.save()
+
+    return 1 if failed else 0
+
+
+def run_parallel(jobs, worker_count, skip_unchanged, create_missing_folders):
+    """
+    export jobs with a pool of worker processes, printing results as they come in.
+    returns True if any file failed.
+    """
+    exporter = ParallelExporter(jobs, worker_count, skip_unchanged, create_missing_folders)
+    loop = QEventLoop()
+    failed = False
+
+    def _on_progress(done, total, name):
+        nonlocal failed
+        r = exporter.results[done-1]
+        print_result(r["file_path"], r["settings_path"], r["export_path"], r["status"], r["message"])
+        if r["status"] == "failed":
+            failed = True
+
+    exporter.progress.connect(_on_progress)
+    exporter.finished.connect(loop.quit)
+
+    exporter.start()
+    if exporter.running:
+        loop.exec()
+
+    return failed
+
+
+def __main__(args):
+    """
+    entry point for kritarunner. the script runner doesn't pass on a return
+    value, so the process is exited here with the run's status.
+    """
+    status = run(list(args))
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(status)
@@ -0,0 +1,208 @@
+from PyQt5.QtCore import QObject, QTimer, QProcess, QCoreApplication, QTemporaryDir, pyqtSignal
+from pathlib import Path
+import platform
+import shutil
+import json
+import math
+from krita import *
+
+import logging
+logger = logging.getLogger("tomjk_quickexport")
+
+from .utils import *
+from .batchexport import document_for_file, export_file
+
+app = Krita.instance()
+
+
+def kritarunner_path():
+    """
+    return path to Krita's script runner, or None if it can't be found.
+    looks next to the running Krita first, then on PATH.
+    """
+    name = "kritarunner.exe" if platform.system() == "Windows" else "kritarunner"
+    path = Path(QCoreApplication.applicationDirPath()) / name
+    if path.is_file():
+        return path
+    found = shutil.which(name)
+    return Path(found) if found else None
+
+
+def missing_export_folders(jobs):
+    """
+    return set of export folders for jobs that don't exist yet.
+    """
+    folders = set()
+    for settings_path, file_path in jobs:
+        for output in output_settings(qe_settings[settings_path]):
+            folder = export_file_path(output, file_path).parent
+            if not folder.exists():
+                folders.add(folder)
+    return folders
+
+
+class ParallelExporter(QObject):
+    """
+    exports a list of jobs using a pool of headless Krita worker processes
+    (see headless.py), each opening, exporting and closing its own files.
+
+    files open in this Krita with unsaved changes are exported here instead,
+    so that their current state is exported, as with a normal quick export.
+
+    workers don't touch the export manifest. results are recorded in it
+    here as they arrive, so that workers can't overwrite each other's records.
+
+    emits the same signals as batchexport.BatchExporter.
+    """
+    progress = pyqtSignal(int, int, str)
+    finished = pyqtSignal(list)
+
+    def __init__(self, jobs, worker_count, skip_unchanged=True, create_missing_folders=False, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.jobs = list(jobs)
+        self.worker_count = max(1, worker_count)
+        self.skip_unchanged = skip_unchanged
+        self.create_missing_folders = create_missing_folders
+        self.results = []
+        self.cancelled = False
+        self.running = False
+
+        self.local_jobs = []
+        self.chunks = []
+        self.workers = []
+        self.temp_dir = None
+        self.settings_file_path = None
+
+    def start(self):
+        self.running = True
+
+        runner = kritarunner_path()
+
+        remote_jobs = []
+        for settings_path, file_path in self.jobs:
+            doc = document_for_file(file_path)
+            if doc and doc.modified():
+                self.local_jobs.append((settings_path, file_path))
+            elif self.skip_unchanged and export_is_up_to_date(settings_path, file_path):
+                self._add_result(settings_path, file_path, export_file_path(qe_settings[settings_path], file_path), "skipped", "Already up to date.")
+            elif not runner:
+                self._add_result(settings_path, file_path, None, "failed", "Couldn't find kritarunner to start worker processes.")
+            else:
+                remote_jobs.append((settings_path, file_path))
+
+        if remote_jobs:
+            # workers read a snapshot of the settings as they are now, including any unsaved changes.
+            self.temp_dir = QTemporaryDir()
+            self.settings_file_path = Path(self.temp_dir.path()) / "settings.json"
+            export_settings_to_file(self.settings_file_path)
+
+            # several smaller chunks per worker, so that workers finishing early can take on more.
+            chunk_size = max(1, math.ceil(len(remote_jobs) / (self.worker_count * 4)))
+            self.chunks = [remote_jobs[i:i+chunk_size] for i in range(0, len(remote_jobs), chunk_size)]
+
+            for i in range(min(self.worker_count, len(self.chunks))):
+                self._start_worker(runner)
+
+        QTimer.singleShot(0, self._run_next_local_job)
+
+    def cancel(self):
+        if self.cancelled:
+            return
+        self.cancelled = True
+        self.chunks.clear()
+        self.local_jobs.clear()
+        for worker in list(self.workers):
+            worker["process"].kill()
+
+    def _start_worker(self, runner):
+        chunk = self.chunks.pop(0)
+
+        args = ["-s", "QuickExport.headless", "--", "--worker", "--force", "--settings", str(self.settings_file_path)]
+        if self.create_missing_folders:
+            args.append("--create-folders")
+        args.extend(str(file_path) for settings_path, file_path in chunk)
+
+        process = QProcess(self)
+        worker = {"process":process, "jobs":{file_path:settings_path for settings_path, file_path in chunk}, "buffer":b"", "runner":runner}
+        self.workers.append(worker)
+
+        process.readyReadStandardOutput.connect(lambda w=worker: self._on_worker_ready_read(w))
+        process.finished.connect(lambda exit_code, exit_status, w=worker: self._on_worker_finished(w, exit_code))
+
+        logger.info(f"Parallel export: starting worker for {len(chunk)} files.")
+        process.start(str(runner), args)
+
+    def _on_worker_ready_read(self, worker):
+        worker["buffer"] += bytes(worker["process"].readAllStandardOutput())
+        *lines, worker["buffer"] = worker["buffer"].split(b"\n")
+        for line in lines:
+            self._handle_worker_line(worker, line)
+
+    def _handle_worker_line(self, worker, line):
+        line = line.strip()
+        if not line.startswith(b"{"):
+            # something other than a result, eg. output from Krita itself.
+            return
+
+        try:
+            report = json.loads(line)
+            file_path = Path(report["file"])
+        except (ValueError, KeyError, TypeError):
+            return
+
+        settings_path = worker["jobs"].pop(file_path, None)
+        if settings_path is None:
+            return
+
+        export_path = Path(report["output"]) if report.get("output") else None
+        status = report.get("status", "failed")
+
+        if status == "exported" and settings_path in qe_settings:
+            for output in output_settings(qe_settings[settings_path]):
+                export_manifest.record(file_path, export_file_path(output, file_path), export_settings_hash(output))
+
+        self._add_result(settings_path, file_path, export_path, status, report.get("message", ""))
+
+    def _on_worker_finished(self, worker, exit_code):
+        self._on_worker_ready_read(worker)
+        if worker["buffer"]:
+            self._handle_worker_line(worker, worker["buffer"])
+            worker["buffer"] = b""
+
+        self.workers.remove(worker)
+
+        if not self.cancelled:
+            for file_path, settings_path in worker["jobs"].items():
+                self._add_result(settings_path, file_path, None, "failed", f"Worker process exited with code {exit_code} before exporting file.")
+
+            if self.chunks:
+                self._start_worker(worker["runner"])
+
+        self._check_finished()
+
+    def _run_next_local_job(self):
+        if self.local_jobs and not self.cancelled:
+            settings_path, file_path = self.local_jobs.pop(0)
+            status, export_path, message = export_file(settings_path, file_path, self.skip_unchanged, "always" if self.create_missing_folders else "never")
+            self._add_result(settings_path, file_path, export_path, status, message)
+            QTimer.singleShot(0, self._run_next_local_job)
+            return
+
+        self._check_finished()
+
+    def _add_result(self, settings_path, file_path, export_path, status, message):
+        if status == "failed":
+            logger.warning(f"Parallel export: {file_path} failed: {message}")
+        else:
+            logger.info(f"Parallel export: {file_path} -> {export_path} ({status})")
+        self.results.append({"settings_path":settings_path, "file_path":file_path, "export_path":export_path, "status":status, "message":message})
+        self.progress.emit(len(self.results), len(self.jobs), file_path.name)
+
+    def _check_finished(self):
+        if not self.running or self.workers or self.local_jobs or self.chunks:
+            return
+        self.running = False
+        export_manifest.save()
+        self.temp_dir = None
+        self.finished.emit(self.results)
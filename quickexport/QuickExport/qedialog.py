@@ -5,8 +5,6 @@ from PyQt5.QtWidgets import (QLabel, QDialog, QHBoxLayout, QVBoxLayout,
                              QSpinBox, QGraphicsOpacityEffect,
                              QSplitter, QSplitterHandle)
 from PyQt5.QtCore import Qt, QEvent
-from PyQt5.QtGui import QPixmap
-import zipfile
 from pathlib import Path
 import krita
 
@@ -17,6 +15,7 @@ from .utils import *
 from .qewidgets import QEMenu, ResizingPixmapLabel
 from .qefilterwidgets import FolderFilterButton
 from .qetree import QETree
+from .thumbnails import thumbnail_cache
 
 app = Krita.instance()
 
@@ -124,7 +123,7 @@ class QEDialog(QDialog):
         #self.tree.sortByColumn(QECols.OPEN_FILE_COLUMN, Qt.AscendingOrder)
         
         if self.filter_edit.text():
-            self.tree._on_filter_edit_text_changed(self.filter_edit.text())
+            self.tree.set_filter_text(self.filter_edit.text())
         
         if (included_folders := self.folder_filter_button.includedFolders()):
             self._on_folder_filter_button_filter_changed()
@@ -211,6 +210,32 @@ class QEDialog(QDialog):
         self.basic_export_settings_container.setContentsMargins(self.basic_export_settings_container.contentsMargins() / 2)
         basic_export_settings_container_layout.setContentsMargins(basic_export_settings_container_layout.contentsMargins() / 2)
 
+        basic_export_settings_outputs_container = QWidget()
+        basic_export_settings_outputs_container_layout = QHBoxLayout(basic_export_settings_outputs_container)
+        basic_export_settings_outputs_container_layout.setAlignment(Qt.AlignLeft)
+        basic_export_settings_outputs_container.setContentsMargins(0,0,0,0)
+        basic_export_settings_outputs_container_layout.setContentsMargins(0,0,0,0)
+
+        self.current_output = 0
+        self.basic_export_settings_output = QComboBox()
+        self.basic_export_settings_output.setToolTip("Each project or folder can be exported to several outputs at once, each with its own\n"
+                                                     "name, type, location and scale. The settings below are for the chosen output.")
+        self.basic_export_settings_output.addItem("Output 1")
+        basic_export_settings_outputs_container_layout.addWidget(self.basic_export_settings_output)
+        self.basic_export_settings_output_add = QToolButton()
+        self.basic_export_settings_output_add.setIcon(app.icon("list-add"))
+        self.basic_export_settings_output_add.setToolTip("Add an output, starting as a copy of the chosen one.")
+        basic_export_settings_outputs_container_layout.addWidget(self.basic_export_settings_output_add)
+        self.basic_export_settings_output_remove = QToolButton()
+        self.basic_export_settings_output_remove.setIcon(app.icon("list-remove"))
+        self.basic_export_settings_output_remove.setToolTip("Remove the chosen output.")
+        basic_export_settings_outputs_container_layout.addWidget(self.basic_export_settings_output_remove)
+        self.basic_export_settings_output_configure = QToolButton()
+        self.basic_export_settings_output_configure.setIcon(app.icon("configure"))
+        self.basic_export_settings_output_configure.setToolTip("Configure export settings for the chosen output's file type.\n"
+                                                               "Other outputs use the first output's export settings until configured separately.")
+        basic_export_settings_outputs_container_layout.addWidget(self.basic_export_settings_output_configure)
+
         basic_export_settings_file_container = QWidget()
         basic_export_settings_file_container_layout = QHBoxLayout(basic_export_settings_file_container)
         basic_export_settings_file_container.setContentsMargins(0,0,0,0)
@@ -232,6 +257,10 @@ class QEDialog(QDialog):
             self.update_show_extensions_in_list_for_type(ext, ext in visible_extensions)
         self.basic_export_settings_file_type.setSizePolicy(QSizePolicy.Maximum, QSizePolicy.Preferred)
         basic_export_settings_file_container_layout.addWidget(self.basic_export_settings_file_type)
+        self.basic_export_settings_export_on_save = QCheckBox("Export on save")
+        self.basic_export_settings_export_on_save.setToolTip("Export automatically whenever the project is saved.\n"
+                                                             "Saves in quick succession are exported once, see 'Time between exports on save' in the options menu.")
+        basic_export_settings_file_container_layout.addWidget(self.basic_export_settings_export_on_save)
 
         basic_export_settings_folder_container = QWidget()
         basic_export_settings_folder_container_layout = QHBoxLayout(basic_export_settings_folder_container)
@@ -376,7 +405,13 @@ class QEDialog(QDialog):
         self.basic_export_settings_scale_h_mode.currentIndexChanged.connect(self._on_basic_export_settings_scale_h_mode_current_index_changed)
         self.basic_export_settings_scale_keep_proportions.toggled.connect(self.update_export_settings_from_widgets_no_args)
         self.basic_export_settings_scale_filter.currentIndexChanged.connect(self.update_export_settings_from_widgets_no_args)
+        self.basic_export_settings_export_on_save.toggled.connect(self.update_export_settings_from_widgets_no_args)
+        self.basic_export_settings_output.currentIndexChanged.connect(self._on_basic_export_settings_output_current_index_changed)
+        self.basic_export_settings_output_add.clicked.connect(self._on_basic_export_settings_output_add_clicked)
+        self.basic_export_settings_output_remove.clicked.connect(self._on_basic_export_settings_output_remove_clicked)
+        self.basic_export_settings_output_configure.clicked.connect(self._on_basic_export_settings_output_configure_clicked)
 
+        basic_export_settings_container_layout.addWidget(basic_export_settings_outputs_container)
         basic_export_settings_container_layout.addWidget(basic_export_settings_file_container)
         basic_export_settings_container_layout.addWidget(basic_export_settings_folder_container)
         basic_export_settings_container_layout.addWidget(basic_export_settings_scale_container)
@@ -523,6 +558,61 @@ class QEDialog(QDialog):
         create_export_folders_action = options_menu.addAction("Create missing folders at export")
         create_export_folders_action.setMenu(create_export_folders_menu)
         
+        skip_unchanged_exports_action = options_menu.addAction("Skip exports that are up to date")
+        skip_unchanged_exports_action.setToolTip("Don't export again if the project file, its export settings and the exported file haven't changed since the last export.\n" \
+                                                 "Images with unsaved changes are always exported.")
+        skip_unchanged_exports_action.setCheckable(True)
+        skip_unchanged_exports_action.setChecked(str2qtcheckstate(readSetting("skip_unchanged_exports")))
+        skip_unchanged_exports_action.toggled.connect(lambda checked: writeSetting("skip_unchanged_exports", bool2str(checked)))
+        
+        background_export_action = options_menu.addAction("Export in the background")
+        background_export_action.setToolTip("Quick export 8-bit RGBA images to PNG or JPEG in the background, so that you can keep working while they're written.\n" \
+                                            "Scaling and encoding are done by Qt instead of Krita, so only the main export options are used.")
+        background_export_action.setCheckable(True)
+        background_export_action.setChecked(str2qtcheckstate(readSetting("background_export")))
+        background_export_action.toggled.connect(lambda checked: writeSetting("background_export", bool2str(checked)))
+        
+        batch_export_processes_menu = QEMenu()
+
+        batch_export_processes_action_group = QActionGroup(batch_export_processes_menu)
+        batch_export_processes_action_group.triggered.connect(lambda action: writeSetting("batch_export_processes", action.data()))
+
+        cpu_count = os.cpu_count() or 1
+        for count in sorted({1, 2, 4, 8, cpu_count}):
+            text = str(count)
+            if count == 1:
+                text += " (export in this Krita)"
+            elif count == cpu_count:
+                text += " (one per CPU core)"
+            batch_export_processes_action = batch_export_processes_menu.addAction(text)
+            batch_export_processes_action.setData(str(count))
+            batch_export_processes_action.setActionGroup(batch_export_processes_action_group)
+            batch_export_processes_action.setCheckable(True)
+            batch_export_processes_action.setChecked(str2qtcheckstate(readSetting("batch_export_processes"), str(count)))
+
+        batch_export_processes_action = options_menu.addAction("Export all with processes")
+        batch_export_processes_action.setToolTip("Number of Krita processes to use when exporting all configured projects.\n" \
+                                                 "With more than one, files are exported in background Krita instances running in parallel, " \
+                                                 "except images open here with unsaved changes.")
+        batch_export_processes_action.setMenu(batch_export_processes_menu)
+        
+        export_on_save_interval_menu = QEMenu()
+
+        export_on_save_interval_action_group = QActionGroup(export_on_save_interval_menu)
+        export_on_save_interval_action_group.triggered.connect(lambda action: writeSetting("export_on_save_interval", action.data()))
+
+        for seconds in (0, 2, 5, 10, 30):
+            export_on_save_interval_action = export_on_save_interval_menu.addAction(f"{seconds} seconds" if seconds else "No minimum")
+            export_on_save_interval_action.setData(str(seconds))
+            export_on_save_interval_action.setActionGroup(export_on_save_interval_action_group)
+            export_on_save_interval_action.setCheckable(True)
+            export_on_save_interval_action.setChecked(str2qtcheckstate(readSetting("export_on_save_interval"), str(seconds)))
+
+        export_on_save_interval_action = options_menu.addAction("Time between exports on save")
+        export_on_save_interval_action.setToolTip("Minimum time between automatic exports of a project that has 'Export on save' enabled.\n" \
+                                                  "Saves made sooner are exported together once the time is up.")
+        export_on_save_interval_action.setMenu(export_on_save_interval_menu)
+        
         options_menu.addSeparator()
         
         # auto save settings on close button.
@@ -558,6 +648,11 @@ class QEDialog(QDialog):
                 
         options_menu.addSeparator()
         
+        export_settings_to_file_action = options_menu.addAction("Export settings to file...")
+        export_settings_to_file_action.setToolTip("Save a copy of the current export settings to a file,\n" \
+                                                  "for use with the headless export runner (kritarunner -s QuickExport.headless --settings FILE).")
+        export_settings_to_file_action.triggered.connect(self._on_export_settings_to_file_action_triggered)
+        
         if False:
             wide_column_resize_grabber_action = options_menu.addAction("Wider grabber for resizing columns")
             wide_column_resize_grabber_action.setToolTip("The regions in the header where you can click and drag to resize columns will be twice as wide.\n" \
@@ -629,7 +724,7 @@ class QEDialog(QDialog):
         writeSetting("dialogWidth", str(self.size().width()))
         writeSetting("dialogHeight", str(self.size().height()))
         
-        #self.tree.thumbnail_worker.close()
+        self.tree.thumbnail_worker.close()
         
         self.tree_container_layout.removeWidget(self.tree)
         WidgetBin.addWidget(self.tree)
@@ -657,7 +752,6 @@ class QEDialog(QDialog):
     def _on_folder_filter_button_filter_changed(self):
         self.tree.model.setIncludedFolders(self.folder_filter_button.includedFolders())
         self.tree.model.invalidateFilter()
-        self.tree.add_buttons_for_all_rows()
 
     def _on_auto_save_on_close_action_toggled(self, checked):
         writeSetting("auto_save_on_close", bool2str(checked))
@@ -692,6 +786,17 @@ class QEDialog(QDialog):
         writeSetting("default_export_unsaved", bool2str(checked))
         extension().update_quick_export_display()
 
+    def _on_export_settings_to_file_action_triggered(self, checked):
+        file = FileDialog.getSaveFileName(self, "Export settings to file", str(Path.home() / "quickexport_settings.json"), "Settings file (*.json)", None, "QE_ExportSettingsToFile")
+        if not file:
+            return
+        try:
+            export_settings_to_file(Path(file))
+        except OSError as e:
+            QMessageBox.critical(self, "Quick Export", f"Couldn't export settings to '{file}':\n{e}")
+            return
+        self.sbar.showMessage(f"Settings exported to '{file}'.", 2500)
+
     def _on_show_extensions_in_list_menu_triggered(self, action):
         self.update_show_extensions_in_list_for_type(action.text(), action.isChecked())
         self.post_update_show_extensions_in_list()
@@ -735,6 +840,7 @@ class QEDialog(QDialog):
         self.tree.header().setStyle(self.tree.wide_header_style if checked else self.tree.style())
 
     def _on_revert_button_clicked(self, checked):
+        self.tree.thumbnail_worker.close()
         self.tree_container_layout.removeWidget(self.tree)
         WidgetBin.addWidget(self.tree)
         QETree.instance = None
@@ -760,8 +866,9 @@ class QEDialog(QDialog):
         result = FileDialog.getExistingDirectory(self, "Locate folder", str(start_path), "QE_AddFolderToTree" if not force_use_start_path else None)
         if not result:
             return
-        item = self.tree.add_folder_to_tree(Path(result))
-        self.tree.selectionModel().select(self.tree.model.mapFromSource(item.index()), QItemSelectionModel.ClearAndSelect)
+        node = self.tree.add_folder_to_tree(Path(result))
+        index = self.tree.source_model.index_for_node(node)
+        self.tree.selectionModel().select(self.tree.model.mapFromSource(index), QItemSelectionModel.ClearAndSelect)
 
     def _on_add_project_action_triggered(self, start_path = None, force_use_start_path = False):
         start_path = start_path or Path(app.activeDocument().fileName()).parent if app.activeDocument() else Path.home()
@@ -774,14 +881,13 @@ class QEDialog(QDialog):
         file = Path(file)
         base = base_stem_and_version_number_for_versioned_file(file)[0]
         path = file.parent / base
-        item = self.tree.add_base_to_tree(path)
-        self.tree.expand(self.tree.model.mapFromSource(item.parent().index()))
-        self.tree.selectionModel().select(self.tree.model.mapFromSource(item.index()), QItemSelectionModel.ClearAndSelect)
+        node = self.tree.add_base_to_tree(path)
+        index = self.tree.source_model.index_for_node(node)
+        self.tree.expand(self.tree.model.mapFromSource(index.parent()))
+        self.tree.selectionModel().select(self.tree.model.mapFromSource(index), QItemSelectionModel.ClearAndSelect)
 
     def _on_tree_source_model_data_changed(self, topLeft, bottomRight, roles):
-        # TODO: restrict save string update to affected items.
-        for path in qe_settings.keys():
-            generate_save_string(path)
+        # save strings of changed entries are updated where they're changed (see mark_settings_modified).
         self.update_save_button()
 
     def _on_tree_selection_changed(self, selected, deselected):
@@ -792,6 +898,9 @@ class QEDialog(QDialog):
         
         model = self.tree.model
         
+        # start from the first output of each newly selected item.
+        self.current_output = 0
+        
         if len(rows) == 1:
             self.basic_export_settings_container.setDisabled(False)
             
@@ -832,13 +941,9 @@ class QEDialog(QDialog):
         if path.exists() and path.is_file():
             # file.
             file_to_use = path
-        elif path.parent.exists():
+        else:
             # project.
-            sorted_list = sorted(path.parent.glob(f"{path.name}*.kra"), key = lambda file: Path(file).stat().st_mtime)
-            for file in sorted_list:
-                file_base = base_stem_and_version_number_for_versioned_file(file)[0]
-                if path.stem == file_base:
-                    file_to_use = file
+            file_to_use = latest_file_for_project(path)
         
         if file_to_use:
             if file_to_use == self.big_thumbnail_file:
@@ -846,9 +951,11 @@ class QEDialog(QDialog):
                     #print(f"set_big_thumbnail from {file_to_use}: already loaded")
                     return
             #print(f"set_big_thumbnail from {file_to_use} at {self.preferred_big_thumbnail_height*2}px")
-            thumb = _make_thumbnail_for_file(file_to_use)
-            icon = square_thumbnail(thumb, self.preferred_big_thumbnail_height*2)
-            self.big_thumbnail.setPixmap(icon)
+            size = self.preferred_big_thumbnail_height*2
+            thumb = thumbnail_cache.pixmap(file_to_use, size)
+            if thumb is None:
+                thumb = app.icon('window-close').pixmap(size, size)
+            self.big_thumbnail.setPixmap(thumb)
             self.big_thumbnail_file = file_to_use
             self.big_thumbnail_st_mtime = file_to_use.stat().st_mtime
         else:
@@ -887,9 +994,13 @@ class QEDialog(QDialog):
                 return
             settings = qe_settings[settings_path]
         
-        output_path = export_file_path(settings, path, item_type=item_type)
+        output_paths = [export_file_path(output, path, item_type=item_type) for output in output_settings(settings)]
+        output_path = output_paths[min(self.current_output, len(output_paths)-1)]
         
-        self.basic_export_settings_output_path.setText(str(output_path))
+        if output_paths.count(output_path) > 1:
+            self.basic_export_settings_output_path.setText(f"{output_path} (same as another output, one will overwrite the other)")
+        else:
+            self.basic_export_settings_output_path.setText(str(output_path))
         self.basic_export_settings_output_path.setDisabled(False)
 
         #print("--update_basic_export_settings_output_path_label--")
@@ -897,6 +1008,53 @@ class QEDialog(QDialog):
             #print(x, y, qe_settings[y])
         #print("--")
 
+    def selected_output_settings(self, settings):
+        outputs = output_settings(settings)
+        return outputs[min(self.current_output, len(outputs)-1)]
+    
+    def current_settings_path(self):
+        index = self.tree.selectionModel().currentIndex()
+        if not index.isValid():
+            return None
+        path = self.tree.model.mapToSource(index).data(PathRole)
+        return path if path in qe_settings else None
+    
+    def _on_basic_export_settings_output_current_index_changed(self, index):
+        if suppress_store_on_widget_edit or index < 0:
+            return
+        self.current_output = index
+        if (path := self.current_settings_path()):
+            self.set_basic_export_settings_controls_for_path(path)
+    
+    def _on_basic_export_settings_output_add_clicked(self, checked):
+        if not (path := self.current_settings_path()):
+            return
+        settings = qe_settings[path]
+        export = settings["outputs_export"][self.current_output-1] if self.current_output > 0 else None
+        s_basic = deepcopy(self.selected_output_settings(settings)["basic"])
+        make_output_file_name_distinct(settings, s_basic)
+        settings.add_output(s_basic, export)
+        mark_settings_modified(path)
+        self.current_output = len(settings["outputs"])
+        self.set_basic_export_settings_controls_for_path(path)
+        self.update_save_button()
+    
+    def _on_basic_export_settings_output_remove_clicked(self, checked):
+        if not (path := self.current_settings_path()) or self.current_output == 0:
+            return
+        settings = qe_settings[path]
+        settings.remove_output(self.current_output-1)
+        mark_settings_modified(path)
+        self.current_output -= 1
+        self.set_basic_export_settings_controls_for_path(path)
+        self.update_save_button()
+    
+    def _on_basic_export_settings_output_configure_clicked(self, checked):
+        if not (path := self.current_settings_path()):
+            return
+        if self.tree.configure_export(path, self.selected_output_settings(qe_settings[path])["basic"]["ext"], self.current_output):
+            self.update_save_button()
+    
     def update_export_settings_from_widgets_no_args(self):
         # can be connected to by signals to call update_export_settings_from_widgets
         # without passing parameters like checked, index, text etc. on to it
@@ -940,8 +1098,9 @@ class QEDialog(QDialog):
         scale_h_mode = self.basic_export_settings_scale_h_mode.currentIndex()
         scale_keep_aspect = self.basic_export_settings_scale_keep_proportions.isChecked()
         scale_filter = self.basic_export_settings_scale_filter.currentIndex()
+        export_on_save = self.basic_export_settings_export_on_save.isChecked()
         
-        s_basic = settings["basic"]
+        s_basic = self.selected_output_settings(settings)["basic"]
         s_basic["file_name_source"] = file_name_source_index
         s_basic["file_name_custom"] = file_name_custom
         s_basic["ext"] = output_extension
@@ -957,8 +1116,10 @@ class QEDialog(QDialog):
         s_basic["scale_height_mode"] = scale_h_mode
         s_basic["scale_keep_aspect"] = scale_keep_aspect
         s_basic["scale_filter"] = scale_filter
+        if self.current_output == 0:
+            s_basic["export_on_save"] = export_on_save
         
-        generate_save_string(path)
+        mark_settings_modified(path)
         self.update_save_button()
 
     def _on_basic_export_settings_file_name_current_index_changed(self, index):
@@ -1037,10 +1198,18 @@ class QEDialog(QDialog):
                 self.basic_export_settings_output_path.setDisabled(True)
                 return
         
-        s_basic = qe_settings[path]["basic"]
+        outputs = output_settings(qe_settings[path])
+        s_basic = self.selected_output_settings(qe_settings[path])["basic"]
         
         suppress_store_on_widget_edit = True
         
+        self.basic_export_settings_output.clear()
+        self.basic_export_settings_output.addItems([f"Output {i+1}" for i in range(len(outputs))])
+        self.basic_export_settings_output.setCurrentIndex(min(self.current_output, len(outputs)-1))
+        self.basic_export_settings_output_remove.setEnabled(self.current_output > 0)
+        # exporting on save is for the whole entry, so only set on its first output.
+        self.basic_export_settings_export_on_save.setEnabled(self.current_output == 0)
+        
         self.basic_export_settings_file_name.setCurrentIndex(s_basic["file_name_source"])
         self.basic_export_settings_file_name_custom.setText(s_basic["file_name_custom"])
         self.basic_export_settings_file_type.setCurrentText(s_basic["ext"])
@@ -1056,6 +1225,7 @@ class QEDialog(QDialog):
         self.basic_export_settings_scale_h_mode.setCurrentIndex(s_basic["scale_height_mode"])
         self.basic_export_settings_scale_keep_proportions.setChecked(s_basic["scale_keep_aspect"])
         self.basic_export_settings_scale_filter.setCurrentIndex(s_basic["scale_filter"])
+        self.basic_export_settings_export_on_save.setChecked(qe_settings[path]["basic"]["export_on_save"])
         
         #print("--set_basic_export_settings_controls_for_path--")
         #for x,y in enumerate(qe_settings):
@@ -1119,25 +1289,3 @@ class QEDialog(QDialog):
     def _on_tree_removing_folder(self, path):
         self.folder_filter_button.remove_folder_from_tree(path)
         #print(f"_on_tree_removing_folder: {path=}")
-
-def _make_thumbnail_for_file(path):
-    thumbnail = QPixmap()
-    extension = path.suffix
-    try:
-        if extension == '.kra':
-            page = zipfile.ZipFile(path, "r")
-            thumbnail.loadFromData(page.read("preview.png"))
-        else:
-            thumbnail = QPixmap(str(path))
-    except FileNotFoundError:
-        pass#print(f"file '{path}' not found.")
-    except Exception as e:
-        logger.warning(f"error trying to read file '{path}'. the error is:\n{type(e).__name__}: {e}")
-
-    if thumbnail.isNull():
-        # TODO: make and return only one copy of the not-found icon.
-        #print(f"couldn't make thumbnail for file '{path}'.")
-        size = QEDialog.instance.preferred_big_thumbnail_height*2
-        thumbnail = app.icon('window-close').pixmap(size,size)
-    
-    return thumbnail
@@ -1,58 +1,25 @@
-from PyQt5.QtWidgets import (QWidget, QDialog, QDialogButtonBox, QMessageBox,
+from PyQt5.QtWidgets import (QDialog, QDialogButtonBox, QMessageBox,
                              QMenu, QVBoxLayout, QHBoxLayout, QGroupBox, QCheckBox,
                              QAbstractItemView, QTreeView, QStyledItemDelegate,
-                             QStyle, QHeaderView, QToolButton, QApplication)
-from PyQt5.QtGui import QStandardItemModel, QStandardItem, QIcon, QPixmap
-from PyQt5.QtCore import Qt, QModelIndex, QSortFilterProxyModel, QTimer, QItemSelection
-import zipfile
+                             QStyle, QStyleOptionToolButton, QHeaderView, QToolButton, QApplication)
+from PyQt5.QtGui import QIcon
+from PyQt5.QtCore import Qt, QAbstractItemModel, QModelIndex, QPersistentModelIndex, QSortFilterProxyModel, QTimer, QItemSelection, QRect
 from copy import deepcopy
 from pathlib import Path
+from array import array
 from krita import Krita, InfoObject, FileDialog
 
 import logging
 logger = logging.getLogger("tomjk_quickexport")
 
 from .utils import *
+from .thumbnails import thumbnail_cache, ThumbnailWorker, pixmap_from_thumbnail_image
 app = Krita.instance()
 app_notifier = app.notifier()
 
 tree_icon_size = QApplication.style().pixelMetric(QStyle.PM_SmallIconSize)
 
 
-# borrowed from the Last Documents Docker.
-def _make_thumbnail_for_file(path):
-    if not str2bool(readSetting("show_thumbnails_in_tree")):
-        if path.exists():
-            thumbnail = app.icon('view-preview').pixmap(64,64)
-        else:
-            thumbnail = app.icon('window-close').pixmap(64,64)
-        return thumbnail
-    
-    thumbnail = QPixmap()
-    extension = path.suffix
-    try:
-        if extension == '.kra':
-            page = zipfile.ZipFile(path, "r")
-            thumbnail.loadFromData(page.read("preview.png"))
-        else:
-            thumbnail = QPixmap(str(path))
-    except FileNotFoundError:
-        pass#print(f"file '{path}' not found.")
-    except Exception as e:
-        logger.warning(f"error trying to read file '{path}'. the error is:\n{type(e).__name__}: {e}")
-
-    if thumbnail.isNull():
-        # TODO: make and return only one copy of the not-found icon.
-        #print(f"couldn't make thumbnail for file '{path}'.")
-        thumbnail = app.icon('window-close').pixmap(64,64)#self.thumb_height, self.thumb_height)
-
-    #thumb_size = QSize(int(self.thumb_height*self.devicePixelRatioF()), int(self.thumb_height*self.devicePixelRatioF()))
-    #thumbnail = thumbnail.scaled(thumb_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-    #thumbnail.setDevicePixelRatio(self.devicePixelRatioF()) # TODO: should do for doc.thumbnail thumbs too?
-    #self.apply_thumbnail(item, thumbnail)
-    return thumbnail
-
-
 class PasteDialog(QDialog):
     last_used = {"overwrite_only":True, "name":False, "type":False, "location":False, "scale":False, "export_settings":True, "type_export_settings":{}}
     
@@ -173,119 +140,33 @@ class PasteDialog(QDialog):
         return self.last_used
 
 
-class TreeButton(QToolButton):
-    def __init__(self, role, path, item_type, icon, item=None, item2=None, tree=None, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.role = role
-        self.path = path
-        self.item_type = item_type
-        self.item = item
-        self.item2 = item2
-        self.tree = tree
-        self.setIcon(icon)
-        self.setAutoRaise(True)
-        self.clicked.connect(self._on_clicked)
-
-    def _on_clicked(self):
-        #print("clicked", self.role, self.path)
-        
-        if self.role == "del":
-            l = self.parent().layout()
-            if self.path not in qe_settings:
-                qe_settings[self.path] = default_settings(path=self.path, node_type=self.item_type)
-                self.setIcon(app.icon("edit-delete"))
-                l.itemAt(1).widget().show()
-            else:
-                del qe_settings[self.path]
-                self.setIcon(app.icon("list-add"))
-                l.itemAt(1).widget().hide()
-            
-            self.item.model().dataChanged.emit(self.item.index(), self.item2.index())
-            self.tree.selectionModel().selectionChanged.emit(QItemSelection(), QItemSelection())
-        
-        elif self.role == "opn":
-            if self.item_type == QEItemType.FOLDER:
-                open_folder_in_file_browser(self.path)
-            else:
-                path = self.path
-                if self.item_type == QEItemType.PROJECT:
-                    if self.item.rowCount() > 0:
-                        item_of_latest_file = self.item.child(self.item.rowCount()-1)
-                        path = item_of_latest_file.data(PathRole)
-                
-                if (doc := app.openDocument(str(path))):
-                    app.activeWindow().addView(doc)
-                    doc.waitForDone()
-        
-        elif self.role == "cfg":
-            extension = qe_settings[self.path]["basic"]["ext"]
-            
-            if extension in configless_extensions():
-                self.tree.requestShowMessage.emit(f"Exports to {extension} don't require a config.", 2000)
-                return
-            
-            ext_key = extension[1:]
-            
-            if ext_key in config_aliases():
-                ext_key = config_aliases()[ext_key]
-            
-            plugin_dir = Path(app.getAppDataLocation()) / "pykrita" / "QuickExport"
-
-            # save current "create new document" dialog defaults.
-            new_doc_width = app.readSetting("", "imageWidthDef", "")
-            new_doc_height = app.readSetting("", "imageHeightDef", "")
-            new_doc_res = app.readSetting("", "imageResolutionDef", "")
-            new_doc_color_depth = app.readSetting("", "colorDepthDef", "")
-            new_doc_color_model = app.readSetting("", "colorModelDef", "")
-            new_doc_color_profile = app.readSetting("", "colorProfileDef", "")
-
-            doc = app.createDocument(2,2,"QuickExportDummyDoc","RGBA","U8","",72.0)
-
-            # restore defaults.
-            app.writeSetting("", "imageWidthDef", new_doc_width)
-            app.writeSetting("", "imageHeightDef", new_doc_height)
-            app.writeSetting("", "imageResolutionDef", new_doc_res)
-            app.writeSetting("", "colorDepthDef", new_doc_color_depth)
-            app.writeSetting("", "colorModelDef", new_doc_color_model)
-            app.writeSetting("", "colorProfileDef", new_doc_color_profile)
-            
-            dummy_file_name = "ExportDummy" + extension
-            
-            info = InfoObject()
-            
-            s_export = qe_settings[self.path]["export"]
-            if ext_key in s_export:
-                for k,v in s_export[ext_key].items():
-                    info.setProperty(k, v)
-            
-            result = doc.exportImage(str(plugin_dir / dummy_file_name), info)
-            #print(f"{result=}, {info=}, {info.properties()=}")
-            
-            if result:
-                #print("BEFORE:")
-                #print(qe_settings[self.path])
-                
-                qe_settings[self.path]["export"][ext_key] = info.properties()
-                
-                #print("AFTER:")
-                #print(qe_settings[self.path])
-                
-                self.item.model().dataChanged.emit(self.item.index(), self.item2.index())
-
-            doc.waitForDone()
-            doc.close()
-            #print(doc)
-
-
 row_height = -1
 
 class ItemDelegate(QStyledItemDelegate):
     """
         QModelIndex: source model index of item.
-        QStandardItem: the renamed item.
         str: new name.
     """
-    commitItemRename = pyqtSignal(QModelIndex, QStandardItem, str)
+    commitItemRename = pyqtSignal(QModelIndex, str)
+    
+    # the row buttons in the second column, in order. they're painted here
+    # rather than being widgets, and clicks are passed on by the tree.
+    button_roles = ("del", "cfg", "opn")
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        global row_height
+        
+        measure_button = QToolButton()
+        measure_button.setIcon(app.icon("edit-delete"))
+        measure_button.setAutoRaise(True)
+        self.button_size = measure_button.sizeHint()
+        self.button_icon_size = measure_button.iconSize()
+        row_height = self.button_size.height()
+        
+        # (QPersistentModelIndex, role) of button under mouse and button held down.
+        self.hover_button = None
+        self.pressed_button = None
     
     def sizeHint(self, option, index):
         global row_height
@@ -293,8 +174,50 @@ class ItemDelegate(QStyledItemDelegate):
         size = super().sizeHint(option, index)
         if row_height != -1:
             size.setHeight(row_height)
+        if index.column() == 1:
+            size.setWidth(self.button_size.width() * len(self.button_roles))
         return size
     
+    def buttons_for_index(self, index, rect):
+        """
+        return list of (role, icon, rect) for buttons shown in the row of index,
+        a second column index, laid out in rect. hidden buttons keep their space.
+        """
+        item_index = index.siblingAtColumn(0)
+        path = item_index.data(PathRole)
+        item_type = item_index.data(ItemTypeRole)
+        stored = path in qe_settings
+        
+        buttons = []
+        x = rect.left()
+        y = rect.top() + (rect.height() - self.button_size.height()) // 2
+        for role in self.button_roles:
+            button_rect = QRect(x, y, self.button_size.width(), self.button_size.height())
+            x += self.button_size.width()
+            if role == "del":
+                if item_type == QEItemType.FILE:
+                    continue
+                icon = app.icon("edit-delete") if stored else app.icon("list-add")
+            elif role == "cfg":
+                if item_type == QEItemType.FILE or not stored:
+                    continue
+                icon = app.icon("configure")
+            else:
+                icon = app.icon("document-open")
+            buttons.append((role, icon, button_rect))
+        return buttons
+    
+    def button_at(self, index, rect, pos):
+        """
+        return role of button at pos in the row of index, or None.
+        """
+        if index.column() != 1:
+            return None
+        for role, icon, button_rect in self.buttons_for_index(index, rect):
+            if button_rect.contains(pos):
+                return role
+        return None
+    
     def paint(self, painter, option, index):
         #print(index.row(), index.column(), index.model(), model, source_model, model_root, model.mapToSource(index.parent()), PathRole, model.data(index, PathRole))
         painter.save()
@@ -302,16 +225,40 @@ class ItemDelegate(QStyledItemDelegate):
             painter.setOpacity(0.5)
         super().paint(painter, option, index)
         painter.restore()
+        
+        if index.column() == 1:
+            self.paint_buttons(painter, option, index)
+    
+    def paint_buttons(self, painter, option, index):
+        widget = option.widget
+        style = widget.style() if widget else QApplication.style()
+        persistent_index = QPersistentModelIndex(index)
+        
+        for role, icon, button_rect in self.buttons_for_index(index, option.rect):
+            button_option = QStyleOptionToolButton()
+            if widget:
+                button_option.initFrom(widget)
+            button_option.rect = button_rect
+            button_option.icon = icon
+            button_option.iconSize = self.button_icon_size
+            button_option.toolButtonStyle = Qt.ToolButtonIconOnly
+            button_option.subControls = QStyle.SC_ToolButton
+            button_option.activeSubControls = QStyle.SC_None
+            button_option.features = QStyleOptionToolButton.None_
+            button_option.state = QStyle.State_Enabled | QStyle.State_AutoRaise
+            if self.hover_button == (persistent_index, role):
+                button_option.state |= QStyle.State_MouseOver | QStyle.State_Raised
+                if self.pressed_button == (persistent_index, role):
+                    button_option.state |= QStyle.State_Sunken
+                    button_option.activeSubControls = QStyle.SC_ToolButton
+            style.drawComplexControl(QStyle.CC_ToolButton, button_option, painter, widget)
     
     def setModelData(self, editor, model, index):
         #print(f"setModelData {editor=} {model=} {index=}")
         
-        source_model = model.sourceModel()
-        
         source_index = model.mapToSource(index)
-        item = source_model.itemFromIndex(source_index)
         
-        old_text = item.data(Qt.DisplayRole)
+        old_text = source_index.data(Qt.DisplayRole)
         new_text = editor.text()
         
         if new_text == "":
@@ -336,17 +283,60 @@ class ItemDelegate(QStyledItemDelegate):
                 logger.info("tried to set project name to a path, which isn't allowed.")
                 return
         
-        self.commitItemRename.emit(source_index, item, new_text)
+        self.commitItemRename.emit(source_index, new_text)
 
 
 class MySortFilterProxyModel(QSortFilterProxyModel):
+    """
+    filters rows by folder and by a case-insensitive search text matched
+    anywhere in the row's path.
+    
+    each path's lowercase search key is made once and kept. whether a path
+    matches the current text is remembered too, so that when the text is
+    extended (eg. typing another letter), rows that didn't match before are
+    rejected without being checked again.
+    
+    a project whose file rows haven't been made yet (see QETreeModel)
+    matches if any of its version files do. forget_match must be called for
+    a project when its files or file rows change.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.includedFolders_ = None
+        self.filter_text = ""
+        self.search_keys = {}
+        self.matches = {}
+    
     def setIncludedFolders(self, paths):
-        self.includedFolders_ = paths
+        self.includedFolders_ = frozenset(paths) if paths else None
     
     def includedFolders(self):
-        if hasattr(self, "includedFolders_"):
-            return self.includedFolders_
-        return None
+        return self.includedFolders_
+    
+    def setFilterText(self, text):
+        text = text.lower()
+        
+        if text == self.filter_text:
+            return
+        
+        if self.filter_text in text:
+            # rows that didn't match the old text can't match the new one.
+            self.matches = {path:False for path, matched in self.matches.items() if not matched}
+        else:
+            self.matches = {}
+        
+        self.filter_text = text
+        self.invalidateFilter()
+    
+    def filterText(self):
+        return self.filter_text
+    
+    def forget_match(self, path):
+        """
+        forget whether path matched the search text, so it's checked again
+        next time its row is filtered.
+        """
+        self.matches.pop(path, None)
     
     def filterAcceptsRow(self, source_row, source_parent):
         #print(f"{self.includedFolders()=}")
@@ -354,30 +344,317 @@ class MySortFilterProxyModel(QSortFilterProxyModel):
         index = source_model.index(source_row, 0, source_parent)
         path = source_model.data(index, PathRole)
         #print(f"{sp}{source_row=} {source_parent=} {source_parent.model()=} {path=}")
-        item_type = source_model.data(index, ItemTypeRole)
         
         if not path:
             return False
         
-        if (folders := self.includedFolders()):
+        if (folders := self.includedFolders_):
+            item_type = source_model.data(index, ItemTypeRole)
             folder = path if item_type == QEItemType.FOLDER else path.parent
             if folder not in folders:
                 #print(f" {path} was not displayed.")
                 return False
         
-        if not self.filterRegExp().pattern():
+        if not self.filter_text:
             return True
         
-        matched = self.filterRegExp().indexIn(str(path))
-        #print(f"{sp} filterAcceptsRow: pattern={self.filterRegExp().pattern()}, {matched=} (length {self.filterRegExp().matchedLength()})")
+        matched = self.matches.get(path)
+        
+        if matched is None:
+            key = self.search_keys.get(path)
+            if key is None:
+                key = self.search_keys[path] = str(path).lower()
+            matched = self.filter_text in key
+            if not matched and source_model.canFetchMore(index):
+                # the project's file rows haven't been made, so check its files instead.
+                matched = any(self.filter_text in str(file).lower() for file in version_files_for_project(path))
+            self.matches[path] = matched
+        
+        return matched
+
+
+class QETreeModel(QAbstractItemModel):
+    """
+    two-column model of the tree's folder, project and file rows. the second
+    column has no data of its own, it's where the delegate paints the row
+    buttons.
     
-        if (type(matched) == int and matched > -1) or (type(matched) == bool and matched): # handles fixedstring or wildcard filtering.
-            return True
+    rows are nodes, numbered in the order they're added, and each node's
+    fields are kept in parallel arrays rather than in objects per row: its
+    path, type, parent node, row under its parent, icon (an index into a
+    table of the icons in use) and file count. node 0 is the invisible root.
+    the nodes of removed rows aren't reused, so a node number held on to
+    (eg. while a thumbnail loads) never comes to mean a different row.
     
-        if self.filterRegExp().matchedLength() > 0:
-            return True
+    project rows only get their file rows when first expanded, by calling
+    fetch_node with the project's node. until then, a project says it has
+    children if its file count (kept from the folder scan index, without
+    making any rows) is above 0.
+    
+    rows are also indexed by (parent node, path), so that finding a row by
+    path doesn't search its siblings. it's keyed by parent too as the same
+    path can be both a folder and a project (a folder named like a project
+    in its parent folder).
+    """
+    root = 0
+    
+    def __init__(self, fetch_node, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fetch_node = fetch_node
+        
+        self.paths = [None]
+        self.types = array("b", [QEItemType.INVALID])
+        self.parents = array("i", [-1])
+        self.rows = array("i", [0])
+        self.icons = array("i", [-1])
+        self.version_counts = array("i", [0])
+        self.fetched = array("b", [1])
+        # child nodes of each node in row order, or None if it has none.
+        self.children = [None]
+        self.nodes_by_path = {}
+        
+        self.icon_table = []
+        self.icon_handles = {}
+    
+    # node access.
+    
+    def node_for_index(self, index):
+        return index.internalId() if index.isValid() else self.root
+    
+    def index_for_node(self, node, column=0):
+        if node == self.root:
+            return QModelIndex()
+        return self.createIndex(self.rows[node], column, node)
+    
+    def is_valid_node(self, node):
+        return 0 < node < len(self.types) and self.types[node] != QEItemType.INVALID
+    
+    def path(self, node):
+        return self.paths[node]
+    
+    def item_type(self, node):
+        return self.types[node]
+    
+    def parent_node(self, node):
+        return self.parents[node]
+    
+    def row(self, node):
+        return self.rows[node]
+    
+    def child_nodes(self, node):
+        """
+        return list of the child nodes of node, in row order.
+        """
+        return list(self.children[node] or ())
+    
+    def child_for_path(self, parent, path):
+        """
+        return the child node of parent with path, or None if there isn't one.
+        """
+        return self.nodes_by_path.get((parent, path))
+    
+    def child_count(self, node):
+        return len(self.children[node] or ())
+    
+    def version_count(self, node):
+        return self.version_counts[node]
+    
+    def is_fetched(self, node):
+        return bool(self.fetched[node])
+    
+    def node_changed(self, node):
+        self.dataChanged.emit(self.index_for_node(node, 0), self.index_for_node(node, 1))
+    
+    def set_path(self, node, path):
+        self._unindex_node(node)
+        self.paths[node] = path
+        self.nodes_by_path[(self.parents[node], path)] = node
+        self.node_changed(node)
+    
+    def _unindex_node(self, node):
+        key = (self.parents[node], self.paths[node])
+        if self.nodes_by_path.get(key) == node:
+            del self.nodes_by_path[key]
+    
+    def set_icon(self, node, key, make_icon):
+        """
+        set the icon of node to the one for key (eg. an icon name, or a
+        thumbnail image's cacheKey), made with make_icon() if it isn't in use yet.
+        """
+        handle = self.icon_handles.get(key)
+        if handle is None:
+            handle = self.icon_handles[key] = len(self.icon_table)
+            self.icon_table.append(make_icon())
+        if self.icons[node] != handle:
+            self.icons[node] = handle
+            self.node_changed(node)
+    
+    def set_version_count(self, node, count):
+        if self.version_counts[node] != count:
+            self.version_counts[node] = count
+            self.node_changed(node)
+    
+    def set_fetched(self, node):
+        self.fetched[node] = 1
+    
+    def add_nodes(self, parent, entries):
+        """
+        add a row under parent for each (path, item type) in entries, with
+        one insert notification. returns list of the new nodes.
+        """
+        if not entries:
+            return []
+        
+        siblings = self.children[parent]
+        if siblings is None:
+            siblings = self.children[parent] = []
+        first = len(siblings)
+        nodes = list(range(len(self.types), len(self.types) + len(entries)))
+        
+        self.beginInsertRows(self.index_for_node(parent), first, first + len(entries) - 1)
+        for row, (path, item_type) in enumerate(entries, first):
+            self.paths.append(path)
+            self.types.append(item_type)
+            self.parents.append(parent)
+            self.rows.append(row)
+            self.icons.append(-1)
+            self.version_counts.append(0)
+            # only projects have rows to fetch.
+            self.fetched.append(item_type != QEItemType.PROJECT)
+            self.children.append(None)
+            self.nodes_by_path[(parent, path)] = len(self.types) - 1
+        siblings.extend(nodes)
+        self.endInsertRows()
+        
+        return nodes
+    
+    def add_node(self, parent, path, item_type):
+        return self.add_nodes(parent, [(path, item_type)])[0]
+    
+    def remove_nodes(self, parent, row, count):
+        """
+        remove count rows of parent from row on, and everything under them,
+        with one remove notification.
+        """
+        siblings = self.children[parent]
+        if count <= 0 or not siblings or row < 0 or row + count > len(siblings):
+            return False
+        
+        self.beginRemoveRows(self.index_for_node(parent), row, row + count - 1)
+        removed = siblings[row:row+count]
+        del siblings[row:row+count]
+        for r in range(row, len(siblings)):
+            self.rows[siblings[r]] = r
+        while removed:
+            node = removed.pop()
+            removed.extend(self.children[node] or ())
+            self._unindex_node(node)
+            self.paths[node] = None
+            self.types[node] = QEItemType.INVALID
+            self.parents[node] = -1
+            self.icons[node] = -1
+            self.children[node] = None
+        self.endRemoveRows()
+        
+        return True
+    
+    def move_node(self, node, new_parent):
+        """
+        move node's row to the end of new_parent's rows.
+        """
+        old_parent = self.parents[node]
+        if old_parent == new_parent:
+            return
         
-        return False
+        row = self.rows[node]
+        new_siblings = self.children[new_parent]
+        if new_siblings is None:
+            new_siblings = self.children[new_parent] = []
+        
+        self.beginMoveRows(self.index_for_node(old_parent), row, row, self.index_for_node(new_parent), len(new_siblings))
+        old_siblings = self.children[old_parent]
+        del old_siblings[row]
+        for r in range(row, len(old_siblings)):
+            self.rows[old_siblings[r]] = r
+        self._unindex_node(node)
+        self.rows[node] = len(new_siblings)
+        self.parents[node] = new_parent
+        self.nodes_by_path[(new_parent, self.paths[node])] = node
+        new_siblings.append(node)
+        self.endMoveRows()
+    
+    # QAbstractItemModel.
+    
+    def index(self, row, column, parent=QModelIndex()):
+        if column < 0 or column > 1 or (parent.isValid() and parent.column() != 0):
+            return QModelIndex()
+        siblings = self.children[self.node_for_index(parent)]
+        if not siblings or row < 0 or row >= len(siblings):
+            return QModelIndex()
+        return self.createIndex(row, column, siblings[row])
+    
+    def parent(self, index=None):
+        if index is None:
+            # QObject.parent.
+            return super().parent()
+        if not index.isValid():
+            return QModelIndex()
+        return self.index_for_node(self.parents[index.internalId()])
+    
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid() and parent.column() != 0:
+            return 0
+        return len(self.children[self.node_for_index(parent)] or ())
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 2
+    
+    def hasChildren(self, parent=QModelIndex()):
+        if parent.isValid() and parent.column() != 0:
+            return False
+        node = self.node_for_index(parent)
+        if not self.fetched[node]:
+            return self.version_counts[node] > 0
+        return bool(self.children[node])
+    
+    def canFetchMore(self, parent):
+        node = self.node_for_index(parent)
+        return not self.fetched[node] and self.version_counts[node] > 0
+    
+    def fetchMore(self, parent):
+        node = self.node_for_index(parent)
+        if not self.fetched[node]:
+            self.fetch_node(node)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.column() != 0:
+            return None
+        
+        node = index.internalId()
+        
+        if role == PathRole:
+            return self.paths[node]
+        if role == ItemTypeRole:
+            return self.types[node]
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            path = self.paths[node]
+            return str(path) if self.types[node] == QEItemType.FOLDER else path.name
+        if role == Qt.DecorationRole:
+            return self.icon_table[self.icons[node]] if self.icons[node] != -1 else None
+        if role == Qt.ToolTipRole and self.types[node] == QEItemType.PROJECT:
+            count = self.version_counts[node]
+            return f"{count} version file{'s' if count != 1 else ''}"
+        return None
+    
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemIsDropEnabled
+        if index.column() != 0 or self.types[index.internalId()] == QEItemType.FILE:
+            return Qt.ItemIsEnabled | Qt.ItemIsDragEnabled
+        return Qt.ItemIsEnabled | Qt.ItemIsDragEnabled | Qt.ItemIsSelectable | Qt.ItemIsEditable | Qt.ItemIsDropEnabled
+    
+    def removeRows(self, row, count, parent=QModelIndex()):
+        return self.remove_nodes(self.node_for_index(parent), row, count)
 
 
 class QETree(QTreeView):
@@ -389,17 +666,32 @@ class QETree(QTreeView):
     removingFolder = pyqtSignal(Path)
     
     def setup(self):
+        # thumbnails are loaded in the background. rows get a placeholder icon
+        # until theirs is ready, with rows in view loaded first.
+        self.thumbnail_size = int(tree_icon_size * QApplication.instance().devicePixelRatio())
+        self.thumbnail_requests = {}
+        self.thumbnail_request_paths = {}
+        self.thumbnail_worker = ThumbnailWorker(parent=self)
+        self.thumbnail_worker.loaded.connect(self._on_thumbnail_loaded)
+        self.thumbnail_request_timer = QTimer(self)
+        self.thumbnail_request_timer.setSingleShot(True)
+        self.thumbnail_request_timer.setInterval(0)
+        self.thumbnail_request_timer.timeout.connect(self.request_thumbnails)
+        
         item_delegate = ItemDelegate()
         self.setItemDelegate(item_delegate)
         item_delegate.commitItemRename.connect(self._on_delegate_commit_item_rename)
         self.setUniformRowHeights(True)
-        self.source_model = QStandardItemModel(0, 2)
+        self.setMouseTracking(True)
+        self.source_model = QETreeModel(self.fetch_file_items)
         self.model = MySortFilterProxyModel()
         self.model.setSourceModel(self.source_model)
-        self.model.setFilterRole(PathRole)
-        self.model.setFilterKeyColumn(0)
-        self.model.setFilterCaseSensitivity(Qt.CaseInsensitive)
         self.model.setRecursiveFilteringEnabled(True)
+        self.pending_filter_text = ""
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(150)
+        self.filter_timer.timeout.connect(lambda: self.set_filter_text(self.pending_filter_text))
         self.setModel(self.model)
         self.header().setStretchLastSection(False)
         self.header().setSectionResizeMode(0, QHeaderView.Stretch)
@@ -407,13 +699,11 @@ class QETree(QTreeView):
         self.setHeaderHidden(True)
         self.setAlternatingRowColors(True)
 
-        model_root = self.source_model.invisibleRootItem()
-
         for path in qe_settings:
             if qe_settings[path]["node_type"] == QEItemType.FOLDER:
-                item = self.add_folder_to_tree(path)
+                self.add_folder_to_tree(path)
             else:
-                item = self.add_base_to_tree(path)
+                self.add_base_to_tree(path)
         
         for doc in app.documents():
             file = Path(doc.fileName())
@@ -424,7 +714,7 @@ class QETree(QTreeView):
                 continue
             base = base_stem_and_version_number_for_versioned_file(file)[0]
             path = file.parent / base
-            item = self.add_base_to_tree(path)
+            self.add_base_to_tree(path)
 
         for i in range(self.source_model.rowCount()):
             index = self.model.mapFromSource(self.source_model.index(i, 0))
@@ -440,154 +730,365 @@ class QETree(QTreeView):
         
         app_notifier.imageCreated.connect(self._on_image_created)
         app_notifier.imageSaved.connect(self._on_image_saved)
+        
+        self.verticalScrollBar().valueChanged.connect(self.thumbnail_request_timer.start)
+        self.expanded.connect(self.thumbnail_request_timer.start)
 
     def dropEvent(self, event):
         if event.source() != self:
             return
         
-        dropped_on_source_index = self.model.mapToSource(self.indexAt(event.pos()))
-        if dropped_on_source_index.column() != 0:
-            dropped_on_source_index = dropped_on_source_index.siblingAtColumn(0)
-        dropped_on_item = self.source_model.itemFromIndex(dropped_on_source_index)
+        model = self.source_model
+        dropped_on_index = self.indexAt(event.pos())
         
-        if not dropped_on_item:
+        if not dropped_on_index.isValid():
             return
         
-        #print(f"dropEvent: source: {event.source()}, mimeData.formats: {event.mimeData().formats()}, dropAction: {event.dropAction()}, dropped on: {dropped_on_item.data(PathRole)}")
+        dropped_on_node = self.node_for_view_index(dropped_on_index)
+        
+        #print(f"dropEvent: source: {event.source()}, mimeData.formats: {event.mimeData().formats()}, dropAction: {event.dropAction()}, dropped on: {model.path(dropped_on_node)}")
+        
+        if model.item_type(dropped_on_node) == QEItemType.FILE:
+            dropped_on_node = model.parent_node(dropped_on_node)
+            #print(f"dropped on file -> project: {model.path(dropped_on_node)}")
+        
+        if model.item_type(dropped_on_node) == QEItemType.PROJECT:
+            dropped_on_node = model.parent_node(dropped_on_node)
+            #print(f"dropped on project -> folder: {model.path(dropped_on_node)}")
+        
+        self.relocate_rows_in_tree(model.path(dropped_on_node))
+    
+    def node_for_view_index(self, index):
+        """
+        return source model node for index of the view's (filtered) model.
+        """
+        return self.source_model.node_for_index(self.model.mapToSource(index))
+
+    def _row_button_at(self, pos):
+        """
+        return (index, role) of row button at pos in viewport, or (index, None).
+        """
+        index = self.indexAt(pos)
+        if not index.isValid():
+            return index, None
+        return index, self.itemDelegate().button_at(index, self.visualRect(index), pos)
+    
+    def _set_hover_row_button(self, hover_button):
+        delegate = self.itemDelegate()
+        if hover_button != delegate.hover_button:
+            delegate.hover_button = hover_button
+            self.viewport().update()
+    
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            index, role = self._row_button_at(event.pos())
+            if role:
+                self.itemDelegate().pressed_button = (QPersistentModelIndex(index), role)
+                self._set_hover_row_button((QPersistentModelIndex(index), role))
+                self.viewport().update()
+                event.accept()
+                return
+        super().mousePressEvent(event)
+    
+    def mouseDoubleClickEvent(self, event):
+        # a quick second click on a button is another click, as with a tool button.
+        if event.button() == Qt.LeftButton and self._row_button_at(event.pos())[1]:
+            self.mousePressEvent(event)
+            return
+        super().mouseDoubleClickEvent(event)
+    
+    def mouseReleaseEvent(self, event):
+        delegate = self.itemDelegate()
+        if delegate.pressed_button and event.button() == Qt.LeftButton:
+            pressed_button = delegate.pressed_button
+            delegate.pressed_button = None
+            self.viewport().update()
+            index, role = self._row_button_at(event.pos())
+            if role and (QPersistentModelIndex(index), role) == pressed_button:
+                self.row_button_clicked(role, self.model.mapToSource(index))
+            event.accept()
+            return
+        super().mouseReleaseEvent(event)
+    
+    def mouseMoveEvent(self, event):
+        index, role = self._row_button_at(event.pos())
+        self._set_hover_row_button((QPersistentModelIndex(index), role) if role else None)
+        if self.itemDelegate().pressed_button:
+            event.accept()
+            return
+        super().mouseMoveEvent(event)
+    
+    def leaveEvent(self, event):
+        self._set_hover_row_button(None)
+        super().leaveEvent(event)
+    
+    def row_button_clicked(self, role, source_index):
+        """
+        handle click on the del, cfg or opn button of the row of source_index.
+        """
+        node = self.source_model.node_for_index(source_index)
+        path = self.source_model.path(node)
+        item_type = self.source_model.item_type(node)
+        
+        #print("clicked", role, path)
         
-        if dropped_on_item.data(ItemTypeRole) == QEItemType.FILE:
-            dropped_on_item = dropped_on_item.parent()
-            #print(f"dropped on file -> project: {dropped_on_item.data(PathRole)}")
+        if role == "del":
+            if path not in qe_settings:
+                qe_settings[path] = default_settings(path=path, node_type=item_type)
+            else:
+                del qe_settings[path]
+            mark_settings_modified(path)
+            
+            self.source_model.node_changed(node)
+            self.selectionModel().selectionChanged.emit(QItemSelection(), QItemSelection())
         
-        if dropped_on_item.data(ItemTypeRole) == QEItemType.PROJECT:
-            dropped_on_item = dropped_on_item.parent()
-            #print(f"dropped on project -> folder: {dropped_on_item.data(PathRole)}")
+        elif role == "opn":
+            if item_type == QEItemType.FOLDER:
+                open_folder_in_file_browser(path)
+            else:
+                if item_type == QEItemType.PROJECT:
+                    path = latest_file_for_project(path) or path
+                
+                if (doc := app.openDocument(str(path))):
+                    app.activeWindow().addView(doc)
+                    doc.waitForDone()
         
-        self.relocate_rows_in_tree(dropped_on_item.data(PathRole))
+        elif role == "cfg":
+            if self.configure_export(path, qe_settings[path]["basic"]["ext"]):
+                self.source_model.node_changed(node)
+    
+    def configure_export(self, path, extension, output=0):
+        """
+        show Krita's export options for extension, and store the result as the
+        export config for that type in the settings for path. for an extra
+        output (output > 0) it's stored as that output's own config.
+        returns True if the config was changed.
+        """
+        if extension in configless_extensions():
+            self.requestShowMessage.emit(f"Exports to {extension} don't require a config.", 2000)
+            return False
+        
+        ext_key = extension[1:]
+        
+        if ext_key in config_aliases():
+            ext_key = config_aliases()[ext_key]
+        
+        plugin_dir = Path(app.getAppDataLocation()) / "pykrita" / "QuickExport"
 
-    def add_item_to_tree(self, parent, path, text, icon, item_type, selectable=True):
-        item = QStandardItem()
-        item2 = QStandardItem()
-        parent.appendRow([item, item2])
-        item.setData(path, PathRole)
-        item.setData(item_type, ItemTypeRole)
-        item.setData(text, Qt.DisplayRole)
-        item.setIcon(icon)
-        item.setSelectable(selectable)
-        item2.setSelectable(False)
-        item.setEditable(selectable)
-        item2.setEditable(False)
-        item.setDropEnabled(selectable)
-        item2.setDropEnabled(False)
-        
-        self.add_buttons_for_row(path, item_type, item, item2)
-        
-        return item
+        doc = create_document(2,2,"QuickExportDummyDoc","RGBA","U8","",72.0)
+        
+        dummy_file_name = "ExportDummy" + extension
+        
+        info = InfoObject()
+        
+        s_export = output_settings(qe_settings[path])[output]["export"]
+        if ext_key in s_export:
+            for k,v in s_export[ext_key].items():
+                info.setProperty(k, v)
+        
+        result = doc.exportImage(str(plugin_dir / dummy_file_name), info)
+        #print(f"{result=}, {info=}, {info.properties()=}")
+        
+        if result:
+            #print("BEFORE:")
+            #print(qe_settings[path])
+            
+            if output == 0:
+                qe_settings[path]["export"][ext_key] = info.properties()
+            else:
+                qe_settings[path]["outputs_export"][output-1][ext_key] = info.properties()
+            mark_settings_modified(path)
+            
+            #print("AFTER:")
+            #print(qe_settings[path])
 
-    def add_buttons_for_row(self, path, item_type, item, item2):
-        global row_height
-        buttons_widget = QWidget()
-        buttons_layout = QHBoxLayout(buttons_widget)
-        buttons_widget.setContentsMargins(0,0,0,0)
-        buttons_layout.setContentsMargins(0,0,0,0)
-        buttons_layout.setSpacing(0)
-        del_button = TreeButton(role="del", path=path, item_type=item_type, icon=app.icon("edit-delete"), item=item, item2=item2, tree=self)
-        row_height = del_button.sizeHint().height()
-        cfg_button = TreeButton(role="cfg", path=path, item_type=item_type, icon=app.icon("configure"), item=item, item2=item2, tree=self)
-        exp_button = TreeButton(role="exp", path=path, item_type=item_type, icon=app.icon("document-export"))
-        opn_button = TreeButton(role="opn", path=path, item_type=item_type, icon=app.icon("document-open"), item=item, item2=item2)
-        sp = del_button.sizePolicy()
-        sp.setRetainSizeWhenHidden(True)
-        for btn in del_button, cfg_button, opn_button:
-            btn.setSizePolicy(sp)
-            buttons_layout.addWidget(btn)
-        buttons_layout.addStretch()
-        
-        del_button.setObjectName("StoreAddDeleteButton")
-        
-        if item_type == QEItemType.FILE:
-            del_button.hide()
-            cfg_button.hide()
-        
-        if path not in qe_settings:
-            del_button.setIcon(app.icon("list-add"))
-            cfg_button.hide()
-            exp_button.hide()
-        
-        index = self.model.mapFromSource(item2.index())
-        self.setIndexWidget(index, buttons_widget)
+        doc.waitForDone()
+        doc.close()
+        #print(doc)
+        
+        return result
+
+    def add_node_to_tree(self, parent, path, item_type, icon_name):
+        node = self.source_model.add_node(parent, path, item_type)
+        self.set_node_icon(node, icon_name)
+        return node
+    
+    def set_node_icon(self, node, icon_name):
+        self.source_model.set_icon(node, icon_name, lambda: app.icon(icon_name))
+    
+    def set_node_thumbnail(self, node, image):
+        self.source_model.set_icon(node, ("thumbnail", image.cacheKey()), lambda: QIcon(pixmap_from_thumbnail_image(image)))
+
+    def set_item_thumbnail(self, node, path):
+        """
+        set node's icon to the thumbnail for file at path. if it isn't
+        already loaded, a placeholder is shown until it has been.
+        """
+        # forget any earlier request for this node, eg. for a project's previous latest file.
+        previous_path = self.thumbnail_request_paths.pop(node, None)
+        if previous_path in self.thumbnail_requests:
+            nodes = self.thumbnail_requests[previous_path]
+            nodes.remove(node)
+            if not nodes:
+                del self.thumbnail_requests[previous_path]
+        
+        if not str2bool(readSetting("show_thumbnails_in_tree")):
+            self.set_node_icon(node, 'view-preview' if path.exists() else 'window-close')
+            return
+        
+        image = thumbnail_cache.cached_image(path, self.thumbnail_size)
+        if image is not None:
+            self.set_node_thumbnail(node, image)
+            return
+        
+        self.set_node_icon(node, 'view-preview')
+        
+        self.thumbnail_requests.setdefault(path, []).append(node)
+        self.thumbnail_request_paths[node] = path
+        self.thumbnail_request_timer.start()
+    
+    def request_thumbnails(self):
+        """
+        start loading requested thumbnails, those for rows in view first.
+        only as many are started as the worker can run at once, so that rows
+        scrolled into view meanwhile are still loaded next.
+        """
+        worker = self.thumbnail_worker
+        
+        pending = [path for path in self.thumbnail_requests if not worker.is_loading(path, self.thumbnail_size)]
+        if not pending:
+            return
+        
+        visible_paths = set()
+        viewport_rect = self.viewport().rect()
+        index = self.indexAt(viewport_rect.topLeft())
+        while index.isValid() and self.visualRect(index).top() <= viewport_rect.bottom():
+            visible_paths.add(index.data(PathRole))
+            index = self.indexBelow(index)
+        
+        pending.sort(key=lambda path: path not in visible_paths)
+        
+        for path in pending:
+            if worker.is_busy():
+                break
+            worker.load(path, self.thumbnail_size)
+    
+    def _on_thumbnail_loaded(self, path, size, image):
+        if size != self.thumbnail_size:
+            return
+        
+        nodes = self.thumbnail_requests.pop(path, [])
+        
+        for node in nodes:
+            self.thumbnail_request_paths.pop(node, None)
+            if not self.source_model.is_valid_node(node):
+                continue
+            if image.isNull():
+                self.set_node_icon(node, 'window-close')
+            else:
+                self.set_node_thumbnail(node, image)
+        
+        self.thumbnail_request_timer.start()
 
     def add_base_to_tree(self, path):
+        """
+        add row for project at path, and for its folder if needed. returns its node.
+        """
         #print(path)
+        model = self.source_model
         folder = path.parent
-        folder_item = self.add_folder_to_tree(folder)
-        
-        for i in range(folder_item.rowCount()):
-            item = folder_item.child(i, 0)
-            #print(i, index, folder_item.data(index, PathRole))
-            if item.data(PathRole) == path:
-                return item
+        folder_node = self.add_folder_to_tree(folder)
         
-        thumb = _make_thumbnail_for_file(path)
-        icon = QIcon(square_thumbnail(thumb, tree_icon_size))
+        node = model.child_for_path(folder_node, path)
+        if node is not None:
+            return node
         
-        item = self.add_item_to_tree(folder_item, path, path.name, icon, QEItemType.PROJECT)
+        node = self.add_node_to_tree(folder_node, path, QEItemType.PROJECT, 'view-preview')
         
-        self.populate_base_item_with_file_items(item, path)
+        self.populate_base_item_with_file_items(node, path)
         
-        return item
+        return node
 
-    def populate_base_item_with_file_items(self, item, path=None):
+    def populate_base_item_with_file_items(self, node, path=None):
+        """
+        bring project node up to date with its project's version files. the
+        file rows are only remade if they've already been made, otherwise
+        just the count of files is updated (see QETreeModel).
+        """
+        model = self.source_model
+        
         if not path:
-            path = item.data(PathRole)
-        
-        while item.child(0):
-            item.takeRow(0)
-        
-        latest_file = None
-        
-        if path.parent.exists():
-            sorted_list = sorted(path.parent.glob(f"{path.name}*.kra"), key = lambda file: Path(file).stat().st_mtime)
-            for file in sorted_list:
-                file_base = base_stem_and_version_number_for_versioned_file(file)[0]
-                if path.stem == file_base:
-                    #print("add file", file, "for base", path.stem)
-                    self.add_file_to_tree(file)
-                    latest_file = file
-            if latest_file:
-                thumb = _make_thumbnail_for_file(latest_file)
-                icon = QIcon(square_thumbnail(thumb, tree_icon_size))
-                item.setIcon(icon)
-        
-        if not latest_file:
+            path = model.path(node)
+        
+        files = version_files_for_project(path)
+        
+        self.model.forget_match(path)
+        model.set_version_count(node, len(files))
+        
+        if model.is_fetched(node):
+            model.remove_nodes(node, 0, model.child_count(node))
+            self.add_file_nodes(node, files)
+        
+        if files:
+            self.set_item_thumbnail(node, files[-1])
+        else:
             # fallback to file-not-found icon.
-            thumb = _make_thumbnail_for_file(path)
-            icon = QIcon(square_thumbnail(thumb, tree_icon_size))
-            item.setIcon(icon)
+            self.set_item_thumbnail(node, path)
+    
+    def fetch_file_items(self, node):
+        """
+        make the version file rows of project node, on first expanding it.
+        """
+        path = self.source_model.path(node)
+        self.source_model.set_fetched(node)
+        self.model.forget_match(path)
+        self.add_file_nodes(node, version_files_for_project(path))
+    
+    def add_file_nodes(self, base_node, files):
+        nodes = self.source_model.add_nodes(base_node, [(file, QEItemType.FILE) for file in files])
+        for node, file in zip(nodes, files):
+            self.set_item_thumbnail(node, file)
+        return nodes
 
     def add_file_to_tree(self, path):
+        """
+        add row for version file at path, and for its project and folder if needed.
+        returns the file's node, or None if its project's file rows haven't
+        been made yet (in which case only the project's count is updated).
+        """
+        model = self.source_model
         base = base_stem_and_version_number_for_versioned_file(path)[0]
-        base_item = self.add_base_to_tree(path.parent / base)
+        base_node = self.add_base_to_tree(path.parent / base)
+        
+        if not model.is_fetched(base_node):
+            if model.version_count(base_node):
+                self.populate_base_item_with_file_items(base_node)
+                return None
+            # make the first file row now, as the view only shows a project
+            # can be expanded if it had rows or a count when it was laid out.
+            model.set_fetched(base_node)
         
-        for i in range(base_item.rowCount()):
-            item = base_item.child(i, 0)
-            #print(i, index, folder_item.data(index, PathRole))
-            if item.data(PathRole) == path:
-                return item
+        node = model.child_for_path(base_node, path)
+        if node is not None:
+            return node
         
-        thumb = _make_thumbnail_for_file(path)
-        icon = QIcon(square_thumbnail(thumb, tree_icon_size))
+        self.model.forget_match(model.path(base_node))
+        model.set_version_count(base_node, model.child_count(base_node) + 1)
         
-        return self.add_item_to_tree(base_item, path, path.name, icon, QEItemType.FILE, selectable=False)
+        return self.add_file_nodes(base_node, [path])[0]
 
     def add_folder_to_tree(self, path):
-        for i in range(self.source_model.rowCount()):
-            index = self.source_model.index(i, 0)
-            if self.source_model.data(index, PathRole) == path:
-                return self.source_model.item(i)
+        """
+        add row for folder at path if there isn't one. returns its node.
+        """
+        model = self.source_model
+        
+        node = model.child_for_path(model.root, path)
+        if node is not None:
+            return node
         
         self.addingFolder.emit(path)
-        return self.add_item_to_tree(self.source_model, path, str(path), app.icon("folder"), QEItemType.FOLDER)
+        return self.add_node_to_tree(model.root, path, QEItemType.FOLDER, "folder")
 
     def _on_custom_context_menu_requested(self, pos):
         # Defer context menu until after tree selection has updated.
@@ -682,20 +1183,17 @@ class QETree(QTreeView):
                 logger.info(f"Folder not found at {path}")
                 return
 
-            sorted_list = sorted(folder_path.glob("*.kra"), key = lambda file: Path(file).stat().st_mtime)
-            for file in sorted_list:
-                file_base = base_stem_and_version_number_for_versioned_file(file)[0]
-                if not file_base.endswith(".kra-autosave"):
-                    self.add_base_to_tree(folder_path / file_base)
+            for project_path in project_paths_in_folder(folder_path):
+                self.add_base_to_tree(project_path)
         
         elif result == ac_remove_unconfigured_in_folder:
-            row_item = self.source_model.itemFromIndex(self.model.mapToSource(rows[0]))
-            for child_idx in reversed(range(row_item.rowCount())):
-                child = row_item.child(child_idx)
-                child_path = child.data(PathRole)
+            model = self.source_model
+            folder_node = self.node_for_view_index(rows[0])
+            for child_node in reversed(model.child_nodes(folder_node)):
+                child_path = model.path(child_node)
                 if child_path in qe_settings:
                     continue
-                self.model.removeRow(child.row(), rows[0])
+                model.remove_nodes(folder_node, model.row(child_node), 1)
         
         elif result == ac_show_in_file_browser:
             open_folder_in_file_browser(folder_path)
@@ -728,11 +1226,7 @@ class QETree(QTreeView):
                 
                 if path not in qe_settings:
                     # add to store first.
-                    source_index2 = source_index.siblingAtColumn(source_index.column()+1)
-                    index2 = self.model.mapFromSource(source_index2)
-                    btns = self.indexWidget(index2)
-                    del_btn = btns.findChild(TreeButton, "StoreAddDeleteButton")
-                    del_btn.click()
+                    self.row_button_clicked("del", source_index)
                 
                 #print(f"paste to {path}")
                 bes = qe_settings[path]["basic"]
@@ -767,10 +1261,12 @@ class QETree(QTreeView):
                             if overwrite_only and ext[1:] not in qe_settings[path]["export"]:
                                 continue
                             #print(f" - paste {ext} export config")
-                            qe_settings[path]["export"][ext[1:]] = deepcopy(cc["export"][ext[1:]])
+                            # (export configs are shared, so there's no need to copy it.)
+                            qe_settings[path]["export"][ext[1:]] = cc["export"][ext[1:]]
+                
+                mark_settings_modified(path)
+                self.source_model.node_changed(self.source_model.node_for_index(source_index))
             
-            # TODO: this is not quite right (supposed to be a range, but we don't use the passed indeces anyway).
-            self.source_model.dataChanged.emit(rows[0], rows[0])
             self.requestConfigWidgetsRefreshForPath.emit(path)
                 
             #for k,v in store.items():
@@ -800,13 +1296,17 @@ class QETree(QTreeView):
                 path = row_index.data(PathRole)
                 if not path in qe_settings:
                     continue
-                row_active_type = qe_settings[path]["basic"]["ext"]
                 row_es = qe_settings[path]["export"]
                 if not row_es:
                     continue
+                # the types of every output are in use, as outputs share the entry's export settings.
+                row_active_types = set()
+                for output in output_settings(qe_settings[path]):
+                    ext_key = output["basic"]["ext"][1:]
+                    row_active_types.add(config_aliases().get(ext_key, ext_key))
                 row_unused_types = []
                 for ext in row_es:
-                    if "." + ext != row_active_type:
+                    if ext not in row_active_types:
                         settings_to_delete.append({"path":path, "ext":ext})
                         row_unused_types.append(ext)
                 if not row_unused_types:
@@ -832,11 +1332,11 @@ class QETree(QTreeView):
                 ext = setting_to_delete["ext"]
                 #print(f" - deleting {ext} from {path}")
                 del qe_settings[path]["export"][ext]
-                if f"config_export_{ext}_string" in qe_settings[path]:
-                    del qe_settings[path][f"config_export_{ext}_string"]
             
-            # TODO: this is not quite right (supposed to be a range, but we don't use the passed indeces anyway).
-            self.source_model.dataChanged.emit(rows[0], rows[0])
+            mark_settings_modified(*{setting_to_delete["path"] for setting_to_delete in settings_to_delete})
+            
+            for row_index in rows:
+                self.source_model.node_changed(self.node_for_view_index(row_index))
             
             #print("done.")
         
@@ -849,37 +1349,39 @@ class QETree(QTreeView):
                 
             # gather items to be removed, excluding projects inside folders that are being removed, as they'll be removed with the folder anyway.
             #print("building list of rows to remove...")
-            row_items = []
+            model = self.source_model
+            row_nodes = []
             folder_paths_being_removed = []
             for row_index in rows:
-                row_item = self.source_model.itemFromIndex(self.model.mapToSource(row_index))
+                row_node = self.node_for_view_index(row_index)
                 if row_index.data(ItemTypeRole) == QEItemType.FOLDER:
                     #print(f" - add folder {row_index.data(PathRole)}.")
                     folder_paths_being_removed.append(row_index.data(PathRole))
-                    row_items.append(row_item)
+                    row_nodes.append(row_node)
                 else:
                     if not row_index.parent() in rows:
                         #print(f" - add project {row_index.data(PathRole)}.")
-                        row_items.append(row_item)
+                        row_nodes.append(row_node)
             
             #print("removing...")
-            for item in row_items:
-                path = item.data(PathRole)
-                item_type = item.data(ItemTypeRole)
+            for node in row_nodes:
+                path = model.path(node)
+                item_type = model.item_type(node)
                 if item_type == QEItemType.FOLDER:
-                    for child_idx in range(item.rowCount()):
-                        child = item.child(child_idx)
-                        child_path = child.data(PathRole)
-                        #print(f" - {child_path=} (row:{child.row()})")
+                    for child_node in model.child_nodes(node):
+                        child_path = model.path(child_node)
+                        #print(f" - {child_path=} (row:{model.row(child_node)})")
                         if child_path in qe_settings:
                             del qe_settings[child_path]
-                #print(f" - {path=} (row:{item.row()})")
-                self.source_model.removeRow(item.row(), (item.parent() or self.source_model.invisibleRootItem()).index())
+                            mark_settings_modified(child_path)
+                #print(f" - {path=} (row:{model.row(node)})")
+                model.remove_nodes(model.parent_node(node), model.row(node), 1)
                 if path in qe_settings:
                     del qe_settings[path]
+                    mark_settings_modified(path)
             
             # TODO: this is not quite right (supposed to be a range, but we don't use the passed indeces anyway).
-            self.source_model.dataChanged.emit(self.source_model.invisibleRootItem().index(), self.source_model.invisibleRootItem().index())
+            model.dataChanged.emit(QModelIndex(), QModelIndex())
             
             for folder_path in folder_paths_being_removed:
                 self.removingFolder.emit(path)
@@ -900,190 +1402,150 @@ class QETree(QTreeView):
         if not rows:
             rows = self.selectionModel().selectedRows()
         
-        target_folder_exists_in_tree = False
-        for i in range(self.source_model.rowCount()):
-            check_index = self.source_model.index(i, 0)
-            if self.source_model.data(check_index, PathRole) == target_folder_path:
-                target_folder_exists_in_tree = True
-                target_folder_item = self.source_model.itemFromIndex(check_index)
-                break
+        model = self.source_model
+        
+        target_folder_node = model.child_for_path(model.root, target_folder_path)
+        target_folder_exists_in_tree = target_folder_node is not None
         
         # gather items to be moved, excluding projects inside folders that are being moved, as they'll be moved with the folder anyway.
         # also exclude the target folder item and its children if for some reason they're also selected.
-        row_items = []
+        row_nodes = []
         for row_index in rows:
-            row_item = self.source_model.itemFromIndex(self.model.mapToSource(row_index))
+            row_node = self.node_for_view_index(row_index)
             if row_index.data(ItemTypeRole) == QEItemType.FOLDER:
                 if row_index.data(PathRole) == target_folder_path:
                     continue
-                row_items.append(row_item)
+                row_nodes.append(row_node)
             elif row_index.data(ItemTypeRole) == QEItemType.FILE:
                 continue
             else:
                 if not row_index.parent() in rows:
-                    row_items.append(row_item)
+                    row_nodes.append(row_node)
         
-        for selected_row_item in row_items:
-            path = selected_row_item.data(PathRole)
-            item_type = selected_row_item.data(ItemTypeRole)
+        for selected_row_node in row_nodes:
+            path = model.path(selected_row_node)
+            item_type = model.item_type(selected_row_node)
             #print("- -")
             #print(f"relocating {path} to {target_folder_path}")
             
-            selected_row_index = selected_row_item.index()
-        
             if not target_folder_exists_in_tree:
                 #print("Target folder item doesn't exist in tree yet.")
                 target_folder_exists_in_tree = True
                 if item_type == QEItemType.FOLDER:
                     #print("This folder item will become the target folder item.")
-                    self.change_settings_path_for_item(selected_row_item, target_folder_path)
-                    selected_row_item2_source_index = self.source_model.sibling(selected_row_item.row(), selected_row_item.column()+1, selected_row_index)
-                    selected_row_item2_index = self.model.mapFromSource(selected_row_item2_source_index)
-                    self.setIndexWidget(selected_row_item2_index, None)
-                    self.add_buttons_for_row(selected_row_item.data(PathRole), selected_row_item.data(ItemTypeRole), selected_row_item, self.source_model.itemFromIndex(selected_row_item2_source_index))
-                    for child_idx in range(selected_row_item.rowCount()):
-                        child_item = selected_row_item.child(child_idx)
-                        self.change_settings_path_for_item(child_item, target_folder_path)
-                        self.populate_base_item_with_file_items(child_item, child_item.data(PathRole))
-                    target_folder_item = selected_row_item
+                    self.change_settings_path_for_item(selected_row_node, target_folder_path)
+                    for child_node in model.child_nodes(selected_row_node):
+                        self.change_settings_path_for_item(child_node, target_folder_path)
+                        self.populate_base_item_with_file_items(child_node)
+                    target_folder_node = selected_row_node
                     continue
                 else:
                     #print("A new target folder item will be added to tree.")
-                    target_folder_item = self.add_folder_to_tree(target_folder_path)
-                    self.setExpanded(self.model.mapFromSource(target_folder_item.index()), True)
+                    target_folder_node = self.add_folder_to_tree(target_folder_path)
+                    self.setExpanded(self.model.mapFromSource(model.index_for_node(target_folder_node)), True)
         
             if item_type == QEItemType.FOLDER:
                 #print("Projects in this folder will be moved to the target folder item.")
-                while selected_row_item.child(0):
-                    self.reparent_base_row_in_tree(selected_row_item, 0, target_folder_item, target_folder_path)
+                for child_node in model.child_nodes(selected_row_node):
+                    self.reparent_base_row_in_tree(child_node, target_folder_node, target_folder_path)
             else:
                 #print("This project will be moved to the target folder item.")
-                self.reparent_base_row_in_tree(selected_row_item.parent(), selected_row_item.row(), target_folder_item, target_folder_path)
+                self.reparent_base_row_in_tree(selected_row_node, target_folder_node, target_folder_path)
         
         #print("done")
         #for k,v in qe_settings.items():
             #print("  ",k,":",v)
         
         self.selectionModel().clear()
-        for selected_row_item in row_items:
-            selected_row_index = selected_row_item.index()
-            selected_row_index = self.model.mapFromSource(selected_row_index)
+        for selected_row_node in row_nodes:
+            selected_row_index = self.model.mapFromSource(model.index_for_node(selected_row_node))
             self.selectionModel().select(selected_row_index, QItemSelectionModel.Select)
         
         #print("relocate_rows_in_tree: end")
         #print("- - - - -")
 
-    def reparent_base_row_in_tree(self, source_parent_item, source_child_index, target_parent, target_folder_path):
-        if source_parent_item == target_parent:
+    def reparent_base_row_in_tree(self, node, target_parent, target_folder_path):
+        if self.source_model.parent_node(node) == target_parent:
             return
-        row_items = source_parent_item.takeRow(source_child_index)
-        self.change_settings_path_for_item(row_items[0], target_folder_path, new_parent_item = target_parent)
-        target_parent.appendRow(row_items)
-        self.add_buttons_for_row(row_items[0].data(PathRole), row_items[0].data(ItemTypeRole), *row_items)
-        self.populate_base_item_with_file_items(row_items[0])
+        self.change_settings_path_for_item(node, target_folder_path, new_parent=target_parent)
+        self.source_model.move_node(node, target_parent)
+        self.populate_base_item_with_file_items(node)
 
-    def change_settings_path_for_item(self, item, target_folder_path, new_name="", new_parent_item=None):
-        #print(f"change_settings_path_for_item: {item=} {item.data(PathRole)=} {target_folder_path=} {new_name=} {new_parent_item=}")
-        old_path = item.data(PathRole)
-        item_type = item.data(ItemTypeRole)
+    def change_settings_path_for_item(self, node, target_folder_path, new_name="", new_parent=None):
+        #print(f"change_settings_path_for_item: {node=} {model.path(node)=} {target_folder_path=} {new_name=} {new_parent=}")
+        model = self.source_model
+        old_path = model.path(node)
+        item_type = model.item_type(node)
         new_name = new_name or old_path.name
         new_path = target_folder_path / new_name if item_type != QEItemType.FOLDER else target_folder_path
         
-        if not new_parent_item:
+        if new_parent is None:
             if item_type == QEItemType.FOLDER:
-                #print(f"set new_parent_item to model root")
-                new_parent_item = self.source_model.invisibleRootItem()
-                #print(new_parent_item)
+                #print(f"set new_parent to model root")
+                new_parent = model.root
             else:
                 if old_path.parent == target_folder_path:
-                    new_parent_item = item.parent()
+                    new_parent = model.parent_node(node)
                 else:
-                    root_item = self.source_model.invisibleRootItem()
-                    for row in range(root_item.rowCount()):
-                        if root_item.child(row).data(PathRole) == target_folder_path:
-                            new_parent_item = root_item.child(row)
-                            break
+                    new_parent = model.child_for_path(model.root, target_folder_path)
         
-        # keep checking all items under same parent until name doesn't collide.
+        # keep checking for an item under same parent until name doesn't collide.
         dupe_num = 0
         test_path = new_path
-        while True:
-            collision = False
-            for row in range(new_parent_item.rowCount()):
-                check_item = new_parent_item.child(row)
-                if check_item == item:
-                    continue
-                if check_item.data(PathRole) == test_path:
-                    dupe_num += 1
-                    #print(f"new path {test_path} collides with existing.")
-                    test_path = new_path.with_stem(new_path.stem + f" ({dupe_num})")
-                    collision = True
-                    break
-            if not collision:
+        while new_parent is not None:
+            check_node = model.child_for_path(new_parent, test_path)
+            if check_node is None or check_node == node:
                 break
+            dupe_num += 1
+            #print(f"new path {test_path} collides with existing.")
+            test_path = new_path.with_stem(new_path.stem + f" ({dupe_num})")
         new_path = test_path
         
         if old_path in qe_settings:
             store_temp_copy = qe_settings[old_path]
             del qe_settings[old_path]
             qe_settings[new_path] = store_temp_copy
+            mark_settings_modified(old_path, new_path)
         
         if item_type == QEItemType.FOLDER:
             self.removingFolder.emit(old_path)
             self.addingFolder.emit(new_path)
         
-        item.setData(str(new_path) if item_type == QEItemType.FOLDER else new_path.name, Qt.DisplayRole)
-        item.setData(new_path, PathRole)
-
-    def tree_iter(self, index, callback):
-        #print(f"tree_iter: {index.data(PathRole)}")
-        callback(self.model.mapToSource(index))
-        for row in range(self.model.rowCount(index)):
-            self.tree_iter(self.model.index(row, 0, index), callback)
+        model.set_path(node, new_path)
 
     def _on_filter_edit_text_changed(self, text):
+        # wait for a pause in typing before filtering.
+        self.pending_filter_text = text
+        self.filter_timer.start()
+    
+    def set_filter_text(self, text):
         #print(text)
-        self.model.setFilterFixedString(text)
+        self.filter_timer.stop()
+        self.pending_filter_text = text
+        self.model.setFilterText(text)
         if text != "":
             self.expandAll()
-        
-        self.add_buttons_for_all_rows()
-    
-    def add_buttons_for_all_rows(self):
-        def callback_method(index):
-            item = self.source_model.itemFromIndex(index)
-            item2_source_index = index.siblingAtColumn(index.column()+1)
-            item2 = self.source_model.itemFromIndex(item2_source_index)
-            #print(f"{item2_source_index=}, row:{item2_source_index.row()}, col:{item2_source_index.column()}, model:{item2_source_index.model()}, {item2=}")
-            if item2:
-                self.add_buttons_for_row(item.data(PathRole), item.data(ItemTypeRole), item, item2)
-        
-        self.tree_iter(QModelIndex(), callback_method)
     
-    def _on_delegate_commit_item_rename(self, source_index, item, new_name):
+    def _on_delegate_commit_item_rename(self, source_index, new_name):
         suppress_store_on_widget_edit = True
         
-        source_model = self.source_model
-        item_type = item.data(ItemTypeRole)
+        model = self.source_model
+        node = model.node_for_index(source_index)
+        item_type = model.item_type(node)
         
         if item_type == QEItemType.FOLDER:
-            self.change_settings_path_for_item(item, Path(new_name))
-            self.add_buttons_for_row(item.data(PathRole), item.data(ItemTypeRole), item, source_model.itemFromIndex(source_index.siblingAtColumn(source_index.column()+1)))
+            self.change_settings_path_for_item(node, Path(new_name))
             
-            for row in range(item.rowCount()):
-                child_item = item.child(row)
-                child_source_index = child_item.index()
-                self.change_settings_path_for_item(child_item, source_index.data(PathRole))
-                self.add_buttons_for_row(child_item.data(PathRole), child_item.data(ItemTypeRole), child_item, source_model.itemFromIndex(child_source_index.siblingAtColumn(child_source_index.column()+1)))
-                self.populate_base_item_with_file_items(child_item)
+            for child_node in model.child_nodes(node):
+                self.change_settings_path_for_item(child_node, model.path(node))
+                self.populate_base_item_with_file_items(child_node)
         else:
-            self.change_settings_path_for_item(item, source_index.data(PathRole).parent, new_name)
-            self.add_buttons_for_row(item.data(PathRole), item.data(ItemTypeRole), item, source_model.itemFromIndex(source_index.siblingAtColumn(source_index.column()+1)))
-            self.populate_base_item_with_file_items(item)
+            self.change_settings_path_for_item(node, model.path(node).parent, new_name)
+            self.populate_base_item_with_file_items(node)
         
-        self.requestConfigWidgetsRefreshForPath.emit(source_index.data(PathRole))
+        self.requestConfigWidgetsRefreshForPath.emit(model.path(node))
         
-        self.source_model.dataChanged.emit(source_index, source_index)
+        model.node_changed(node)
         
         suppress_store_on_widget_edit = False
     
@@ -1103,20 +1565,30 @@ class QETree(QTreeView):
         """
         basepath = filepath.with_name(base_stem_and_version_number_for_versioned_file(filepath)[0])
         #print(f"finding folder for {filepath} with {basepath=}")
+        source_model = self.source_model
+        folder_node = source_model.child_for_path(source_model.root, filepath.parent)
+        if folder_node is None:
+            return
+        project_node = source_model.child_for_path(folder_node, basepath)
+        if project_node is None:
+            return
+        #print(f"  {project_node=}")
+        project_source_index = source_model.index_for_node(project_node)
+        if source_model.canFetchMore(project_source_index):
+            source_model.fetchMore(project_source_index)
+        file_node = source_model.child_for_path(project_node, filepath)
+        if file_node is None:
+            return
+        
+        # (rows hidden by the filter aren't selected.)
         model = self.model
-        for folder_row in range(model.rowCount()):
-            folder_index = model.index(folder_row, 0)
-            if folder_index.data(PathRole) == filepath.parent:
-                #print(f" {folder_index=}")
-                for project_row in range(model.rowCount(folder_index)):
-                    project_index = model.index(project_row, 0, folder_index)
-                    if project_index.data(PathRole) == basepath:
-                        #print(f"  {project_index=}")
-                        for file_row in range(model.rowCount(project_index)):
-                            file_index = model.index(file_row, 0, project_index)
-                            if file_index.data(PathRole) == filepath:
-                                #print(f"   {file_index=} FOUND")
-                                self.expand(folder_index)
-                                self.expand(project_index)
-                                self.setCurrentIndex(project_index)
-                                self.scrollTo(file_index, self.PositionAtCenter)
+        folder_index = model.mapFromSource(source_model.index_for_node(folder_node))
+        project_index = model.mapFromSource(project_source_index)
+        file_index = model.mapFromSource(source_model.index_for_node(file_node))
+        if not file_index.isValid():
+            return
+        #print(f"   {file_index=} FOUND")
+        self.expand(folder_index)
+        self.expand(project_index)
+        self.setCurrentIndex(project_index)
+        self.scrollTo(file_index, self.PositionAtCenter)
@@ -8,6 +8,8 @@ logger = logging.getLogger("tomjk_quickexport")
 
 from .utils import *
 from .qedialog import QEDialog
+from .batchexport import run_batch_export
+from .exportscheduler import ExportScheduler, SaveExportScheduler
 
 app = Krita.instance()
 app_notifier = app.notifier()
@@ -55,7 +57,21 @@ class QuickExportExtension(Extension):
         self.theme_is_dark = False
         self.use_custom_icons = False
         
-        app_notifier.imageSaved.connect(partial(self.update_quick_export_display))
+        # keep folder scans up to date with files saved from krita. connected
+        # first so that anything else reacting to a save sees the new file.
+        app_notifier.imageSaved.connect(lambda filename: folder_scan_index.invalidate(Path(filename)))
+        app_notifier.imageCreated.connect(lambda doc: folder_scan_index.invalidate(Path(doc.fileName())) if doc.fileName() else None)
+        
+        # resolved quick export target for each document file, see quick_export_target_for_file.
+        self.quick_export_targets = {}
+        self.quick_export_targets_generation = -1
+        
+        app_notifier.imageSaved.connect(self._on_image_saved)
+        
+        self.export_scheduler = ExportScheduler(self)
+        self.export_scheduler.progress.connect(self._on_export_progress)
+        self.export_scheduler.finished.connect(self._on_export_finished)
+        self.save_export_scheduler = SaveExportScheduler(self.export_scheduler, self)
     
     def set_default_icons(self):
         self.icons["default"] = {
@@ -93,7 +109,7 @@ class QuickExportExtension(Extension):
         self.update_action_icons()
     
     def set_action_icons(self):
-        correct_settings_version = readSetting("settings_version") == "0.1.0"
+        correct_settings_version = readSetting("settings_version") == current_settings_version
         for win in known_windows:
             win["qe_action"].setIcon(self.get_icon("qe"))
             win["qec_action"].setIcon(self.get_icon("qec") if correct_settings_version else self.get_icon("qec-notify"))
@@ -112,10 +128,12 @@ class QuickExportExtension(Extension):
         qe_action = window.createAction("tomjk_quick_export", "Quick export", "file")
         qe_action.setEnabled(False)
         qe_action.triggered.connect(self._on_quick_export_triggered)
+        qea_action = window.createAction("tomjk_quick_export_all", "Quick export all configured projects...", "file")
+        qea_action.triggered.connect(self._on_quick_export_all_triggered)
         qec_action = window.createAction("tomjk_quick_export_configure", "Quick export configuration...", "file")
         qec_action.triggered.connect(self._on_quick_export_configuration_triggered)
         
-        move_partial = partial(self.moveAction, [qe_action, qec_action], "file_export_advanced", window.qwindow())
+        move_partial = partial(self.moveAction, [qe_action, qea_action, qec_action], "file_export_advanced", window.qwindow())
         call_later = partial(self.finishCreateActions, move_partial, qe_action, qec_action, window.qwindow())
         QTimer.singleShot(0, call_later)
     
@@ -159,6 +177,32 @@ class QuickExportExtension(Extension):
                         file_menu.insertAction(file_action, action)
                     break
     
+    def quick_export_target_for_file(self, doc_file_path):
+        """
+        return (settings path, export file path) for quick exporting
+        doc_file_path, or None if it has no settings. cached per file until
+        settings are next loaded, saved or changed, or the file is saved, so that
+        switching views doesn't need to look up settings or touch the disk.
+        """
+        if self.quick_export_targets_generation != qe_settings.generation:
+            self.quick_export_targets.clear()
+            self.quick_export_targets_generation = qe_settings.generation
+        
+        if doc_file_path not in self.quick_export_targets:
+            file_settings_path = find_settings_path_for_file(doc_file_path)
+            if file_settings_path:
+                target = (file_settings_path, export_file_path(qe_settings[file_settings_path], doc_file_path))
+            else:
+                target = None
+            self.quick_export_targets[doc_file_path] = target
+        
+        return self.quick_export_targets[doc_file_path]
+    
+    def _on_image_saved(self, filename):
+        self.quick_export_targets.pop(Path(filename), None)
+        self.update_quick_export_display()
+        self.save_export_scheduler.on_image_saved(filename)
+    
     def update_quick_export_display(self):
         #print("update_quick_export_display")
         if len(known_windows) == 0:
@@ -176,12 +220,11 @@ class QuickExportExtension(Extension):
                     doc_file_path = Path(doc.fileName())
                     if doc_file_path.suffix == ".kra":
                         qe_action.setEnabled(True)
-                        file_settings_path = find_settings_path_for_file(doc_file_path)
-                        if file_settings_path:
+                        target = self.quick_export_target_for_file(doc_file_path)
+                        if target:
                             # file has QE settings.
-                            file_settings = qe_settings[file_settings_path]
+                            file_settings_path, output_file_path = target
                             show_export_name_in_menu = str2bool(readSetting("show_export_name_in_menu"))
-                            output_file_path = export_file_path(file_settings, doc_file_path)
                             if show_export_name_in_menu:
                                 qe_action.setText(f"Quick export to '{output_file_path.name}'")
                             else:
@@ -237,16 +280,40 @@ class QuickExportExtension(Extension):
             self.run_dialog(msg="Configure export settings for the project first then try again.", doc=doc)
             return
         
-        result = export_image(file_settings_path, doc)
+        if not doc.modified() and str2bool(readSetting("skip_unchanged_exports")):
+            if export_is_up_to_date(file_settings_path, path):
+                export_path = export_file_path(qe_settings[file_settings_path], path)
+                logger.info(f"QE: '{str(export_path)}' is up to date, skipped export.")
+                app.activeWindow().activeView().showFloatingMessage(f"'{export_path.name}' is already up to date.", app.icon('document-export'), 5000, 1)
+                return
         
-        if not result:
-            failed_msg = export_failed_msg()
-            logger.warning(f"QE: Export failed! {failed_msg}")
-            app.activeWindow().activeView().showFloatingMessage(f"Export failed! {failed_msg}", app.icon('warning'), 5000, 0)
-        else:
-            export_path = export_file_path(qe_settings[file_settings_path], path)
-            logger.info(f"QE: Exported to '{str(export_path)}'")
-            app.activeWindow().activeView().showFloatingMessage(f"Exported to '{str(export_path)}'", app.icon('document-export'), 5000, 1)
+        if not self.export_scheduler.request(file_settings_path, doc):
+            logger.info(f"QE: export of '{path.name}' is already waiting, merged with it.")
+    
+    def _on_export_progress(self, export_path, stage):
+        view = app.activeWindow().activeView() if app.activeWindow() else None
+        if view:
+            view.showFloatingMessage(f"Exporting '{export_path.name}': {stage}...", app.icon('document-export'), 2000, 2)
+    
+    def _on_export_finished(self, export_path, ok, message):
+        view = app.activeWindow().activeView() if app.activeWindow() else None
+        if not ok:
+            logger.warning(f"QE: Export to '{str(export_path)}' failed! {message}")
+            if view:
+                view.showFloatingMessage(f"Export failed! {message}", app.icon('warning'), 5000, 0)
+            return
+        logger.info(f"QE: Exported to '{str(export_path)}'")
+        if view:
+            view.showFloatingMessage(f"Exported to '{str(export_path)}'", app.icon('document-export'), 5000, 1)
+    
+    def _on_quick_export_all_triggered(self):
+        # use settings as they are in the dialog if it's open, otherwise ensure they're up to date.
+        dialog = QEDialog.instance
+        if not (dialog and dialog.isVisible()):
+            if not load_settings_from_config():
+                return
+        
+        run_batch_export(app.activeWindow().qwindow() if app.activeWindow() else None)
     
     def _on_quick_export_configuration_triggered(self):
         self.run_dialog(doc=app.activeDocument())
@@ -0,0 +1,87 @@
+import json
+import os
+
+import logging
+logger = logging.getLogger("tomjk_quickexport")
+
+
+store_version = "0.2.0"
+
+
+def entry_fragment(path_string, basic_string, export_strings, outputs_strings=(), outputs_export_strings=()):
+    """
+    serialized JSON for one settings entry. export_strings maps extension
+    keys to export configs already serialized as JSON, which are embedded
+    as they are. outputs_strings are the basic strings of any extra outputs,
+    left out if there are none. outputs_export_strings are the extra outputs'
+    own export configs, like export_strings, left out if none have any.
+    """
+    export = ",".join(f"{json.dumps(ext_key)}:{export_string}" for ext_key, export_string in export_strings.items())
+    outputs = f',"outputs":{json.dumps(list(outputs_strings))}' if outputs_strings else ""
+    if any(outputs_export_strings):
+        outputs_export = ",".join("{" + ",".join(f"{json.dumps(ext_key)}:{export_string}" for ext_key, export_string in export_strings.items()) + "}"
+                                  for export_strings in outputs_export_strings)
+        outputs += f',"outputs_export":[{outputs_export}]'
+    return f'{{"path":{json.dumps(path_string)},"basic":{json.dumps(basic_string)},"export":{{{export}}}{outputs}}}'
+
+
+class SettingsStore:
+    """
+    export settings entries kept together in one JSON file:
+
+        {"version":"0.2.0","entries":[{"path":...,"basic":...,"export":{"png":{...},...},"outputs":[...],"outputs_export":[{...},...]},...]}
+
+    path and basic are the same strings that were stored in kritarc in 0.1.0.
+    outputs is a list of basic strings for extra outputs of the entry, which
+    use the entry's export configs. it's only present if there are any.
+    outputs_export has, for each extra output, any export configs of its own
+    that it uses in place of the entry's. it's only present if any do.
+
+    the serialized fragment of each entry is kept from the last load or save,
+    so a save only has to serialize the entries that have changed.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.fragments = {}
+
+    def set_path(self, path):
+        if path == self.path:
+            return
+        self.path = path
+        self.fragments = {}
+
+    def exists(self):
+        return self.path is not None and self.path.is_file()
+
+    def read(self):
+        """
+        read entries from file. raises OSError if the file can't be read and
+        ValueError if it isn't a settings file of a supported version.
+        """
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        if not isinstance(data, dict) or "entries" not in data:
+            raise ValueError(f"'{self.path}' is not a Quick Export settings file.")
+
+        if data.get("version") != store_version:
+            raise ValueError(f"Settings file version '{data.get('version')}' is not supported, expected '{store_version}'.")
+
+        return data["entries"]
+
+    def write(self, fragments):
+        """
+        write file from the serialized entry fragments, replacing it. written
+        to a temporary file first then renamed, so an interrupted write can't
+        corrupt it. raises OSError on failure.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(f'{{"version":{json.dumps(store_version)},"entries":[\n')
+            f.write(",\n".join(fragments))
+            f.write("\n]}\n")
+        os.replace(temp_path, self.path)
+
+
+settings_store = SettingsStore()
@@ -0,0 +1,242 @@
+from PyQt5.QtGui import QImage, QPixmap, QGuiApplication
+from PyQt5.QtCore import QObject, QRunnable, QThread, QThreadPool, pyqtSignal
+from collections import OrderedDict
+import threading
+import hashlib
+import zipfile
+import os
+from krita import Krita
+
+import logging
+logger = logging.getLogger("tomjk_quickexport")
+
+from .utils import *
+
+app = Krita.instance()
+
+
+class ThumbnailCache:
+    """
+    square thumbnails of .kra files (from their embedded preview.png) and
+    other images, cached in memory and on disk.
+
+    entries are keyed by file path, modification time and size, so a file
+    changing on disk gets a new thumbnail. each size ever requested is
+    remembered, and when a file has to be read, squares for all of those
+    sizes are made from that one read and written to the disk cache.
+
+    image() only uses QImage and can be called from worker threads.
+    """
+    memory_limit = 4096
+
+    def __init__(self, path=None):
+        self.path = path
+        self.sizes = set()
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+
+    def set_path(self, path):
+        with self.lock:
+            self.path = path
+            self.memory.clear()
+
+    def _keys(self, file_path):
+        """
+        return (path key, stat key) for file_path, or None if it doesn't exist.
+        """
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        path_key = hashlib.sha1(str(file_path).encode("utf-8")).hexdigest()[:16]
+        stat_key = hashlib.sha1(f"{st.st_mtime_ns}:{st.st_size}".encode("utf-8")).hexdigest()[:8]
+        return path_key, stat_key
+
+    def _cache_file_path(self, path_key, stat_key, size):
+        return self.path / path_key[:2] / f"{path_key}_{stat_key}_{size}.png"
+
+    def image(self, file_path, size):
+        """
+        return square QImage of size x size pixels for file_path, or None if
+        the file doesn't exist or has no readable image.
+        """
+        keys = self._keys(file_path)
+        if not keys:
+            return None
+
+        memory_key = (keys, size)
+
+        with self.lock:
+            self.sizes.add(size)
+            image = self.memory.get(memory_key)
+            if image is not None:
+                self.memory.move_to_end(memory_key)
+                return image
+            cache_dir = self.path
+
+        if cache_dir:
+            image = QImage(str(self._cache_file_path(*keys, size)))
+            if not image.isNull():
+                self._remember(memory_key, image)
+                return image
+
+        source = self._read_source_image(file_path)
+        if source is None:
+            return None
+
+        with self.lock:
+            sizes = set(self.sizes)
+
+        if cache_dir:
+            self._forget_old_cache_files(*keys)
+
+        result = None
+        for s in sizes:
+            image = square_thumbnail_image(source, s)
+            self._remember((keys, s), image)
+            if cache_dir:
+                self._write_cache_file(image, self._cache_file_path(*keys, s))
+            if s == size:
+                result = image
+
+        return result
+
+    def cached_image(self, file_path, size):
+        """
+        return square QImage for file_path if it's already in memory, without
+        touching the disk cache or the file itself (other than a stat).
+        """
+        keys = self._keys(file_path)
+        if not keys:
+            return None
+        with self.lock:
+            return self.memory.get((keys, size))
+
+    def pixmap(self, file_path, size):
+        """
+        return square QPixmap for file_path at size x size device-independent
+        pixels, or None. must be called from the GUI thread.
+        """
+        pr = QGuiApplication.instance().devicePixelRatio()
+        image = self.image(file_path, int(size * pr))
+        if image is None:
+            return None
+        return pixmap_from_thumbnail_image(image)
+
+    def _read_source_image(self, file_path):
+        image = QImage()
+        try:
+            if file_path.suffix == ".kra":
+                with zipfile.ZipFile(file_path, "r") as page:
+                    image.loadFromData(page.read("preview.png"))
+            else:
+                image.load(str(file_path))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"error trying to read file '{file_path}'. the error is:\n{type(e).__name__}: {e}")
+
+        return None if image.isNull() else image
+
+    def _remember(self, memory_key, image):
+        with self.lock:
+            self.memory[memory_key] = image
+            self.memory.move_to_end(memory_key)
+            while len(self.memory) > self.memory_limit:
+                self.memory.popitem(last=False)
+
+    def _write_cache_file(self, image, cache_file_path):
+        try:
+            cache_file_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = cache_file_path.with_name(f"{cache_file_path.stem}.{threading.get_ident()}.tmp.png")
+            if image.save(str(temp_path), "PNG"):
+                os.replace(temp_path, cache_file_path)
+        except OSError as e:
+            logger.warning(f"Couldn't write thumbnail cache file '{cache_file_path}': {type(e).__name__}: {e}")
+
+    def _forget_old_cache_files(self, path_key, stat_key):
+        """
+        remove cached thumbnails made from earlier versions of a file.
+        """
+        try:
+            for entry in os.scandir(self.path / path_key[:2]):
+                if entry.name.startswith(path_key) and not entry.name.startswith(f"{path_key}_{stat_key}_"):
+                    os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def pixmap_from_thumbnail_image(image):
+    """
+    make a QPixmap from a thumbnail image made at the screen's device pixel ratio.
+    must be called from the GUI thread.
+    """
+    pm = QPixmap.fromImage(image)
+    pm.setDevicePixelRatio(QGuiApplication.instance().devicePixelRatio())
+    return pm
+
+
+thumbnail_cache = ThumbnailCache(plugin_data_dir() / "thumbnails")
+
+
+class _ThumbnailJob(QRunnable):
+    def __init__(self, worker, file_path, size):
+        super().__init__()
+        self.worker = worker
+        self.file_path = file_path
+        self.size = size
+
+    def run(self):
+        try:
+            image = self.worker.cache.image(self.file_path, self.size)
+        except Exception as e:
+            logger.warning(f"error making thumbnail for '{self.file_path}': {type(e).__name__}: {e}")
+            image = None
+        self.worker.loaded.emit(self.file_path, self.size, image if image is not None else QImage())
+
+
+class ThumbnailWorker(QObject):
+    """
+    loads thumbnails from a ThumbnailCache in a pool of worker threads.
+    loaded is emitted on the GUI thread with a null image if the file has
+    no thumbnail.
+
+    only a pool's worth of loads run at once, so that the caller can decide
+    what to load next as earlier loads finish (eg. rows scrolled into view).
+    """
+    loaded = pyqtSignal(object, int, QImage)
+
+    def __init__(self, cache=thumbnail_cache, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.cache = cache
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max(1, min(4, QThread.idealThreadCount())))
+        self.in_flight = set()
+        self.closed = False
+
+        self.loaded.connect(self._on_loaded)
+
+    def is_busy(self):
+        return len(self.in_flight) >= self.pool.maxThreadCount()
+
+    def is_loading(self, file_path, size):
+        return (file_path, size) in self.in_flight
+
+    def load(self, file_path, size):
+        if self.closed or (file_path, size) in self.in_flight:
+            return
+        self.in_flight.add((file_path, size))
+        self.pool.start(_ThumbnailJob(self, file_path, size))
+
+    def close(self):
+        """
+        drop queued loads and wait for running ones to finish. must be called
+        before the worker is deleted.
+        """
+        self.closed = True
+        self.pool.clear()
+        self.pool.waitForDone()
+
+    def _on_loaded(self, file_path, size, image):
+        self.in_flight.discard((file_path, size))
@@ -5,16 +5,26 @@ import sip
 from timeit import default_timer
 from traceback import format_tb
 from pathlib import Path
-from functools import reduce
+from functools import reduce, lru_cache
+from contextlib import contextmanager
+import xml.etree.ElementTree as ET
 from enum import IntEnum, auto
 import platform, os, subprocess
 import re
 import math
 import json
+import hashlib
+import weakref
 from copy import deepcopy
 from krita import *
 app = Krita.instance()
 
+import logging
+logger = logging.getLogger("tomjk_quickexport")
+
+from .exportcache import export_manifest
+from .settingsstore import settings_store, entry_fragment, store_version
+
 PathRole = Qt.UserRole
 ItemTypeRole = Qt.UserRole + 1
 
@@ -117,23 +127,76 @@ widget_bin = WidgetBin()
 
 windows_forbidden_filename_chars = r"^<>:;?\*|/"
 
+class QESettingsDict(dict):
+    """
+    dict of settings entries keyed by path. keeps a memo of settings lookups
+    for files (see find_settings_for_file), which is cleared whenever an
+    entry is added or removed.
+    
+    also keeps the set of paths whose entries differ from the last load or
+    save, which is kept up to date by mark_settings_modified, and a
+    generation number that goes up at each load or save, and whenever
+    entries are added, removed or changed (see mark_settings_modified).
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lookup_cache = {}
+        self.modified_paths = set()
+        self.generation = 0
+    
+    def __deepcopy__(self, memo):
+        return QESettingsDict(deepcopy(dict(self), memo))
+    
+    def __setitem__(self, key, value):
+        if key not in self:
+            self.lookup_cache.clear()
+        super().__setitem__(key, value)
+    
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.lookup_cache.clear()
+    
+    def pop(self, *args):
+        self.lookup_cache.clear()
+        return super().pop(*args)
+    
+    def popitem(self):
+        self.lookup_cache.clear()
+        return super().popitem()
+    
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self.lookup_cache.clear()
+        return super().setdefault(key, default)
+    
+    def update(self, *args, **kwargs):
+        self.lookup_cache.clear()
+        super().update(*args, **kwargs)
+    
+    def clear(self):
+        self.lookup_cache.clear()
+        super().clear()
+
 qe_settings_last_load = {}
-qe_settings = {}
+qe_settings = QESettingsDict()
 
 def update_qe_settings_last_load():
+    """
+    remember the fingerprint of each settings entry as it is now, at load or save.
+    """
     global qe_settings_last_load
-    global qe_settings
-    qe_settings_last_load = deepcopy(qe_settings)
-
-def settings_last_load():
-    return qe_settings_last_load
+    qe_settings_last_load = {path:settings_fingerprint(s) for path,s in qe_settings.items()}
+    qe_settings.modified_paths.clear()
+    qe_settings.generation += 1
 
 qe_extension = None
 
 setting_defaults = {"show_unstored":"true", "show_unopened":"false", "show_non_kra":"false", "auto_save_on_close":"true", "use_custom_icons":"true",
                     "custom_icons_theme":"follow", "show_export_name_in_menu":"true", "default_export_unsaved":"false", "show_thumbnails_in_tree":"true",
                     "visible_types":".avif .exr .gif .ico .jpg .jpeg .jxl .png .tif .webp", "dialogWidth":"1024", "dialogHeight":"640", "columns_state":"",
-                    "wide_column_resize_grabber":"false", "create_missing_folders_at_export":"ask", "show_thumbnail_for_selected":"true", "settings_version":""}
+                    "wide_column_resize_grabber":"false", "create_missing_folders_at_export":"ask", "show_thumbnail_for_selected":"true", "skip_unchanged_exports":"true",
+                    "batch_export_processes":"1", "background_export":"false", "export_on_save_interval":"2",
+                    "settings_version":""}
 
 filter_strategy_strings         = ["Auto", "Bell", "Bicubic", "Bilinear", "BSpline", "Hermite", "Lanczos3", "Mitchell", "NearestNeighbor"]
 filter_strategy_display_strings = ["Auto", "Bell", "Bicubic", "Bilinear", "BSpline", "Hermite", "Lanczos3", "Mitchell", "Nearest"]
@@ -152,10 +215,69 @@ def set_extension(extension):
 def extension():
     return qe_extension
 
+def plugin_data_dir():
+    """
+    folder in Krita's resource folder for files the plugin keeps between sessions.
+    separate from the plugin folder so it survives reinstalling the plugin.
+    """
+    return Path(app.getAppDataLocation()) / "tomjk_quickexport"
+
+export_manifest.set_path(plugin_data_dir() / "export_manifest.json")
+settings_store.set_path(plugin_data_dir() / "settings.json")
+
+# 0.2.0+ keep export settings in the settings store file. kritarc only records the version.
+current_settings_version = store_version
+
+settings_source = None
+
+@contextmanager
+def settings_source_override(source):
+    """
+    within the with block, readSetting and writeSetting use source (eg. a
+    configfile.SettingsFile) instead of Krita's kritarc.
+    """
+    global settings_source
+    previous_source = settings_source
+    settings_source = source
+    try:
+        yield source
+    finally:
+        settings_source = previous_source
+
+class PluginOptions:
+    """
+    in-memory copy of the plugin options (the settings in setting_defaults),
+    each read from kritarc once on first use. writes go to both.
+    """
+    def __init__(self):
+        self.values = {}
+    
+    def read(self, setting, default):
+        if setting not in self.values:
+            self.values[setting] = app.readSetting("TomJK_QuickExport", setting, default)
+        return self.values[setting]
+    
+    def write(self, setting, value):
+        self.values[setting] = value
+        app.writeSetting("TomJK_QuickExport", setting, value)
+
+plugin_options = PluginOptions()
+
 def readSetting(setting, default_override=None):
-    return app.readSetting("TomJK_QuickExport", setting, default_override if default_override!=None else setting_defaults[setting])
+    default = default_override if default_override!=None else setting_defaults[setting]
+    if settings_source:
+        return settings_source.readSetting(setting, default)
+    if setting in setting_defaults:
+        return plugin_options.read(setting, default)
+    return app.readSetting("TomJK_QuickExport", setting, default)
 
 def writeSetting(setting, value):
+    if settings_source:
+        settings_source.writeSetting(setting, value)
+        return
+    if setting in setting_defaults:
+        plugin_options.write(setting, value)
+        return
     app.writeSetting("TomJK_QuickExport", setting, value)
 
 def bool2str(boolval):
@@ -189,44 +311,399 @@ def configless_extensions():
 def config_aliases():
     return qe_config_aliases
 
+basic_settings_defaults = {
+    "file_name_source":int(QEFileNameSource.PROJECT),
+    "file_name_custom":"",
+    "ext":".png",
+    "location":int(QELocation.IN_SAME_FOLDER),
+    "location_name_source":int(QEFolderNameSource.PROJECT),
+    "location_name_custom":"",
+    "location_custom":Path(),
+    "scale":False,
+    "scale_side":int(QEImageEdge.HEIGHT),
+    "scale_width":100.0,
+    "scale_width_mode":int(QEUnits.PERCENT),
+    "scale_height":100.0,
+    "scale_height_mode":int(QEUnits.PERCENT),
+    "scale_keep_aspect":True,
+    "scale_filter":int(QEScaleStrategy.AUTO),
+    "scale_res":-1,
+    "export_on_save":False
+}
+
+# basic settings holding enum values, which are stored as plain ints.
+basic_settings_enum_keys = frozenset(("file_name_source", "location", "location_name_source", "scale_side",
+                                      "scale_width_mode", "scale_height_mode", "scale_filter"))
+
+# basic settings that don't affect the exported image, left out of export_settings_hash.
+basic_settings_non_output_keys = frozenset(("export_on_save",))
+
+class QEBasicSettings:
+    """
+    the basic settings of a settings entry, or of one of its extra outputs.
+    read and set by key like a dict, eg. s_basic["ext"], with the keys of
+    basic_settings_defaults only.
+    
+    the save string (see basic_settings_string) is made when first needed,
+    and kept until a setting is changed.
+    """
+    __slots__ = tuple(basic_settings_defaults) + ("save_string_",)
+    
+    def __init__(self, **values):
+        for key, value in basic_settings_defaults.items():
+            setattr(self, key, value)
+        self.save_string_ = None
+        for key, value in values.items():
+            self[key] = value
+    
+    def __getitem__(self, key):
+        if key not in basic_settings_defaults:
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def __setitem__(self, key, value):
+        if key not in basic_settings_defaults:
+            raise KeyError(key)
+        setattr(self, key, int(value) if key in basic_settings_enum_keys else value)
+        self.save_string_ = None
+    
+    def __contains__(self, key):
+        return key in basic_settings_defaults
+    
+    def __iter__(self):
+        return iter(basic_settings_defaults)
+    
+    def __len__(self):
+        return len(basic_settings_defaults)
+    
+    def get(self, key, default=None):
+        return getattr(self, key) if key in basic_settings_defaults else default
+    
+    def keys(self):
+        return basic_settings_defaults.keys()
+    
+    def values(self):
+        return [getattr(self, key) for key in basic_settings_defaults]
+    
+    def items(self):
+        return [(key, getattr(self, key)) for key in basic_settings_defaults]
+    
+    def copy(self):
+        # (all the values are immutable.)
+        s_basic = QEBasicSettings.__new__(QEBasicSettings)
+        for key in self.__slots__:
+            setattr(s_basic, key, getattr(self, key))
+        return s_basic
+    
+    __copy__ = copy
+    
+    def __deepcopy__(self, memo):
+        return self.copy()
+    
+    def __eq__(self, other):
+        if not isinstance(other, QEBasicSettings):
+            return NotImplemented
+        return self.values() == other.values()
+    
+    __hash__ = None
+    
+    def __repr__(self):
+        return f"QEBasicSettings({dict(self.items())})"
+    
+    def save_string(self):
+        """
+        the basic settings string (see basic_settings_string) without the node type.
+        """
+        if self.save_string_ is None:
+            scale_width = int(self.scale_width) if self.scale_width_mode == QEUnits.PIXELS else self.scale_width
+            scale_height = int(self.scale_height) if self.scale_height_mode == QEUnits.PIXELS else self.scale_height
+            scale_res = f"{self.scale_res:.4f}".rstrip('0').rstrip('.') if self.scale_res != -1 else "-1"
+            
+            self.save_string_ = (
+                f"{('p','f','c')[self.file_name_source]},"
+                f"{escape_settings_string(self.file_name_custom)},"
+                f"{self.ext[1:]},"
+                f"{('s','d','u','ud','c')[self.location]},"
+                f"{('p','c')[self.location_name_source]},"
+                f"{escape_settings_string(self.location_name_custom)},"
+                f"{escape_settings_string(self.location_custom.as_posix())},"
+                f"{bool2flag(self.scale)},{self.scale_side},{self.scale_width_mode},{scale_width},{self.scale_height_mode},{scale_height},{bool2flag(self.scale_keep_aspect)},{self.scale_filter},{scale_res},"
+                f"{bool2flag(self.export_on_save)}"
+            )
+        return self.save_string_
+
+# the keys of a settings entry's stored fields.
+settings_entry_keys = ("path", "node_type", "basic", "export", "outputs", "outputs_export")
+
+class QESettings:
+    """
+    a settings entry: the settings for the folder or project at path. read
+    and set by key like a dict, eg. s["basic"]["ext"]. its save strings can
+    be read at the "config_*" keys, eg. s["config_basic_string"] or
+    s["config_export_png_string"], but aren't listed by keys().
+    
+    "basic" is a QEBasicSettings, "export" is a QEExportConfigs of export
+    configs by extension key (eg. "png") and "outputs" is a list of
+    QEBasicSettings for any extra outputs. "outputs_export" has a
+    QEExportConfigs for each extra output, of configs of its own that it
+    uses instead of the entry's (usually none). add and remove outputs with
+    add_output and remove_output to keep the two lists in step.
+    
+    the fingerprint (see settings_fingerprint) is made when first needed,
+    and kept until generate_save_string is called for the entry, as it must
+    be after changing it (see mark_settings_modified).
+    """
+    __slots__ = settings_entry_keys + ("fingerprint_",)
+    
+    def __init__(self, path, node_type=QEItemType.INVALID, basic=None, export=None, outputs=None, outputs_export=None):
+        self.path = path
+        self.node_type = int(node_type)
+        self.basic = basic if basic is not None else QEBasicSettings()
+        self.export = QEExportConfigs(export or ())
+        self.outputs = outputs if outputs is not None else []
+        self.outputs_export = [QEExportConfigs(configs) for configs in (outputs_export or ())]
+        self.outputs_export += [QEExportConfigs() for _ in range(len(self.outputs) - len(self.outputs_export))]
+        self.fingerprint_ = None
+    
+    def __getitem__(self, key):
+        if key in settings_entry_keys:
+            return getattr(self, key)
+        if key == "config_path_string":
+            return self.path.as_posix()
+        if key == "config_macros_string":
+            return ""
+        if key == "config_basic_string":
+            return basic_settings_string(self.node_type, self.basic)
+        if key == "config_outputs_strings":
+            return [basic_settings_string(self.node_type, output) for output in self.outputs]
+        if key == "config_outputs_export_strings":
+            return [{ext_key:config.save_string for ext_key, config in configs.items()} for configs in self.outputs_export]
+        if key.startswith("config_export_") and key.endswith("_string"):
+            return self.export_string(key[len("config_export_"):-len("_string")])
+        raise KeyError(key)
+    
+    def __setitem__(self, key, value):
+        if key not in settings_entry_keys:
+            raise KeyError(key)
+        if key == "node_type":
+            value = int(value)
+        elif key == "export" and not isinstance(value, QEExportConfigs):
+            value = QEExportConfigs(value)
+        elif key == "outputs_export":
+            value = [configs if isinstance(configs, QEExportConfigs) else QEExportConfigs(configs) for configs in value]
+        setattr(self, key, value)
+    
+    def __contains__(self, key):
+        if key in settings_entry_keys or key in ("config_path_string", "config_macros_string", "config_basic_string", "config_outputs_strings", "config_outputs_export_strings"):
+            return True
+        if key.startswith("config_export_") and key.endswith("_string"):
+            return key[len("config_export_"):-len("_string")] in self.export
+        return False
+    
+    def __iter__(self):
+        return iter(settings_entry_keys)
+    
+    def __len__(self):
+        return len(settings_entry_keys)
+    
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    
+    def keys(self):
+        return settings_entry_keys
+    
+    def values(self):
+        return [getattr(self, key) for key in settings_entry_keys]
+    
+    def items(self):
+        return [(key, getattr(self, key)) for key in settings_entry_keys]
+    
+    def __deepcopy__(self, memo):
+        # (export configs are shared, see QEExportConfig.)
+        s = QESettings(self.path, self.node_type, self.basic.copy(), self.export, [output.copy() for output in self.outputs], self.outputs_export)
+        # the copy has the same content, so the same fingerprint.
+        s.fingerprint_ = self.fingerprint_
+        return s
+    
+    def __eq__(self, other):
+        if not isinstance(other, QESettings):
+            return NotImplemented
+        return self.values() == other.values()
+    
+    __hash__ = None
+    
+    def __repr__(self):
+        return f"QESettings({dict(self.items())})"
+    
+    def export_string(self, ext_key):
+        """
+        the JSON string of the export config for ext_key. raises KeyError if there isn't one.
+        """
+        return self.export[ext_key].save_string
+    
+    def for_output(self, s_basic, export=None):
+        """
+        a shallow copy of the entry with s_basic in place of its basic
+        settings and no extra outputs. it has the entry's export configs,
+        with those in export (an output's own configs) in their place.
+        """
+        return QESettings(self.path, self.node_type, s_basic, {**self.export, **export} if export else self.export, [])
+    
+    def add_output(self, s_basic, export=None):
+        """
+        add an extra output with basic settings s_basic, and export configs of its own if given.
+        exporting on save is set for the whole entry, so it's cleared in s_basic.
+        """
+        s_basic["export_on_save"] = False
+        self.outputs.append(s_basic)
+        self.outputs_export.append(QEExportConfigs(export or ()))
+    
+    def remove_output(self, index):
+        """
+        remove the extra output at index in outputs.
+        """
+        del self.outputs[index]
+        del self.outputs_export[index]
+    
+    def forget_save_strings(self):
+        self.fingerprint_ = None
+
+class QEExportConfig(dict):
+    """
+    an export config, shared by every settings entry with the same config
+    (see ExportConfigPool). it can't be changed: to change the config of one
+    entry, set a new config in its place, eg.
+    s["export"]["png"] = dict(s["export"]["png"], compression=9).
+    
+    save_string is its JSON string as saved, and canonical_string its JSON
+    string in the form used for comparing configs (see canonical_export_config).
+    """
+    __slots__ = ("save_string", "canonical_string", "__weakref__")
+    
+    def _shared(self, *args, **kwargs):
+        raise TypeError("Export configs are shared between settings entries and can't be changed, set a new one instead.")
+    
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = _shared
+    
+    def copy(self):
+        """
+        a plain dict copy of the config, that can be changed.
+        """
+        return dict(self)
+    
+    def __copy__(self):
+        return self
+    
+    def __deepcopy__(self, memo):
+        return self
+    
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+class ExportConfigPool:
+    """
+    the export configs in use, one QEExportConfig per distinct config, keyed
+    by its JSON with sorted keys. configs can also be looked up by the JSON
+    string they were saved as, without parsing it again. configs no longer
+    used by any entry are dropped.
+    """
+    def __init__(self):
+        self.configs = weakref.WeakValueDictionary()
+        self.configs_by_string = weakref.WeakValueDictionary()
+    
+    def intern(self, config):
+        """
+        return the shared QEExportConfig with the same content as config.
+        """
+        if isinstance(config, QEExportConfig):
+            return config
+        
+        key = json.dumps(config, sort_keys=True, separators=(",",":"))
+        shared = self.configs.get(key)
+        if shared is None:
+            # (values are JSON values, so only lists and dicts need copying.)
+            shared = QEExportConfig((k, deepcopy(v) if isinstance(v, (list, dict)) else v) for k,v in config.items())
+            shared.save_string = json.dumps(shared, separators=(",",":"))
+            shared.canonical_string = json.dumps(canonical_export_config(shared), sort_keys=True, separators=(",",":"))
+            self.configs[key] = shared
+            self.configs_by_string[shared.save_string] = shared
+        return shared
+    
+    def intern_string(self, string):
+        """
+        return the shared QEExportConfig for a config saved as JSON string.
+        """
+        shared = self.configs_by_string.get(string)
+        if shared is None:
+            shared = self.intern(json.loads(string))
+            self.configs_by_string[string] = shared
+        return shared
+
+export_config_pool = ExportConfigPool()
+
+class QEExportConfigs(dict):
+    """
+    the export configs of a settings entry by extension key. configs set in
+    it are replaced by the shared one from export_config_pool.
+    """
+    __slots__ = ()
+    
+    def __init__(self, configs=()):
+        super().__init__()
+        for ext_key, config in dict(configs).items():
+            self[ext_key] = config
+    
+    def __setitem__(self, ext_key, config):
+        super().__setitem__(ext_key, export_config_pool.intern(config))
+    
+    def setdefault(self, ext_key, config=None):
+        if ext_key not in self:
+            self[ext_key] = config
+        return self[ext_key]
+    
+    def update(self, *args, **kwargs):
+        for ext_key, config in dict(*args, **kwargs).items():
+            self[ext_key] = config
+    
+    def copy(self):
+        return QEExportConfigs(self)
+    
+    __copy__ = copy
+    
+    def __deepcopy__(self, memo):
+        return self.copy()
+    
+    def __reduce__(self):
+        return (QEExportConfigs, (dict(self),))
+
 def default_settings(path, *, node_type=QEItemType.INVALID, document=None, doc_index=1024, store=False, output_name="", ext=".png"):
-    settings = {
-        "config_path_string":"",
-        "config_macros_string":"",
-        "config_basic_string":"",
-        "path":path,
-        "node_type":node_type,
-        "export":{},
-        "basic":{
-            "file_name_source":QEFileNameSource.PROJECT,
-            "file_name_custom":"",
-            "ext":ext,
-            "location":QELocation.IN_SAME_FOLDER,
-            "location_name_source":QEFolderNameSource.PROJECT,
-            "location_name_custom":"",
-            "location_custom":Path(),
-            "scale":False,
-            "scale_side":QEImageEdge.HEIGHT,
-            "scale_width":100.0,
-            "scale_width_mode":QEUnits.PERCENT,
-            "scale_height":100.0,
-            "scale_height_mode":QEUnits.PERCENT,
-            "scale_keep_aspect":True,
-            "scale_filter":QEScaleStrategy.AUTO,
-            "scale_res":-1
-        }
-    }
-    generate_save_string(path, settings)
-    return settings
+    return QESettings(path, node_type, QEBasicSettings(ext=ext))
+
+def mark_settings_modified(*paths):
+    """
+    call after adding, removing or changing the settings entries for paths.
+    regenerates the save strings of those entries only, updates whether
+    each differs from the last load or save, and bumps qe_settings.generation.
+    """
+    qe_settings.generation += 1
+    
+    for path in paths:
+        if path in qe_settings:
+            generate_save_string(path)
+            modified = qe_settings_last_load.get(path) != settings_fingerprint(qe_settings[path])
+        else:
+            modified = path in qe_settings_last_load
+        
+        if modified:
+            qe_settings.modified_paths.add(path)
+        else:
+            qe_settings.modified_paths.discard(path)
 
 def is_any_qe_setting_modified():
-    # TODO: quite fragile, affected by order of items in dictionary.
-    #       but safe-ish; errs on side of false-positive.
-    #       Update: actually seems to be caused by colour strings (eg.
-    #       for transparency colour) rearranging elements randomly.
-    #       fixing this goes a bit against the "hands-off" approach to
-    #       type-specific export configs, so not sure what's best to do.
-    return qe_settings != qe_settings_last_load
+    return len(qe_settings.modified_paths) > 0
 
 def load_settings_from_config(suppress_version_warning=False):
     qe_settings.clear()
@@ -247,7 +724,21 @@ def load_settings_from_config(suppress_version_warning=False):
         save_settings_to_config()
     
     elif settings_version == "0.1.0":
-        return load_0_1_0_settings_from_config()
+        # entries are moved out of kritarc into the settings store file. the
+        # kritarc keys are left in place as a backup for older plugin versions.
+        if not load_0_1_0_settings_from_config():
+            return False
+        
+        if not save_settings_to_config():
+            return False
+    
+    elif settings_version == current_settings_version:
+        if settings_store.exists():
+            if not load_settings_from_store():
+                return False
+        else:
+            logger.warning(f"Settings file '{settings_store.path}' not found, starting with no export settings.")
+            settings_store.fragments = {}
     
     else:
         if suppress_version_warning:
@@ -257,7 +748,7 @@ def load_settings_from_config(suppress_version_warning=False):
         msgBox.setText("Quick Export settings in unsupported format found.")
         msgBox.setInformativeText(
             "Settings were saved in a different format by a later version of QuickExport. They can not be read by this version.\n\n" \
-            "compatible versions: 0.1.0 and below\n" \
+            f"compatible versions: {current_settings_version} and below\n" \
             f"saved as version: {settings_version}\n\n" \
             "It may be that a backup was made before saving the later version settings - check in your kritarc file.\n\n" \
             "You may also try opening an issue on the Github to request a converter, but using the latest version of the plugin is recommended.\n\n" \
@@ -278,109 +769,174 @@ def load_settings_from_config(suppress_version_warning=False):
     
     return True
 
-def load_0_1_0_settings_from_config():
+def read_settings_string(string):
+    start_idx = 0
+    end_idx = 0
+    final_idx = len(string)
+    subs = ""
+    while True:
+        end_idx += 1
+        if end_idx == final_idx:
+            yield string[start_idx:end_idx]
+            break
+        subs += string[end_idx]
+        if subs.endswith("//"):
+            subs = ""
+        elif subs.endswith("/,"):
+            subs == ""
+        elif subs.endswith(","):
+            subs = ""
+            yield string[start_idx:end_idx]
+            start_idx = end_idx+1
+
+def settings_from_config_strings(config_path_string, config_basic_string, config_export_strings, config_outputs_strings=(), config_outputs_export_strings=()):
+    """
+    build a settings entry (a QESettings) from its stored strings.
+    config_export_strings maps extension keys (eg. "png") to export config JSON strings.
+    config_outputs_strings are the basic settings strings of any extra outputs.
+    config_outputs_export_strings are, for each extra output, its own export
+    configs as for config_export_strings.
     """
-    read in settings from kritarc. example:
+    node_type, s_basic = basic_settings_from_string(config_basic_string)
+    outputs = [basic_settings_from_string(output_string)[1] for output_string in config_outputs_strings]
+    for output in outputs:
+        # (exporting on save is only set on the entry.)
+        output["export_on_save"] = False
+    export = {ext_key:export_config_pool.intern_string(ext_ss) for ext_key, ext_ss in config_export_strings.items() if ext_ss}
+    outputs_export = [{ext_key:export_config_pool.intern_string(ext_ss) for ext_key, ext_ss in export_strings.items() if ext_ss}
+                      for export_strings in config_outputs_export_strings]
+    
+    # (save strings are made from the settings when needed, so entries stored
+    # without later fields match how they'd be saved now.)
+    return QESettings(Path(config_path_string), node_type, s_basic, export, outputs, outputs_export)
+
+def basic_settings_from_string(config_basic_string):
+    """
+    return (node type, QEBasicSettings) read from a basic settings string.
+    """
+    s_basic = QEBasicSettings()
+    ss = read_settings_string(config_basic_string)
+    node_type                         = ('p','f').index(next(ss))
+    s_basic["file_name_source"]       = ('p','f','c').index(next(ss))
+    s_basic["file_name_custom"]       = unescape_settings_string(next(ss))
+    s_basic["ext"]                    = "." + next(ss)
+    s_basic["location"]               = ('s','d','u','ud','c').index(next(ss))
+    s_basic["location_name_source"]   = ('p','c').index(next(ss))
+    s_basic["location_name_custom"]   = unescape_settings_string(next(ss))
+    s_basic["location_custom"]        = Path(unescape_settings_string(next(ss)))
+    s_basic["scale"]                  = flag2bool(next(ss))
+    s_basic["scale_side"]             = int(next(ss))
+    sm = int(next(ss))
+    s_basic["scale_width_mode"]       = sm
+    s_basic["scale_width"]            = int(next(ss)) if sm == QEUnits.PIXELS else float(next(ss))
+    sm = int(next(ss))
+    s_basic["scale_height_mode"]      = sm
+    s_basic["scale_height"]           = int(next(ss)) if sm == QEUnits.PIXELS else float(next(ss))
+    s_basic["scale_keep_aspect"]      = flag2bool(next(ss))
+    s_basic["scale_filter"]           = int(next(ss))
+    sr = next(ss)
+    s_basic["scale_res"]              = float(sr) if sr != "-1" else -1
+    # added in 0.2.0, may be missing.
+    s_basic["export_on_save"]         = flag2bool(next(ss, "0"))
+    
+    return node_type, s_basic
+
+def show_settings_load_error(e, entry_description, help_text, settings_values):
+    e_tb = format_tb(e.__traceback__)
+    msgBox = QMessageBox(QMessageBox.Critical,
+                         "Quick Export",
+                         "The Quick Export plugin configuration could not be read.",
+                         QMessageBox.Ok,
+                         app.activeWindow().qwindow() if app.activeWindow() else None)
+    msgBox.setDetailedText(f"{help_text}\n\n"
+                           "----\n\n"
+                           f"While loading settings for {entry_description}, the following error occured:\n\n{type(e).__name__}: {e}\n\n"
+                           f"{"\n".join(e_tb)}\n"
+                           "----\n\n"
+                           f"Settings values at time of error:\n\n{'\n'.join((f'{k}: {v}' for k,v in settings_values.items()))}")
+    msgBox.exec()
+
+def load_0_1_0_settings_from_config(show_errors=True):
+    """
+    read in settings from kritarc. if show_errors is False, a failure to read
+    is only logged rather than reported in a message box. example:
     file0/macros=
     file0/path=/home/user/mypic
     file0/png={"alpha":false,"compression":3,"downsample":false  ..  "transparencyFillcolor":"<!DOCTYPE color>\n<color channeldepth=\"U8\">\n <RGB space=\"sRGB-elle-V2-srgbtrc.icc\" r=\"1\" g=\"1\" b=\"1\"/>\n</color>\n"}
     file0/basic=p,p,,png,s,p,,.,1,1.0,1.0,0,-1
     """
-    global qe_settings
     qe_settings_backup = deepcopy(qe_settings)
     
     settings_index = 0
+    values = {}
     
     try:
         while readSetting(f"file{settings_index}/path", "") != "":
-
-            config_path_string = readSetting(f"file{settings_index}/path", "")
-            path = Path(config_path_string)
-
-            settings = default_settings(path, store=True)
-            
-            settings["config_path_string"]   = config_path_string
-            settings["config_macros_string"] = readSetting(f"file{settings_index}/macros", "")
-            settings["config_basic_string"]  = readSetting(f"file{settings_index}/basic", "")
-            
-            settings["path"] = path
-            
-            def read_settings_string(string):
-                start_idx = 0
-                end_idx = 0
-                final_idx = len(string)
-                subs = ""
-                while True:
-                    end_idx += 1
-                    if end_idx == final_idx:
-                        yield string[start_idx:end_idx]
-                        break
-                    subs += string[end_idx]
-                    if subs.endswith("//"):
-                        subs = ""
-                    elif subs.endswith("/,"):
-                        subs == ""
-                    elif subs.endswith(","):
-                        subs = ""
-                        yield string[start_idx:end_idx]
-                        start_idx = end_idx+1
-            
-            s_basic = settings["basic"]
-            ss = read_settings_string(settings["config_basic_string"])
-            settings["node_type"]             = ('p','f').index(next(ss))
-            s_basic["file_name_source"]       = ('p','f','c').index(next(ss))
-            s_basic["file_name_custom"]       = unescape_settings_string(next(ss))
-            s_basic["ext"]                    = "." + next(ss)
-            s_basic["location"]               = ('s','d','u','ud','c').index(next(ss))
-            s_basic["location_name_source"]   = ('p','c').index(next(ss))
-            s_basic["location_name_custom"]   = unescape_settings_string(next(ss))
-            s_basic["location_custom"]        = Path(unescape_settings_string(next(ss)))
-            s_basic["scale"]                  = flag2bool(next(ss))
-            s_basic["scale_side"]             = int(next(ss))
-            sm = int(next(ss))
-            s_basic["scale_width_mode"]       = sm
-            s_basic["scale_width"]            = int(next(ss)) if sm == QEUnits.PIXELS else float(next(ss))
-            sm = int(next(ss))
-            s_basic["scale_height_mode"]      = sm
-            s_basic["scale_height"]           = int(next(ss)) if sm == QEUnits.PIXELS else float(next(ss))
-            s_basic["scale_keep_aspect"]      = flag2bool(next(ss))
-            s_basic["scale_filter"]           = int(next(ss))
-            sr = next(ss)
-            s_basic["scale_res"]              = float(sr) if sr != "-1" else -1
+            values = {"path":readSetting(f"file{settings_index}/path", ""), "basic":readSetting(f"file{settings_index}/basic", "")}
+            export_strings = {ext[1:]:readSetting(f"file{settings_index}/{ext[1:]}", "") for ext in supported_extensions()}
             
-            for ext in supported_extensions():
-                ext_key = ext[1:]
-                ext_ss = readSetting(f"file{settings_index}/{ext_key}", "")
-                
-                if not ext_ss:
-                    continue
-                
-                settings[f"config_export_{ext_key}_string"] = ext_ss
-                settings["export"][ext_key] = json.loads(ext_ss)
-            
-            qe_settings[path] = settings
+            settings = settings_from_config_strings(values["path"], values["basic"], export_strings)
+            qe_settings[settings["path"]] = settings
             settings_index += 1
         return True
         
     except Exception as e:
-        from traceback import format_tb
-        e_tb = format_tb(e.__traceback__)
-        msgBox = QMessageBox(QMessageBox.Critical,
-                             "Quick Export",
-                             "The Quick Export plugin configuration could not be read.",
-                             QMessageBox.Ok,
-                             app.activeWindow().qwindow() if app.activeWindow() else None)
-        msgBox.setDetailedText(f"You can try removing or editing the lines with keys starting 'file{settings_index}' under the [TomJK_QuickExport] group in your kritarc file. Be sure to close Krita before doing so.\n\n"
-                               "----\n\n"
-                               f"While loading settings for file #{settings_index}, the following error occured:\n\n{type(e).__name__}: {e}\n\n"
-                               f"{"\n".join(e_tb)}\n"
-                               "----\n\n"
-                               f"Settings values at time of error:\n\n{'\n'.join((f'{k}: {v}' for k,v in settings.items()))}")
-        msgBox.exec()
-        qe_settings = qe_settings_backup
+        qe_settings.clear()
+        qe_settings.update(qe_settings_backup)
+        
+        if not show_errors:
+            logger.error(f"Couldn't read settings for file #{settings_index}: {type(e).__name__}: {e}")
+            return False
+        
+        show_settings_load_error(e, f"file #{settings_index}",
+                                 f"You can try removing or editing the lines with keys starting 'file{settings_index}' under the [TomJK_QuickExport] group in your kritarc file. Be sure to close Krita before doing so.",
+                                 values)
+        return False
+
+def load_settings_from_store(store=None, show_errors=True):
+    """
+    read in settings from the settings store file (settings_store unless store is given).
+    if show_errors is False, a failure to read is only logged rather than reported in a message box.
+    """
+    store = store or settings_store
+    
+    qe_settings_backup = deepcopy(qe_settings)
+    
+    entry_index = 0
+    entry = {}
+    fragments = {}
     
+    try:
+        entries = store.read()
+        
+        for entry_index, entry in enumerate(entries):
+            export_strings = {ext_key:export_config_pool.intern(config).save_string for ext_key, config in entry["export"].items()}
+            
+            outputs_strings = entry.get("outputs", [])
+            outputs_export_strings = [{ext_key:export_config_pool.intern(config).save_string for ext_key, config in configs.items()}
+                                      for configs in entry.get("outputs_export", [])]
+            
+            settings = settings_from_config_strings(entry["path"], entry["basic"], export_strings, outputs_strings, outputs_export_strings)
+            qe_settings[settings["path"]] = settings
+            fragments[settings["path"]] = entry_fragment(entry["path"], entry["basic"], export_strings, outputs_strings, outputs_export_strings)
+        
+        store.fragments = fragments
+        return True
+        
+    except Exception as e:
+        qe_settings.clear()
+        qe_settings.update(qe_settings_backup)
+        
+        if not show_errors:
+            logger.error(f"Couldn't read settings for entry #{entry_index} of '{store.path}': {type(e).__name__}: {e}")
+            return False
+        
+        show_settings_load_error(e, f"entry #{entry_index} of '{store.path}'",
+                                 f"You can try removing or editing entry #{entry_index} in '{store.path}'. Be sure to close Krita before doing so.",
+                                 entry if isinstance(entry, dict) else {})
+        return False
 
-def find_settings_path_for_file(file_path):
+def find_settings_for_file(file_path):
     """
     for given path to a file "/path/to/file.kra", find path of best (most specific) matching export settings.
     
@@ -388,116 +944,148 @@ def find_settings_path_for_file(file_path):
     if export settings exist for the parent /path/to, fallback to that.
     otherwise, no settings exist for the file.
     
-    return: settings path if found, else None.
-    """
+    results are memoized until a settings entry is added or removed.
     
-    def print(*args):
-        pass
+    return: (settings path, QEItemType.PROJECT or QEItemType.FOLDER) if found, else (None, QEItemType.INVALID).
+    """
     
     if not file_path:
-        return None
+        return None, QEItemType.INVALID
+    
+    cache = qe_settings.lookup_cache
+    
+    result = cache.get(file_path)
+    if result:
+        return result
     
     folder_path = file_path.parent
-    base_version_string, match_version_number = base_stem_and_version_number_for_versioned_file(file_path, unversioned_version_num=0)
-    base_path = folder_path / Path(base_version_string)
+    base_path = folder_path / base_stem_and_version_number_for_versioned_file(file_path)[0]
     
-    #print(f"find_settings_path_for_file {file_path}: looking for {base_path=}")
     if base_path in qe_settings:
-        #print(f"find_settings_path_for_file {file_path}: got settings for project.")
-        return base_path
-    
-    #print(f"find_settings_path_for_file {file_path}: looking for {folder_path=}")
-    if folder_path in qe_settings:
-        #print(f"find_settings_path_for_file {file_path}: got settings for containing folder.")
-        return folder_path
+        result = (base_path, QEItemType.PROJECT)
+    elif folder_path in qe_settings:
+        result = (folder_path, QEItemType.FOLDER)
+    else:
+        result = (None, QEItemType.INVALID)
     
-    #print(f"find_settings_for_file {file_path}: no settings found.")
-    return None
+    cache[file_path] = result
+    return result
+
+def find_settings_path_for_file(file_path):
+    """
+    as find_settings_for_file, returning only the settings path, or None.
+    """
+    return find_settings_for_file(file_path)[0]
 
 def generate_save_string(settings_path, s=None):
     """
     settings_path accepts a Path object.
-    s accepts a settings dictionary.
+    s accepts a QESettings.
     If s is None, settings_path is used as key to qe_settings.
+    
+    the save strings are made again from the settings when next needed.
     """
-    if not s:
+    if s is None:
         s = qe_settings[settings_path]
-        
-    s_basic = s["basic"]
-    scale_width = int(s_basic['scale_width']) if s_basic['scale_width_mode'] == QEUnits.PIXELS else s_basic['scale_width']
-    scale_height = int(s_basic['scale_height']) if s_basic['scale_height_mode'] == QEUnits.PIXELS else s_basic['scale_height']
-    scale_res = f"{s_basic['scale_res']:.4f}".rstrip('0').rstrip('.') if s_basic["scale_res"] != -1 else "-1"
-    
-    s["config_path_string"] = settings_path.as_posix()
-    s["config_macros_string"] = ""
-    s["config_basic_string"] = (
-        f"{('p','f')[s['node_type']]},"
-        f"{('p','f','c')[s_basic['file_name_source']]},"
-        f"{escape_settings_string(s_basic['file_name_custom'])},"
-        f"{s_basic['ext'][1:]},"
-        f"{('s','d','u','ud','c')[s_basic['location']]},"
-        f"{('p','c')[s_basic['location_name_source']]},"
-        f"{escape_settings_string(s_basic['location_name_custom'])},"
-        f"{escape_settings_string(s_basic['location_custom'].as_posix())},"
-        f"{bool2flag(s_basic['scale'])},{int(s_basic['scale_side'])},{int(s_basic['scale_width_mode'])},{scale_width},{int(s_basic['scale_height_mode'])},{scale_height},{bool2flag(s_basic['scale_keep_aspect'])},{s_basic["scale_filter"]},{scale_res}"
-    )
     
-    #print(f"{s['config_basic_string']=}")
+    s["path"] = settings_path
+    s.forget_save_strings()
 
-    for ext in supported_extensions():
-        ext_key = ext[1:]
-        
-        if ext_key not in s["export"]:
-            continue
-        
-        s[f"config_export_{ext_key}_string"] = json.dumps(s["export"][ext_key], separators=(",",":"))
+def basic_settings_string(node_type, s_basic):
+    return f"{('p','f')[node_type]}," + s_basic.save_string()
+
+@lru_cache(maxsize=256)
+def canonical_colour_xml(xml_string):
+    """
+    colour XML (as from ManagedColor.toXML) in canonical form, so that
+    strings for the same colour compare equal regardless of attribute order
+    and whitespace. other strings are returned unchanged.
+    """
+    try:
+        return ET.canonicalize(xml_string, strip_text=True)
+    except ET.ParseError:
+        return xml_string
+
+def canonical_export_config(config):
+    """
+    copy of an export config with colour XML strings in canonical form.
+    """
+    return {k:(canonical_colour_xml(v) if isinstance(v, str) and v.lstrip().startswith("<") else v) for k,v in config.items()}
+
+def settings_fingerprint(s):
+    """
+    hash identifying the content of settings entry s, for telling whether it
+    has changed. the basic settings are taken from the save strings, which
+    must be up to date. not affected by the order of export config properties
+    or of the attributes in colour strings, which Krita doesn't keep stable.
+    kept by s until generate_save_string is called for it.
+    """
+    if s.fingerprint_ is None:
+        export = {ext_key:config.canonical_string for ext_key,config in s["export"].items()}
+        outputs_export = [{ext_key:config.canonical_string for ext_key,config in configs.items()} for configs in s["outputs_export"]]
+        data = json.dumps([s["config_path_string"], s["config_basic_string"], s["config_outputs_strings"], export, outputs_export], sort_keys=True, separators=(",",":"), default=str)
+        s.fingerprint_ = hashlib.sha1(data.encode("utf-8")).hexdigest()
+    return s.fingerprint_
 
 def save_settings_to_config():
     #print("save_settings_to_config")
     
-    settings_index = 0
+    try:
+        write_settings_to_store()
+    except OSError as e:
+        logger.error(f"Couldn't write settings to '{settings_store.path}': {type(e).__name__}: {e}")
+        msgBox = QMessageBox(QMessageBox.Critical,
+                             "Quick Export",
+                             f"The Quick Export settings could not be saved to '{settings_store.path}'.",
+                             QMessageBox.Ok,
+                             app.activeWindow().qwindow() if app.activeWindow() else None)
+        msgBox.setDetailedText(f"{type(e).__name__}: {e}")
+        msgBox.exec()
+        return False
+    
+    writeSetting("settings_version", current_settings_version)
+    
+    update_qe_settings_last_load()
+    extension().set_action_icons()
+    return True
+
+def export_settings_to_file(path):
+    """
+    write all export settings to a settings store file at path, for use with
+    the headless runner.
+    """
+    from .settingsstore import SettingsStore
+    write_settings_to_store(SettingsStore(Path(path)))
+
+def write_settings_to_store(store=None):
+    """
+    write all settings entries to store (settings_store if not given).
+    only entries marked as modified since the last load or save are
+    serialized again, the rest reuse the store's fragments from the last load
+    or save. the file isn't touched if nothing has changed.
+    raises OSError if the file couldn't be written.
+    """
+    store = store or settings_store
+    
+    fragments = {}
+    changed = list(qe_settings.keys()) != list(store.fragments.keys())
     
     for path,s in qe_settings.items():
-        generate_save_string(path)
-        
-        path_string   = s["config_path_string"]
-        macros_string = s["config_macros_string"]
-        basic_string  = s["config_basic_string"]
+        fragment = store.fragments.get(path)
         
-        writeSetting(f"file{settings_index}/path", path_string)
-        #writeSetting(f"file{settings_index}/macros", macros_string)
-        writeSetting(f"file{settings_index}/basic", basic_string)
+        if fragment is None or path in qe_settings.modified_paths:
+            generate_save_string(path)
+            export_strings = {ext_key:s.export_string(ext_key) for ext_key in s["export"]}
+            fragment = entry_fragment(s["config_path_string"], s["config_basic_string"], export_strings, s["config_outputs_strings"], s["config_outputs_export_strings"])
+            changed = changed or fragment != store.fragments.get(path)
         
-        for ext in supported_extensions():
-            ext_key = ext[1:]
-            
-            if ext_key in s["export"]:
-                export_string = s[f"config_export_{ext_key}_string"] # ~ or s[f"config_stored_export_{ext_key}_string"]
-            else:
-                # erase export config for extension if exists.
-                if not readSetting(f"file{settings_index}/{ext_key}", ""):
-                    continue
-                export_string = ""
-            
-            writeSetting(f"file{settings_index}/{ext_key}", export_string)
-        
-        settings_index += 1
+        fragments[path] = fragment
     
-    # clear up old config remnants.
-    while readSetting(f"file{settings_index}/path", "") != "":
-        writeSetting(f"file{settings_index}/path", "")
-        #writeSetting(f"file{settings_index}/macros", "")
-        writeSetting(f"file{settings_index}/basic", "")
-        for ext in supported_extensions():
-            ext_key = ext[1:]
-            if readSetting(f"file{settings_index}/{ext_key}", ""):
-                writeSetting(f"file{settings_index}/{ext_key}", "")
-        settings_index += 1
-    
-    writeSetting("settings_version", "0.1.0")
+    if not changed and store.exists():
+        return
     
-    update_qe_settings_last_load()
-    extension().set_action_icons()
+    store.write(fragments.values())
+    store.fragments = fragments
 
 def escape_settings_string(s):
     return s.replace("/", "//").replace(",", "/,")
@@ -564,6 +1152,65 @@ def export_file_path(settings, source_path, item_type=QEItemType.FILE):
     return output_folder / (output_stem + output_extension)
     
 
+def export_settings_hash(settings):
+    """
+    hash of the settings that affect the exported image: the basic settings
+    (apart from basic_settings_non_output_keys) and the export config for
+    the active export type.
+    """
+    s_basic = settings["basic"]
+    ext_key = s_basic["ext"][1:]
+    ext_key = config_aliases().get(ext_key, ext_key)
+    
+    basic = {k:(v.as_posix() if isinstance(v, Path) else v) for k,v in s_basic.items() if k not in basic_settings_non_output_keys}
+    export = settings["export"].get(ext_key)
+    # the same as dumping [basic, canonical_export_config(export)], reusing the config's canonical string.
+    data = f'[{json.dumps(basic, sort_keys=True, separators=(",",":"), default=str)},{export.canonical_string if export else "null"}]'
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+def output_settings(settings):
+    """
+    return list of settings for each output of a settings entry: the entry
+    itself, then for each of its extra outputs a shallow copy of the entry
+    with the output's basic settings in place of its own. extra outputs
+    use the entry's export configs except where they have their own.
+    """
+    return [settings] + [settings.for_output(s_basic, export) for s_basic, export in zip(settings["outputs"], settings["outputs_export"])]
+
+def make_output_file_name_distinct(settings, s_basic):
+    """
+    if extra output basic settings s_basic would export to the same path as
+    an output of settings entry settings, give it a custom file name that
+    doesn't. only done for project entries that don't name exports after
+    the version file, otherwise the name would be the same for every file.
+    """
+    if settings["node_type"] != QEItemType.PROJECT or s_basic["file_name_source"] == QEFileNameSource.FILE:
+        return
+    
+    path = settings["path"]
+    used_paths = {export_file_path(output, path, item_type=QEItemType.PROJECT) for output in output_settings(settings)}
+    output_path = export_file_path(settings.for_output(s_basic), path, item_type=QEItemType.PROJECT)
+    
+    stem = output_path.stem
+    n = 2
+    while output_path in used_paths:
+        s_basic["file_name_source"] = QEFileNameSource.CUSTOM
+        s_basic["file_name_custom"] = f"{stem}-{n}"
+        n += 1
+        output_path = export_file_path(settings.for_output(s_basic), path, item_type=QEItemType.PROJECT)
+
+def export_is_up_to_date(settings_path, source_path):
+    """
+    True if source_path was last exported to every output with the current
+    settings for settings_path, and neither the source file nor the exported
+    files have changed since.
+    """
+    for output in output_settings(qe_settings[settings_path]):
+        export_path = export_file_path(output, source_path)
+        if not export_manifest.is_up_to_date(source_path, export_path, export_settings_hash(output)):
+            return False
+    return True
+
 export_failed_msg_ = ""
 
 def export_failed_msg():
@@ -573,35 +1220,30 @@ def set_export_failed_msg(msg):
     global export_failed_msg_
     export_failed_msg_ = msg
 
-def export_image(settings_path, document=None):
-    exportParameters = InfoObject()
-    
-    settings = qe_settings[settings_path]
-    s_basic = settings["basic"]
-    s_export = settings["export"]
-    
-    ext = s_basic["ext"]
+def export_config_for_settings(settings):
+    """
+    return (ext, export config) for the active export type of settings. the
+    config is {} for types that don't have one, and None if the type needs
+    one but there isn't one stored.
+    """
+    ext = settings["basic"]["ext"]
     ext_key = ext[1:]
     
     if ext_key in config_aliases():
         ext_key = config_aliases()[ext_key]
     
-    if not ext in configless_extensions():
-        if ext_key in s_export:
-            for k,v in s_export[ext_key].items():
-                exportParameters.setProperty(k, v)
-        else:
-            set_export_failed_msg(f"No configuration for {ext} file type.")
-            return False
-    
-    #for p in exportParameters.properties():
-        #print(p)
-    
-    if not document:
-        document = settings["document"]
-    
-    export_path = export_file_path(settings, Path(document.fileName()))
+    if ext in configless_extensions():
+        return ext, {}
     
+    return ext, settings["export"].get(ext_key)
+
+def prepare_export_folder(export_path, create_missing_folders=None):
+    """
+    check export_path can be written to, creating missing folders if allowed.
+    create_missing_folders overrides the "create_missing_folders_at_export"
+    setting when given ("never", "ask" or "always").
+    returns True if ok. if not, the reason is available from export_failed_msg().
+    """
     if not export_path.is_absolute():
         set_export_failed_msg(f"The configured export path is invalid.")
         return False
@@ -611,7 +1253,7 @@ def export_image(settings_path, document=None):
         return False
     
     if not export_path.parent.exists():
-        create_missing_folders_at_export = readSetting("create_missing_folders_at_export")
+        create_missing_folders_at_export = create_missing_folders or readSetting("create_missing_folders_at_export")
         if create_missing_folders_at_export == "never":
             set_export_failed_msg(f"The export folder '{export_path.parent}' doesn't exist.")
             return False
@@ -651,78 +1293,200 @@ def export_image(settings_path, document=None):
             set_export_failed_msg(f"The export folder '{export_path.parent}' could not be created: f{e}")
             return False
     
-    do_resize = False
+    return True
+
+def export_scale_for_size(s_basic, doc_width, doc_height):
+    """
+    return (width, height, filter strategy name) that an image of doc_width x
+    doc_height should be scaled to for export, or None if it isn't scaled.
+    the filter may be "Auto".
+    """
+    if not s_basic["scale"]:
+        return None
     
-    if s_basic["scale"]:
-        scale_side = s_basic["scale_side"]
-        scale_keep_aspect = s_basic["scale_keep_aspect"]
-        
-        doc_width = document.width()
-        doc_height = document.height()
-        
-        scale_width = doc_width
-        scale_height = doc_height
+    scale_side = s_basic["scale_side"]
+    scale_keep_aspect = s_basic["scale_keep_aspect"]
+    
+    scale_width = doc_width
+    scale_height = doc_height
+    
+    if scale_side in (QEImageEdge.WIDTH,  QEImageEdge.BOTH) or (scale_side == QEImageEdge.SHORTEST and doc_width <= doc_height) or (scale_side == QEImageEdge.LONGEST and doc_width >= doc_height):
+        scale_width  = max(1, int(s_basic["scale_width"]) if s_basic["scale_width_mode"]  == QEUnits.PIXELS else round(doc_width  * s_basic["scale_width"] * 0.01))
+    if scale_side in (QEImageEdge.HEIGHT, QEImageEdge.BOTH) or (scale_side == QEImageEdge.SHORTEST and doc_width >= doc_height) or (scale_side == QEImageEdge.LONGEST and doc_width <= doc_height):
+        # short/long side modes store scale value in primary (ie. width) setting.
+        scale_source = "scale_width" if scale_side in (QEImageEdge.SHORTEST, QEImageEdge.LONGEST) else "scale_height"
+        scale_height = max(1, int(s_basic[scale_source])  if s_basic["scale_height_mode"] == QEUnits.PIXELS else round(doc_height * s_basic[scale_source]  * 0.01))
+    
+    if scale_side != QEImageEdge.BOTH and scale_keep_aspect and not (scale_side in (QEImageEdge.SHORTEST, QEImageEdge.LONGEST) and doc_width == doc_height):
+        if scale_width != doc_width:
+            scale_height = max(1, round(scale_height * (scale_width / doc_width)))
+        elif scale_height != doc_height:
+            scale_width = max(1, round(scale_width * (scale_height / doc_height)))
+    
+    if scale_width == doc_width and scale_height == doc_height:
+        return None
+    
+    # example: 0 -> 'Auto', 8 -> 'Nearest'.
+    scale_filter = filter_strategy_display_strings[s_basic["scale_filter"]]
+    if scale_filter in filter_strategy_aliases:
+        # example: 'Nearest' -> 'NearestNeighbor'.
+        scale_filter = filter_strategy_aliases[scale_filter]
+    
+    return scale_width, scale_height, scale_filter
+
+def create_document(*args):
+    """
+    app.createDocument(*args), keeping the defaults of Krita's new document
+    dialog, which createDocument would otherwise replace with its arguments.
+    """
+    # save current "create new document" dialog defaults.
+    keys = ("imageWidthDef", "imageHeightDef", "imageResolutionDef", "colorDepthDef", "colorModelDef", "colorProfileDef")
+    defaults = {key:app.readSetting("", key, "") for key in keys}
+    
+    doc = app.createDocument(*args)
+    
+    # restore defaults.
+    for key, value in defaults.items():
+        app.writeSetting("", key, value)
+    
+    return doc
+
+def projection_document(document):
+    """
+    return a new single-layer document holding a copy of document's merged
+    projection, with the same size, colour space, resolution and document
+    info. cheaper than clone() and flatten() when only the final image is
+    needed, as the layer stack isn't copied. close it when done.
+    """
+    width = document.width()
+    height = document.height()
+    
+    document.waitForDone()
+    
+    doc_copy = create_document(width, height, document.name(), document.colorModel(), document.colorDepth(), document.colorProfile(), document.xRes())
+    doc_copy.setDocumentInfo(document.documentInfo())
+    doc_copy.setYRes(document.yRes())
+    
+    layer = doc_copy.topLevelNodes()[0]
+    layer.setPixelData(document.pixelData(0, 0, width, height), 0, 0, width, height)
+    doc_copy.refreshProjection()
+    
+    return doc_copy
+
+def export_document(document, export_path, export_config):
+    exportParameters = InfoObject()
+    for k,v in export_config.items():
+        exportParameters.setProperty(k, v)
+    
+    #for p in exportParameters.properties():
+        #print(p)
+    
+    document.setBatchmode(True)
+    document.waitForDone()
+    result = document.exportImage(str(export_path), exportParameters)
+    document.setBatchmode(False)
+    
+    if not result:
+        set_export_failed_msg(f"Krita couldn't export to '{export_path}'.")
+    return result
+
+def export_image(settings_path, document=None, create_missing_folders=None):
+    """
+    export document to each output of the settings stored for settings_path.
+    create_missing_folders overrides the "create_missing_folders_at_export"
+    setting when given ("never", "ask" or "always").
+    the merged image is copied once for each filter strategy used by the
+    scaled outputs, which are made from largest to smallest, each scaled
+    down from the one before if it fits and used the same filter.
+    returns True if all exports succeeded. if not, the reason is available from export_failed_msg().
+    """
+    settings = qe_settings[settings_path]
+    
+    if not document:
+        document = settings["document"]
+    
+    source_path = Path(document.fileName())
+    
+    targets = []
+    for output in output_settings(settings):
+        ext, export_config = export_config_for_settings(output)
         
-        if scale_side in (QEImageEdge.WIDTH,  QEImageEdge.BOTH) or (scale_side == QEImageEdge.SHORTEST and doc_width <= doc_height) or (scale_side == QEImageEdge.LONGEST and doc_width >= doc_height):
-            scale_width  = max(1, int(s_basic["scale_width"]) if s_basic["scale_width_mode"]  == QEUnits.PIXELS else round(doc_width  * s_basic["scale_width"] * 0.01))
-        if scale_side in (QEImageEdge.HEIGHT, QEImageEdge.BOTH) or (scale_side == QEImageEdge.SHORTEST and doc_width >= doc_height) or (scale_side == QEImageEdge.LONGEST and doc_width <= doc_height):
-            # short/long side modes store scale value in primary (ie. width) setting.
-            scale_source = "scale_width" if scale_side in (QEImageEdge.SHORTEST, QEImageEdge.LONGEST) else "scale_height"
-            scale_height = max(1, int(s_basic[scale_source])  if s_basic["scale_height_mode"] == QEUnits.PIXELS else round(doc_height * s_basic[scale_source]  * 0.01))
+        if export_config is None:
+            set_export_failed_msg(f"No configuration for {ext} file type.")
+            return False
         
-        if scale_side != QEImageEdge.BOTH and scale_keep_aspect and not (scale_side in (QEImageEdge.SHORTEST, QEImageEdge.LONGEST) and doc_width == doc_height):
-            if scale_width != doc_width:
-                scale_height = max(1, round(scale_height * (scale_width / doc_width)))
-            elif scale_height != doc_height:
-                scale_width = max(1, round(scale_width * (scale_height / doc_height)))
+        export_path = export_file_path(output, source_path)
         
-        # example: 0 -> 'Auto', 8 -> 'Nearest'.
-        scale_filter = filter_strategy_display_strings[s_basic["scale_filter"]]
-        if scale_filter in filter_strategy_aliases:
-            # example: 'Nearest' -> 'NearestNeighbor'.
-            scale_filter = filter_strategy_aliases[scale_filter]
+        if not prepare_export_folder(export_path, create_missing_folders):
+            return False
         
-        do_resize = s_basic["scale"] and (scale_width != document.width() or scale_height != document.height())
-        #print(f"export: do resize: {do_resize}")
+        scale = export_scale_for_size(output["basic"], document.width(), document.height())
+        if scale and scale[2] == "Auto":
+            scale = (scale[0], scale[1], auto_filter_strategy(document.width(), document.height(), scale[0], scale[1]))
+        targets.append((output, export_config, export_path, scale))
+    
+    # unscaled outputs first, then scaled by filter, from largest to smallest.
+    targets.sort(key=lambda target: (1, target[3][2], -target[3][0] * target[3][1]) if target[3] else (0,))
+    
+    doc_copy = None
+    # filter doc_copy was last scaled with, None if it hasn't been scaled.
+    doc_copy_filter = None
+    failed_msg = ""
     
-    if do_resize:
-        if scale_filter == "Auto":
-            scale_filter = auto_filter_strategy(document.width(), document.height(), scale_width, scale_height)
+    for output, export_config, export_path, scale in targets:
+        s_basic = output["basic"]
         
-        if scale_filter not in app.filterStrategies():
-            set_export_failed_msg(f"Chosen filter strategy '{scale_filter}' not recognised.")
-            return False
+        if scale:
+            scale_width, scale_height, scale_filter = scale
+            
+            if doc_copy and (doc_copy_filter not in (None, scale_filter) or doc_copy.width() < scale_width or doc_copy.height() < scale_height):
+                # can't be scaled down from the previous output without mixing filters or enlarging.
+                if doc_copy.close() == False:
+                    logger.error("Export copy of document didn't close?")
+                doc_copy = None
+            
+            if not doc_copy:
+                # only the merged image is needed, so avoid copying the whole layer stack with clone().
+                doc_copy = projection_document(document)
+                doc_copy_filter = None
+            
+            if scale_filter not in app.filterStrategies():
+                set_export_failed_msg(f"Chosen filter strategy '{scale_filter}' not recognised.")
+                result = False
+            else:
+                # TODO: (low priority): resolution probably not handled correctly.
+                scale_xres = document.xRes()
+                scale_yres = document.yRes()
+                if s_basic["scale_res"] != -1:
+                    aspect = scale_height / scale_width
+                    scale_xres = s_basic["scale_res"]
+                    scale_yres = s_basic["scale_res"] * aspect
+                
+                #print(f"export: scale: {doc_copy.width()} x {doc_copy.height()}  ->  {scale_width} x {scale_height}")
+                doc_copy.scaleImage(scale_width, scale_height, int(scale_xres), int(scale_yres), scale_filter)
+                doc_copy_filter = scale_filter
+                result = export_document(doc_copy, export_path, export_config)
         
-        # TODO: (low priority): resolution probably not handled correctly.
-        scale_xres = document.xRes()
-        scale_yres = document.yRes()
-        if s_basic["scale_res"] != -1:
-            aspect = scale_height / scale_width
-            scale_xres = s_basic["scale_res"]
-            scale_yres = s_basic["scale_res"] * aspect
+        else:
+            result = export_document(document, export_path, export_config)
         
-        doc_copy = document.clone()
-
-        doc_copy.flatten()
-        #print(f"export: scale: {doc_width} x {doc_height}  ->  {scale_width} x {scale_height}")
-        doc_copy.scaleImage(scale_width, scale_height, int(scale_xres), int(scale_yres), scale_filter)
-
-        doc_copy.setBatchmode(True)
-        doc_copy.waitForDone()
-        result = doc_copy.exportImage(str(export_path), exportParameters)
-        doc_copy.setBatchmode(False)
-
-        if doc_copy.close() == False:
-            logger.error("Export copy of document didn't close?")
-
-    else:
-
-        document.setBatchmode(True)
-        document.waitForDone()
-        result = document.exportImage(str(export_path), exportParameters)
-        document.setBatchmode(False)
+        if result and not document.modified():
+            export_manifest.record(source_path, export_path, export_settings_hash(output))
+        else:
+            # export doesn't match the saved file (or failed), so can't be skipped next time.
+            export_manifest.forget(export_path)
+        
+        if not result and not failed_msg:
+            failed_msg = export_failed_msg()
     
-    return result
+    if doc_copy and doc_copy.close() == False:
+        logger.error("Export copy of document didn't close?")
+    
+    if failed_msg:
+        set_export_failed_msg(failed_msg)
+        return False
+    
+    return True
 
 def truncated_name_suggestions(text):
     l = []
@@ -771,6 +1535,8 @@ def truncated_name_suggestions(text):
             ss = se
     return l
 
+versioned_stem_regex = re.compile("(_[0-9]+)$")
+
 def base_stem_and_version_number_for_versioned_file(file_path, unversioned_version_num=None):
     """
     for file with stem "filename0_000", return ("filename0", 0).
@@ -778,14 +1544,116 @@ def base_stem_and_version_number_for_versioned_file(file_path, unversioned_versi
     for file with stem "filename0_003_007", return ("filename0_003", 7).
     if not versioned, eg. "filename0", return ("filename0", unversioned_version_num).
     """
-    matches = list(re.finditer("(_[0-9]+)$", file_path.stem))
-    base_version_stem = file_path.stem
-    match_version_num = unversioned_version_num
-    if matches:
-        match = matches[0]
-        base_version_stem = file_path.stem[:match.start()]
-        match_version_num = int(match.group()[1:])
-    return base_version_stem, match_version_num
+    stem = file_path.stem
+    match = versioned_stem_regex.search(stem)
+    if not match:
+        return stem, unversioned_version_num
+    return stem[:match.start()], int(match.group(1)[1:])
+
+class FolderScanIndex:
+    """
+    index of the .kra files in folders, each folder read with one os.scandir
+    pass and its files grouped by project (versioned base stem), with the
+    modification time of each file from the scan.
+    
+    a folder is read again if its own modification time has changed (files
+    added, removed or renamed), or after invalidate(), which is called when
+    Krita saves or creates an image.
+    """
+    def __init__(self):
+        self.folders = {}
+    
+    def invalidate(self, path=None):
+        """
+        forget scan of folder at path, or of path's folder if it's a file. forget all if path is None.
+        """
+        if path is None:
+            self.folders.clear()
+            return
+        self.folders.pop(path, None)
+        self.folders.pop(path.parent, None)
+    
+    def _scan(self, folder_path):
+        try:
+            folder_mtime = os.stat(folder_path).st_mtime_ns
+        except OSError:
+            self.folders.pop(folder_path, None)
+            return None
+        
+        scan = self.folders.get(folder_path)
+        if scan and scan["mtime"] == folder_mtime:
+            return scan
+        
+        files = []
+        try:
+            with os.scandir(folder_path) as it:
+                for entry in it:
+                    if not entry.name.endswith(".kra"):
+                        continue
+                    try:
+                        if not entry.is_file():
+                            continue
+                        files.append((entry.stat().st_mtime, entry.name))
+                    except OSError:
+                        continue
+        except OSError:
+            self.folders.pop(folder_path, None)
+            return None
+        
+        files.sort()
+        
+        projects = {}
+        for mtime, name in files:
+            file_path = folder_path / name
+            base = base_stem_and_version_number_for_versioned_file(file_path)[0]
+            projects.setdefault(base, []).append((file_path, mtime))
+        
+        scan = {"mtime":folder_mtime, "projects":projects}
+        self.folders[folder_path] = scan
+        return scan
+    
+    def version_files(self, project_path):
+        """
+        for project "/path/to/file", return (path, mtime) of its version files
+        ("file.kra", "file_001.kra", etc.), sorted from oldest to newest.
+        """
+        scan = self._scan(project_path.parent)
+        if not scan:
+            return []
+        return scan["projects"].get(project_path.name, [])
+    
+    def project_names(self, folder_path):
+        """
+        return base names of projects with version files in folder, ordered by
+        modification time of their oldest file.
+        """
+        scan = self._scan(folder_path)
+        if not scan:
+            return []
+        return list(scan["projects"])
+
+folder_scan_index = FolderScanIndex()
+
+def version_files_for_project(project_path):
+    """
+    for project "/path/to/file", return paths of its version files ("file.kra", "file_001.kra", etc.),
+    sorted from oldest to newest by modification time.
+    """
+    return [file for file, mtime in folder_scan_index.version_files(project_path)]
+
+def latest_file_for_project(project_path):
+    """
+    return path of most recently modified version file of project, or None if there are none.
+    """
+    files = folder_scan_index.version_files(project_path)
+    return files[-1][0] if files else None
+
+def project_paths_in_folder(folder_path):
+    """
+    return paths of all projects with version files in folder, ordered by modification time of their files.
+    autosave files are ignored.
+    """
+    return [folder_path / name for name in folder_scan_index.project_names(folder_path) if not name.endswith(".kra-autosave")]
 
 # https://stackoverflow.com/a/16204023
 def open_folder_in_file_browser(path):
@@ -841,6 +1709,23 @@ def find_layers(root_node, name, name_is_regex, respect_locks, colour_labels, ba
 
     return nodes
 
+def square_thumbnail_image(image, size):
+    """
+    return image scaled to fit and centred in a transparent square of size x size pixels.
+    only uses QImage, so it's safe to call outside the GUI thread.
+    """
+    if max(image.width(), image.height()) != size:
+        image = image.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+    out_img = QImage(size, size, QImage.Format_ARGB32_Premultiplied)
+    out_img.fill(Qt.transparent)
+
+    painter = QPainter(out_img)
+    painter.drawImage((size - image.width()) // 2, (size - image.height()) // 2, image)
+    painter.end()
+
+    return out_img
+
 # adapted from https://www.geeksforgeeks.org/python/pyqt5-how-to-get-cropped-square-image-from-rectangular-image/
 def square_thumbnail(pixmap, size=8):
     image = QImage(pixmap)
@@ -165,7 +165,7 @@ def load_0_0_2_settings_from_config():
     
     for file_kvpairs in settings_per_file:
         logger.info("found file settings", file_kvpairs)
-        settings = default_settings(Path(), store=True)
+        settings = {"path":Path()}
         output_string = ""
         for k,v in file_kvpairs:
             if k == "path":